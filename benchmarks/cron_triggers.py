@@ -0,0 +1,54 @@
+"""
+Cron trigger compilation benchmark.
+
+Times building a cron trigger for a job set that shares a small number of distinct schedules
+by constructing a new CronTrigger per job (how validation and the scheduler used to)
+and through the shared compiled trigger cache, and reports the resulting cache statistics.
+
+Run from the repository root: python -m benchmarks.cron_triggers [job count]
+"""
+import sys
+import time
+from datetime import datetime, timezone
+
+from apscheduler.triggers.cron import CronTrigger
+
+from ecs_scheduler import crontriggers
+
+
+_DEFAULT_JOBS = 20000
+_SCHEDULES = (
+    {'second': '0', 'minute': '*/5', 'hour': '*', 'day_of_week': 'mon-fri'},
+    {'second': '0', 'minute': '0', 'hour': '*/2'},
+    {'second': '0', 'minute': '30', 'hour': '3'},
+    {'second': '0', 'minute': '0', 'hour': '0', 'day': 'last'},
+)
+_TIMEZONES = ('UTC', 'America/New_York')
+
+
+def _jobs(count):
+    start = datetime(2017, 6, 14, 13, tzinfo=timezone.utc)
+    return [(_SCHEDULES[i % len(_SCHEDULES)], _TIMEZONES[i % len(_TIMEZONES)], start) for i in range(count)]
+
+
+def _time(f, jobs):
+    start = time.perf_counter()
+    for schedule, tz, start_date in jobs:
+        f(schedule, tz, start_date)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_JOBS
+    jobs = _jobs(count)
+    print(f'{count} jobs, {len(_SCHEDULES) * len(_TIMEZONES)} distinct schedules')
+    uncached = _time(lambda schedule, tz, start_date: CronTrigger(**schedule, timezone=tz, start_date=start_date), jobs)
+    cached = _time(lambda schedule, tz, start_date: crontriggers.build(schedule, timezone=tz, start_date=start_date), jobs)
+    print(f'{"uncached":>9}: {uncached * 1e6 / count:8.2f} us/job')
+    print(f'{"cached":>9}: {cached * 1e6 / count:8.2f} us/job ({uncached / cached:.1f}x)')
+    print(crontriggers.cache_info())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
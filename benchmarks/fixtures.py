@@ -0,0 +1,29 @@
+"""Fixtures shared by the benchmark scripts."""
+
+
+class PrefilledStore:
+    """
+    Read-only job store that generates a fixed number of job records.
+
+    Job ids sort in creation order: job-0000000, job-0000001 and so on.
+    """
+    def __init__(self, count, schedule='0 */5', **fields):
+        """
+        Create store.
+
+        :param count: Number of job records to generate
+        :param schedule: Schedule of every job
+        :param **fields: Additional fields of every job; nested values are shared between records
+        """
+        self._count = count
+        self._schedule = schedule
+        self._fields = fields
+
+    def load_all(self):
+        """
+        Generate the job records.
+
+        :returns: Generator yielding a new job data dictionary for each job
+        """
+        for i in range(self._count):
+            yield {'id': f'job-{i:07}', 'taskDefinition': f'task-{i}', 'schedule': self._schedule, **self._fields}
@@ -0,0 +1,61 @@
+"""
+Per-job memory benchmark for the jobs data context.
+
+Loads a job set with tracemalloc running and reports the bytes allocated per job
+and the load time for the current Job objects and, for comparison,
+for jobs that carry their own schema, lock and instance dictionary
+as Job objects used to.
+
+Run from the repository root: python -m benchmarks.job_memory [job count]
+"""
+import gc
+import sys
+import time
+import logging
+import tracemalloc
+from threading import RLock
+
+from ecs_scheduler.datacontext import Jobs, Job
+from ecs_scheduler.serialization import JobSchema
+
+from .fixtures import PrefilledStore
+
+
+_DEFAULT_JOBS = 20000
+
+
+class _PerJobStateJob(Job):
+    def __init__(self, data, store, on_change=None):
+        super().__init__(data, store, on_change)
+        self._schema = JobSchema()
+        self._own_lock = RLock()
+
+
+class _PerJobStateJobs(Jobs):
+    def _make_job(self, job_data):
+        return _PerJobStateJob(job_data, self._store, on_change=self._reindex)
+
+
+def _run(label, jobs_cls, count):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    jobs = jobs_cls.load(PrefilledStore(count, taskCount=2), cache=None)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:>10}: {allocated / jobs.total():8.0f} bytes/job, load {elapsed:6.2f} s')
+
+
+def main():
+    logging.disable(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_JOBS
+    print(f'{count} jobs')
+    _run('per-job', _PerJobStateJobs, count)
+    _run('shared', Jobs, count)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+GET /jobs response benchmark for the webapi.
+
+Serves repeated job listings through a Flask test client over a loaded job set
+with the job response cache disabled and enabled and as conditional requests
+answered from the job set etag, and reports request latency along with the response cache statistics.
+
+Run from the repository root: python -m benchmarks.job_responses [job count]
+"""
+import os
+import sys
+import time
+import logging
+from unittest.mock import Mock
+
+from ecs_scheduler import webapi
+from ecs_scheduler.datacontext import Jobs
+
+from .fixtures import PrefilledStore
+
+
+_DEFAULT_JOBS = 2000
+_PAGE_SIZE = 100
+_REPEAT = 5
+_JOB_FIELDS = {
+    'schedule': '0 */5 * mon-fri', 'timezone': 'America/New_York', 'taskCount': 2, 'revision': 1,
+    'trigger': {'type': 'sqs', 'queueName': 'jobs', 'messagesPerTask': 100}
+}
+
+
+def _run(label, cache_size, jobs, count, conditional=False):
+    os.environ['ECSS_RESPONSE_CACHE_SIZE'] = str(cache_size)
+    app = webapi.setup(webapi.create(), Mock(), jobs)
+    client = app.test_client()
+    headers = {'If-None-Match': client.get('/jobs').headers['ETag']} if conditional else {}
+    start = time.perf_counter()
+    for _ in range(_REPEAT):
+        for skip in range(0, count, _PAGE_SIZE):
+            client.get(f'/jobs?skip={skip}&count={_PAGE_SIZE}', headers=headers)
+    elapsed = (time.perf_counter() - start) / (_REPEAT * -(-count // _PAGE_SIZE)) * 1e3
+    print(f'{label:>9}: {elapsed:7.2f} ms/page')
+    return client
+
+
+def main():
+    logging.disable(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_JOBS
+    jobs = Jobs.load(PrefilledStore(count, **_JOB_FIELDS), cache=None)
+    print(f'{count} jobs, {_PAGE_SIZE} jobs per page, every page read {_REPEAT} times')
+    _run('uncached', 0, jobs, count)
+    client = _run('cached', count, jobs, count)
+    print(client.get('/metrics').get_json()['responseCache'])
+    _run('304', count, jobs, count, conditional=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Per-operation benchmark for job serialization hot paths.
+
+Compares marshmallow with the compiled serializers and field check used by
+the jobs data context and the webapi: dumping a job for the store,
+dumping a job for a GET /jobs response and checking annotate fields for persistent fields.
+
+Run from the repository root: python -m benchmarks.job_serialization [iterations]
+"""
+import sys
+import time
+from datetime import datetime, timezone
+
+from ecs_scheduler.serialization import JobSchema, JobCreateSchema, JobResponseSchema
+
+
+_DEFAULT_ITERATIONS = 20000
+_JOB = {
+    'id': 'job-1',
+    'taskDefinition': 'job-1',
+    'schedule': '0 */5 * mon-fri',
+    'parsedSchedule': {'second': '0', 'minute': '*/5', 'hour': '*', 'day_of_week': 'mon-fri'},
+    'timezone': 'America/New_York',
+    'taskCount': 2,
+    'maxCount': 10,
+    'suspended': False,
+    'trigger': {'type': 'sqs', 'queueName': 'jobs', 'messagesPerTask': 100},
+    'overrides': [{'containerName': 'app', 'environment': {'MODE': 'batch'}}],
+    'lastRun': datetime(2017, 6, 14, 13, tzinfo=timezone.utc),
+    'lastRunTasks': [{'taskId': 'task-1', 'hostId': 'host-1'}],
+    'estimatedNextRun': datetime(2017, 6, 14, 13, 5, tzinfo=timezone.utc),
+    'revision': 3
+}
+_ANNOTATION = {'estimatedNextRun': datetime(2017, 6, 14, 13, 10, tzinfo=timezone.utc)}
+
+
+def _time(f, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        f()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_ITERATIONS
+    create_schema = JobCreateSchema()
+    job_schema = JobSchema()
+    response_schema = JobResponseSchema(lambda job_id: {'rel': 'item', 'href': f'/jobs/{job_id}'})
+    operations = (
+        ('store dump', lambda: create_schema.dump(_JOB).data, lambda: create_schema.dump_data(_JOB)),
+        ('response dump', lambda: response_schema.dump(_JOB).data, lambda: response_schema.dump_data(_JOB)),
+        ('annotate check', lambda: job_schema.load(_ANNOTATION), lambda: job_schema.loaded_fields(_ANNOTATION))
+    )
+    print(f'{iterations} iterations per operation')
+    print(f'{"operation":>14} {"marshmallow us":>15} {"compiled us":>12} {"speedup":>8}')
+    for label, baseline, compiled in operations:
+        baseline_us = _time(baseline, iterations)
+        compiled_us = _time(compiled, iterations)
+        print(f'{label:>14} {baseline_us:>15.2f} {compiled_us:>12.2f} {baseline_us / compiled_us:>7.1f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
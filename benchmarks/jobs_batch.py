@@ -0,0 +1,82 @@
+"""
+Bulk job sync benchmark for the webapi.
+
+Creates, updates and deletes a job set through a Flask test client backed by a SQLite job store,
+once with a request per job through POST /jobs, PUT and DELETE /jobs/{job_id}
+and once through POST /jobs:batch, and reports job throughput for each.
+
+Run from the repository root: python -m benchmarks.jobs_batch [job count]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+from unittest.mock import Mock
+
+from ecs_scheduler import webapi
+from ecs_scheduler.datacontext import Jobs
+from ecs_scheduler.persistence import SQLiteStore
+
+
+_DEFAULT_JOBS = 2000
+_BATCH_SIZE = 1000
+
+
+def _job(i):
+    return {'taskDefinition': f'task-{i:07}', 'schedule': '0 */5 * mon-fri', 'timezone': 'America/New_York',
+            'trigger': {'type': 'sqs', 'queueName': 'jobs', 'messagesPerTask': 100}}
+
+
+def _single(client, count):
+    for i in range(count):
+        client.post('/jobs', json=_job(i))
+    yield
+    for i in range(count):
+        client.put(f'/jobs/task-{i:07}', json={'taskCount': 2})
+    yield
+    for i in range(count):
+        client.delete(f'/jobs/task-{i:07}')
+    yield
+
+
+def _batched(client, count):
+    def send(operations):
+        for start in range(0, count, _BATCH_SIZE):
+            client.post('/jobs:batch', json={'operations': operations[start:start + _BATCH_SIZE]})
+    send([{'action': 'create', 'job': _job(i)} for i in range(count)])
+    yield
+    send([{'action': 'update', 'id': f'task-{i:07}', 'job': {'taskCount': 2}} for i in range(count)])
+    yield
+    send([{'action': 'delete', 'id': f'task-{i:07}'} for i in range(count)])
+    yield
+
+
+def _run(label, sync, folder, count):
+    store = SQLiteStore(os.path.join(folder, f'{label}.db'))
+    jobs = Jobs.load(store, cache=None)
+    client = webapi.setup(webapi.create(), Mock(), jobs).test_client()
+    elapsed = []
+    start = time.perf_counter()
+    for _ in sync(client, count):
+        elapsed.append(time.perf_counter() - start)
+        start = time.perf_counter()
+    assert jobs.total() == 0 and not list(store.load_all())
+    store.close()
+    print(f'{label:>8}: ' + ', '.join(f'{step} {count / t:8.0f} jobs/s' for step, t in zip(('create', 'update', 'delete'), elapsed)))
+    return elapsed
+
+
+def main():
+    logging.disable(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_JOBS
+    print(f'{count} jobs, {_BATCH_SIZE} operations per batch request')
+    with tempfile.TemporaryDirectory() as folder:
+        single = _run('single', _single, folder, count)
+        batched = _run('batched', _batched, folder, count)
+    print(f'{"speedup":>8}: ' + ', '.join(f'{step} {s / b:8.1f}x' for step, s, b in zip(('create', 'update', 'delete'), single, batched)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+Page latency benchmark for GET /jobs style listings.
+
+Loads a large job set and times fetching pages at increasing depths with
+offset pagination over the unordered job iterator (how GET /jobs used to page),
+offset pagination over the sorted job ids and keyset pagination after a cursor id.
+
+Run from the repository root: python -m benchmarks.jobs_pagination [job count]
+"""
+import sys
+import time
+import logging
+from itertools import islice
+
+from ecs_scheduler.datacontext import Jobs
+
+from .fixtures import PrefilledStore
+
+
+_DEFAULT_JOBS = 100000
+_PAGE_SIZE = 50
+_REPEAT = 20
+
+
+def _time(f):
+    start = time.perf_counter()
+    for _ in range(_REPEAT):
+        f()
+    return (time.perf_counter() - start) / _REPEAT * 1e3
+
+
+def main():
+    logging.disable(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_JOBS
+    jobs = Jobs.load(PrefilledStore(count), cache=None)
+    print(f'{count} jobs, {_PAGE_SIZE} jobs per page')
+    print(f'{"depth":>8} {"islice ms":>10} {"skip ms":>10} {"cursor ms":>10}')
+    for depth in (0, count // 10, count // 2, count - _PAGE_SIZE):
+        after = jobs.get_page(1, skip=depth - 1)[0].id if depth else None
+        sliced = _time(lambda: list(islice(jobs.get_all(), depth, depth + _PAGE_SIZE)))
+        skipped = _time(lambda: jobs.get_page(_PAGE_SIZE, skip=depth))
+        keyset = _time(lambda: jobs.get_page(_PAGE_SIZE + 1, after=after))
+        print(f'{depth:>8} {sliced:>10.3f} {skipped:>10.3f} {keyset:>10.3f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""
+Mixed-load benchmark for Jobs reads and writes.
+
+Reader threads page through all jobs and serialize them the way GET /jobs does
+while a writer thread creates and deletes jobs. Reports writer latency and
+reader throughput for snapshot reads and, for comparison, for reads that hold
+the data context lock for the whole iteration as Jobs.get_all used to.
+
+Run from the repository root: python -m benchmarks.jobs_snapshot
+"""
+import sys
+import time
+import logging
+import threading
+import statistics
+
+from ecs_scheduler.datacontext import Jobs
+from ecs_scheduler.persistence import NullStore
+from ecs_scheduler.serialization import JobResponseSchema
+
+
+_JOBS = 2000
+_READERS = 4
+_DURATION = 3.0
+
+
+class _LockedReadJobs(Jobs):
+    def get_all(self):
+        with self._lock:
+            yield from self._jobs.values()
+
+
+def _job_data(i):
+    return {'id': f'job-{i}', 'taskDefinition': f'task-{i}', 'schedule': '0 */5', 'taskCount': 2}
+
+
+def _run(label, jobs_cls):
+    jobs = jobs_cls.load(NullStore(), cache=None)
+    for i in range(_JOBS):
+        jobs.create(_job_data(i))
+    schema = JobResponseSchema(lambda job_id: {'rel': 'item', 'href': f'/jobs/{job_id}'})
+    stop = threading.Event()
+    pages = [0] * _READERS
+
+    def read(n):
+        while not stop.is_set():
+            for job in jobs.get_all():
+                schema.dump(job.data)
+            pages[n] += 1
+
+    readers = [threading.Thread(target=read, args=(n,)) for n in range(_READERS)]
+    for t in readers:
+        t.start()
+    latencies = []
+    deadline = time.perf_counter() + _DURATION
+    i = _JOBS
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        jobs.create(_job_data(i))
+        jobs.delete(f'job-{i}')
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    stop.set()
+    for t in readers:
+        t.join()
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(f'{label:>8}: {len(latencies):6} writes, write p50 {statistics.median(latencies) * 1e3:8.2f} ms, '
+          f'p99 {p99 * 1e3:8.2f} ms; {sum(pages) / _DURATION:6.1f} full listings/s')
+
+
+def main():
+    logging.disable(logging.WARNING)
+    _run('locked', _LockedReadJobs)
+    _run('snapshot', Jobs)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
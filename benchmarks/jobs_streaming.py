@@ -0,0 +1,56 @@
+"""
+Large listing benchmark for GET /jobs.
+
+Fetches every job in one request through a Flask test client as a paginated JSON listing
+and as a streamed NDJSON listing, and reports the time to the first byte, the total time
+and the peak memory allocated while serving each response.
+
+Run from the repository root: python -m benchmarks.jobs_streaming [job count]
+"""
+import os
+import sys
+import time
+import logging
+import tracemalloc
+from unittest.mock import Mock
+
+from ecs_scheduler import webapi
+from ecs_scheduler.datacontext import Jobs
+
+from .fixtures import PrefilledStore
+
+
+_DEFAULT_JOBS = 50000
+_JOB_FIELDS = {'schedule': '0 */5 * mon-fri', 'timezone': 'America/New_York', 'taskCount': 2, 'revision': 1}
+
+
+def _run(label, client, count, headers):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(f'/jobs?count={count}', headers=headers, buffered=False)
+    body = iter(response.response)
+    first = next(body, b'')
+    first_byte = time.perf_counter() - start
+    size = len(first) + sum(len(chunk) for chunk in body)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    response.close()
+    print(f'{label:>7}: first byte {first_byte * 1e3:8.1f} ms, total {elapsed:6.2f} s, '
+          f'{size / 1e6:6.1f} MB sent, peak {peak / 1e6:7.1f} MB')
+
+
+def main():
+    logging.disable(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_JOBS
+    os.environ['ECSS_RESPONSE_CACHE_SIZE'] = '0'
+    jobs = Jobs.load(PrefilledStore(count, **_JOB_FIELDS), cache=None)
+    client = webapi.setup(webapi.create(), Mock(), jobs).test_client()
+    print(f'{count} jobs in one listing, response cache disabled')
+    _run('json', client, count, {})
+    _run('ndjson', client, count, {'Accept': 'application/x-ndjson'})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""
+Startup validation benchmark for the jobs data context.
+
+Loads a job set from an in-memory store and reports the load time
+when validating in-process, with increasing numbers of validation worker processes
+and when loading lazily, along with the time to hydrate one percent of the lazily loaded jobs.
+
+Run from the repository root: python -m benchmarks.jobs_validation [job count]
+"""
+import os
+import sys
+import time
+import logging
+
+from ecs_scheduler.datacontext import Jobs
+
+from .fixtures import PrefilledStore
+
+
+_DEFAULT_JOBS = 20000
+_CHUNK_SIZE = 500
+_JOB_FIELDS = {'schedule': '0 */5 * mon-fri', 'timezone': 'America/New_York', 'taskCount': 2, 'revision': 1}
+
+
+def main():
+    logging.disable(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_JOBS
+    print(f'{count} jobs, {_CHUNK_SIZE} jobs per validation chunk')
+    for processes in sorted({0} | {n for n in (2, 4, os.cpu_count() or 1) if n > 1}):
+        jobs = Jobs(PrefilledStore(count, **_JOB_FIELDS), processes=processes, chunk_size=_CHUNK_SIZE)
+        start = time.perf_counter()
+        jobs._fill()
+        elapsed = time.perf_counter() - start
+        label = 'in-process' if processes < 2 else f'{processes} processes'
+        print(f'{label:>14}: {elapsed:6.2f} s ({count / elapsed:8.0f} jobs/s)')
+    jobs = Jobs(PrefilledStore(count, **_JOB_FIELDS), lazy=True)
+    start = time.perf_counter()
+    jobs._fill()
+    elapsed = time.perf_counter() - start
+    active = jobs.get_page(max(1, count // 100))
+    start = time.perf_counter()
+    for job in active:
+        job.hydrate()
+    hydrated = time.perf_counter() - start
+    print(f'{"lazy":>14}: {elapsed:6.2f} s, then {hydrated:6.2f} s to hydrate {len(active)} active jobs')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
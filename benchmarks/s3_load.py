@@ -0,0 +1,69 @@
+"""
+Benchmark for S3Store.load_all against a local S3 stand-in.
+
+Starts a moto server, fills a bucket with job objects and times a full load
+at several fetch concurrencies. Requires moto[server] (not an application dependency).
+
+Run from the repository root: python -m benchmarks.s3_load [job count]
+"""
+import os
+import sys
+import json
+import time
+import logging
+
+import boto3
+
+from ecs_scheduler.persistence import S3Store
+
+
+_BUCKET = 'ecs-scheduler-bench'
+_DEFAULT_JOBS = 2000
+_CONCURRENCIES = (1, 4, 10, 32)
+
+
+def _start_server():
+    from moto.server import ThreadedMotoServer
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    os.environ.update({
+        'AWS_ENDPOINT_URL': f'http://{host}:{port}',
+        'AWS_ACCESS_KEY_ID': 'bench',
+        'AWS_SECRET_ACCESS_KEY': 'bench',
+        'AWS_DEFAULT_REGION': 'us-east-1'
+    })
+    return server
+
+
+def _fill_bucket(job_count):
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket=_BUCKET)
+    for i in range(job_count):
+        body = json.dumps({'taskDefinition': f'task-{i}', 'schedule': '0 */5 * * *', 'taskCount': 1})
+        s3.put_object(Bucket=_BUCKET, Key=f'job-{i}.json', Body=body.encode())
+
+
+def main():
+    job_count = int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_JOBS
+    try:
+        server = _start_server()
+    except ImportError:
+        print('moto[server] is required to run this benchmark', file=sys.stderr)
+        return 1
+    try:
+        _fill_bucket(job_count)
+        for concurrency in _CONCURRENCIES:
+            store = S3Store(_BUCKET, concurrency=concurrency)
+            start = time.perf_counter()
+            loaded = sum(1 for _ in store.load_all())
+            elapsed = time.perf_counter() - start
+            print(f'concurrency {concurrency:>3}: {loaded} jobs in {elapsed:6.2f}s')
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
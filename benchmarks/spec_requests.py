@@ -0,0 +1,55 @@
+"""
+GET /spec benchmark for the webapi.
+
+Serves repeated swagger spec requests through a Flask test client, once generating the spec
+and resolving the application version for every request (how /spec used to work),
+once from the cached spec document and once as conditional requests answered from its ETag,
+and reports request latency.
+
+Run from the repository root: python -m benchmarks.spec_requests [request count]
+"""
+import sys
+import time
+import logging
+from unittest.mock import Mock
+
+import flask_restful
+
+from ecs_scheduler import webapi, env
+from ecs_scheduler.webapi.spec import Spec
+
+
+_DEFAULT_REQUESTS = 200
+
+
+class _UncachedSpec(Spec):
+    def get(self):
+        env.get_version.cache_clear()
+        return super().get()
+
+
+def _time(label, client, path, count, headers=None):
+    start = time.perf_counter()
+    for _ in range(count):
+        response = client.get(path, headers=headers)
+    elapsed = (time.perf_counter() - start) / count * 1e3
+    print(f'{label:>9}: {elapsed:8.3f} ms/request')
+    return response
+
+
+def main():
+    logging.disable(logging.WARNING)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else _DEFAULT_REQUESTS
+    print(f'{count} requests')
+    uncached_app = webapi.create()
+    flask_restful.Api(uncached_app).add_resource(_UncachedSpec, '/uncached')
+    webapi.setup(uncached_app, Mock(), Mock())
+    client = uncached_app.test_client()
+    _time('uncached', client, '/uncached', count)
+    response = _time('cached', client, '/spec', count)
+    _time('304', client, '/spec', count, headers={'If-None-Match': response.headers['ETag']})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Microbenchmark for SQLiteStore.update.
+
+Compares the single-statement JSON1 merge against the select-then-update fallback.
+
+Run from the repository root: python -m benchmarks.sqlite_update
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+from ecs_scheduler.persistence import SQLiteStore
+
+
+_JOBS = 1000
+_ROUNDS = 5
+
+
+def _job_data(i):
+    return {
+        'taskDefinition': f'task-{i}',
+        'schedule': '0 */5 * * *',
+        'parsedSchedule': {'second': '0', 'minute': '*/5', 'hour': '*', 'day_of_week': '*'},
+        'taskCount': 1,
+        'overrides': [{'containerName': 'main', 'environment': {'FOO': 'bar', 'N': str(i)}}],
+    }
+
+
+def _run(store, label):
+    for i in range(_JOBS):
+        store.create(f'job-{i}', _job_data(i))
+
+    def update_all():
+        for i in range(_JOBS):
+            store.update(f'job-{i}', {'taskCount': 2, 'suspended': True})
+
+    best = min(timeit.repeat(update_all, number=1, repeat=_ROUNDS))
+    print(f'{label:>8}: {best / _JOBS * 1e6:8.1f} us/update')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        merge_store = SQLiteStore(os.path.join(folder, 'merge.db'))
+        if not merge_store._json1:
+            print('SQLite JSON1 extension not available; nothing to compare', file=sys.stderr)
+            return 1
+        _run(merge_store, 'json1')
+        merge_store.close()
+
+        fallback_store = SQLiteStore(os.path.join(folder, 'fallback.db'))
+        fallback_store._json1 = False
+        _run(fallback_store, 'fallback')
+        fallback_store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
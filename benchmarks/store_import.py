@@ -0,0 +1,56 @@
+"""
+Import-time benchmark for data store selection.
+
+Times importing ecs_scheduler.persistence and resolving the configured store
+in a fresh interpreter for the null and SQLite configurations, and lists which
+remote store client libraries were imported along the way.
+
+Run from the repository root: python -m benchmarks.store_import
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+import tempfile
+
+
+_ROUNDS = 15
+_CLIENT_MODULES = ('boto3', 'botocore', 'elasticsearch', 'yaml')
+# NOTE: ecs_scheduler.env is imported first so its own dependencies are not counted against store selection
+_SCRIPT = f'''
+import sys, time, json
+import ecs_scheduler.env
+before = set(sys.modules)
+start = time.perf_counter()
+from ecs_scheduler import persistence
+persistence.resolve()
+elapsed = time.perf_counter() - start
+loaded = sorted(m for m in set(sys.modules) - before if m.split('.')[0] in {_CLIENT_MODULES!r})
+print(json.dumps({{'elapsed': elapsed, 'loaded': loaded}}))
+'''
+
+
+def _run(label, env_vars):
+    env = {k: v for k, v in os.environ.items() if not k.startswith('ECSS_')}
+    env.update(env_vars)
+    timings = []
+    for _ in range(_ROUNDS):
+        output = subprocess.run([sys.executable, '-c', _SCRIPT], env=env, check=True,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+        result = json.loads(output)
+        timings.append(result['elapsed'])
+    roots = sorted({m.split('.')[0] for m in result['loaded']})
+    print(f'{label:>7}: {statistics.median(timings) * 1e3:8.1f} ms median; '
+          f'client modules newly imported: {", ".join(roots) or "none"} ({len(result["loaded"])} modules)')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as folder:
+        _run('null', {})
+        _run('sqlite', {'ECSS_SQLITE_FILE': os.path.join(folder, 'jobs.db')})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Compiled cron trigger cache shared by job validation and the scheduler."""
+import copy
+import threading
+import collections
+
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.util import convert_to_datetime
+
+
+DEFAULT_TIMEZONE = 'UTC'
+_DEFAULT_MAXSIZE = 1024
+
+
+CacheInfo = collections.namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class TriggerCache:
+    """
+    Bounded LRU cache of compiled cron triggers.
+
+    Triggers are keyed by their normalized schedule arguments and timezone
+    so identical schedules are only compiled once.
+    Cached triggers have no start or end date and are shared, callers must not modify them.
+    """
+    def __init__(self, maxsize=_DEFAULT_MAXSIZE):
+        """
+        Create a trigger cache.
+
+        :param maxsize: The maximum number of compiled triggers to keep
+        """
+        self._maxsize = maxsize
+        self._triggers = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, schedule_args, timezone=DEFAULT_TIMEZONE):
+        """
+        Get the compiled trigger for a schedule.
+
+        :param schedule_args: Dictionary of cron trigger field arguments, e.g. the job's parsed schedule
+        :param timezone: The trigger timezone name or tzinfo
+        :returns: The shared CronTrigger for the schedule
+        :raises: ValueError if the schedule is invalid or pytz.UnknownTimeZoneError if the timezone is unknown
+        """
+        key = _make_key(schedule_args, timezone)
+        with self._lock:
+            trigger = self._triggers.get(key)
+            if trigger is not None:
+                self._triggers.move_to_end(key)
+                self._hits += 1
+                return trigger
+            self._misses += 1
+        trigger = CronTrigger(**schedule_args, timezone=timezone)
+        with self._lock:
+            self._triggers[key] = trigger
+            self._triggers.move_to_end(key)
+            while len(self._triggers) > self._maxsize:
+                self._triggers.popitem(last=False)
+        return trigger
+
+    def info(self):
+        """
+        Get the cache statistics.
+
+        :returns: A CacheInfo of hit and miss counts, maximum size and current size
+        """
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._maxsize, len(self._triggers))
+
+    def clear(self):
+        """Remove all cached triggers and reset the statistics."""
+        with self._lock:
+            self._triggers.clear()
+            self._hits = self._misses = 0
+
+
+_cache = TriggerCache()
+
+
+def get(schedule_args, timezone=DEFAULT_TIMEZONE):
+    """
+    Get the shared compiled trigger for a schedule from the global cache.
+
+    :param schedule_args: Dictionary of cron trigger field arguments
+    :param timezone: The trigger timezone name or tzinfo
+    :returns: The shared CronTrigger for the schedule
+    :raises: ValueError if the schedule is invalid or pytz.UnknownTimeZoneError if the timezone is unknown
+    """
+    return _cache.get(schedule_args, timezone)
+
+
+def build(schedule_args, timezone=DEFAULT_TIMEZONE, start_date=None, end_date=None):
+    """
+    Build a trigger for a scheduled job from the global cache.
+
+    :param schedule_args: Dictionary of cron trigger field arguments
+    :param timezone: The trigger timezone name or tzinfo
+    :param start_date: The earliest date the trigger may fire
+    :param end_date: The latest date the trigger may fire
+    :returns: A new CronTrigger sharing the cached trigger's compiled fields
+    :raises: ValueError if the schedule is invalid or pytz.UnknownTimeZoneError if the timezone is unknown
+    """
+    trigger = copy.copy(_cache.get(schedule_args, timezone))
+    trigger.start_date = convert_to_datetime(start_date, trigger.timezone, 'start_date')
+    trigger.end_date = convert_to_datetime(end_date, trigger.timezone, 'end_date')
+    return trigger
+
+
+def cache_info():
+    """
+    Get the global trigger cache statistics.
+
+    :returns: A CacheInfo of hit and miss counts, maximum size and current size
+    """
+    return _cache.info()
+
+
+def _make_key(schedule_args, timezone):
+    return tuple(sorted((name, str(value)) for name, value in schedule_args.items() if value is not None)), timezone
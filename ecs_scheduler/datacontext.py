@@ -7,16 +7,27 @@ Jobs and Job represent job storage and individual jobs, respectively.
 Job data is controlled by the schemas in ecs_scheduler.serialization module.
 All job loading and storing exceptions inherit from JobError.
 """
+import heapq
+import types
+import bisect
 import logging
+import itertools
 import functools
+import collections
+import contextlib
 import collections.abc
-from threading import RLock
+import concurrent.futures
+from threading import Lock, RLock
 
-from . import persistence
+from . import env, persistence, writebehind, warmstart
 from .serialization import JobSchema, JobCreateSchema
 
 
 _logger = logging.getLogger(__name__)
+_DEFAULT_VALIDATION_CHUNK_SIZE = 500
+# NOTE: beyond this many changed ids one merge of the sorted ids is cheaper than inserting each id
+_MAX_ID_INSERTS = 64
+_worker_schema = None
 
 
 def _sync(f):
@@ -27,33 +38,65 @@ def _sync(f):
     return wrapper
 
 
-def _sync_yield(f):
-    @functools.wraps(f)
-    def wrapper(self, *args, **kwargs):
-        with self._lock:
-            yield from f(self, *args, **kwargs)
-    return wrapper
+def _env_flag(name):
+    return (env.get_var(name) or '').lower() in ('1', 'true', 'yes')
+
+
+def _validate_chunk(records):
+    # NOTE: runs in validation worker processes; each worker builds its schema once
+    global _worker_schema
+    if _worker_schema is None:
+        _worker_schema = JobCreateSchema()
+    results = []
+    for stored_data in records:
+        job_data, errors = _worker_schema.load(stored_data)
+        if not errors:
+            job_data['revision'] = stored_data.get('revision', 0)
+        results.append((job_data, errors))
+    return results
 
 
 """Job data context."""
 class Jobs:
-    """A job data context used by the application to load and store jobs."""
+    """
+    A job data context used by the application to load and store jobs.
+
+    The job map is an immutable snapshot that is replaced on every create or delete,
+    so readers never take the data context lock and writers only hold it to swap the snapshot.
+    Building a snapshot copies the job map and the sorted job ids, which costs O(n) in the number
+    of jobs; creates and deletes that queue up while another snapshot is being built are folded
+    into a single copy, and batch() builds one snapshot for the whole batch.
+    Secondary indexes on commonly queried job fields are kept in sync with job changes
+    and are used by find() and next_runs().
+    """
     @classmethod
-    def load(cls, store=None):
+    def load(cls, store=None, cache=None, processes=None, quarantine=None, lazy=None):
         """
         Create and load jobs from the given job store.
 
         :param store: The job store from which to load and store jobs;
                         uses environment to choose an implementation if not specified
+        :param cache: The warm-start cache used to speed up loading jobs;
+                        uses environment to enable the cache if not specified
+        :param processes: Number of worker processes used to validate jobs loaded from the store;
+                        uses environment if not specified and validates in-process if less than 2
+        :param quarantine: Skip and record invalid stored jobs instead of failing to load;
+                        uses environment if not specified
+        :param lazy: Defer validating and parsing each stored job until it is first accessed;
+                        uses environment if not specified and ignored if the warm-start cache is enabled
         :returns: A jobs storage resource attached to the given job data store
-        :raises: InvalidJobData if job fields fail validation
+        :raises: InvalidJobData if job fields fail validation and invalid jobs are not quarantined
         :raises: JobPersistenceError if job loading fails
         """
-        instance = cls(store or persistence.resolve())
-        instance._fill()
+        instance = cls(store or writebehind.resolve(persistence.resolve()),
+            processes=int(env.get_var('VALIDATION_PROCESSES') or 0) if processes is None else processes,
+            chunk_size=int(env.get_var('VALIDATION_CHUNK_SIZE') or _DEFAULT_VALIDATION_CHUNK_SIZE),
+            quarantine=_env_flag('QUARANTINE_INVALID_JOBS') if quarantine is None else quarantine,
+            lazy=_env_flag('LAZY_JOB_LOADING') if lazy is None else lazy)
+        instance._fill(cache or warmstart.resolve())
         return instance
 
-    def __init__(self, store):
+    def __init__(self, store, processes=0, chunk_size=_DEFAULT_VALIDATION_CHUNK_SIZE, quarantine=False, lazy=False):
         """
         Create a job data context.
 
@@ -61,13 +104,64 @@ class Jobs:
         a properly initialized job context.
 
         :param store: The data store to use for loading and storing jobs
+        :param processes: Number of worker processes used to validate jobs when loading
+        :param chunk_size: Number of stored jobs sent to a validation worker at a time
+        :param quarantine: Skip and record invalid stored jobs instead of failing to load
+        :param lazy: Defer validating and parsing each stored job until it is first accessed
         """
         self._schema = JobCreateSchema()
         self._store = store
+        self._processes = processes
+        self._chunk_size = max(1, chunk_size)
+        self._quarantine = quarantine
+        self._lazy = lazy
+        self._quarantined = []
         self._lock = RLock()
-        self._jobs = None
+        self._jobs = types.MappingProxyType({})
+        self._ordered = ([], self._jobs)
+        self._version = 0
+        self._revision = 0
+        self._index = _JobIndex()
+        self._changes = collections.deque()
+
+    @property
+    def quarantined(self):
+        """
+        Get the stored jobs that were skipped when loading because they failed validation.
+
+        :returns: A list of InvalidJobData errors, one per quarantined job
+        """
+        return list(self._quarantined)
+
+    @property
+    def version(self):
+        """
+        Get the job set version.
+
+        :returns: A number incremented every time a job is added or removed
+        """
+        return self._version
+
+    @property
+    def revision(self):
+        """
+        Get the job set revision.
+
+        Not persisted; starts over when the jobs are loaded.
+
+        :returns: A number incremented every time a job is added, removed or its data changes
+        """
+        return self._revision
+
+    @property
+    def store(self):
+        """
+        Get the data store the jobs are loaded from and saved to.
+
+        :returns: The job data store
+        """
+        return self._store
 
-    @_sync
     def total(self):
         """
         Get the total number of jobs.
@@ -76,16 +170,50 @@ class Jobs:
         """
         return len(self._jobs)
 
-    @_sync_yield
     def get_all(self):
         """
         Get all jobs.
 
-        :returns: A generator that yields all jobs in the job store
+        Iterates the job snapshot current at the time of the call;
+        jobs created or deleted during iteration are not reflected.
+
+        :returns: An iterator that yields all jobs in the job store
         """
-        yield from self._jobs.values()
+        return iter(self._jobs.values())
+
+    def get_page(self, count, skip=0, after=None):
+        """
+        Get a page of jobs ordered by job id.
+
+        Seeks to the start of the page with a binary search over the sorted job ids
+        so the cost of a page does not depend on how deep into the job set it starts.
+
+        :param count: The maximum number of jobs to return
+        :param skip: The number of jobs to skip after the starting position
+        :param after: Only return jobs with ids that sort after this id; starts from the first job if not specified
+        :returns: A list of jobs ordered by job id
+        """
+        job_ids, jobs = self._ordered
+        start = skip if after is None else bisect.bisect_right(job_ids, after) + skip
+        return [jobs[job_id] for job_id in job_ids[start:start + count]]
+
+    def iter_page(self, count=None, skip=0, after=None):
+        """
+        Iterate a page of jobs ordered by job id.
+
+        Like get_page() but yields jobs one at a time from the job snapshot current at the time of the call,
+        so iterating a large page does not copy it; jobs created or deleted during iteration are not reflected.
+
+        :param count: The maximum number of jobs to yield; yields all remaining jobs if not specified
+        :param skip: The number of jobs to skip after the starting position
+        :param after: Only yield jobs with ids that sort after this id; starts from the first job if not specified
+        :returns: An iterator that yields jobs ordered by job id
+        """
+        job_ids, jobs = self._ordered
+        start = skip if after is None else bisect.bisect_right(job_ids, after) + skip
+        stop = len(job_ids) if count is None else min(len(job_ids), start + count)
+        return (jobs[job_ids[i]] for i in range(start, stop))
 
-    @_sync
     def get(self, job_id):
         """
         Get a job by id.
@@ -93,59 +221,398 @@ class Jobs:
         :param job_id: The id of the job to get
         :returns: The job for the given id
         :raises: JobNotFound if job not found
+        :raises: InvalidJobData if the job was loaded lazily and its stored data fails validation
         """
-        if job_id not in self._jobs:
-            raise JobNotFound(job_id)
-        return self._jobs[job_id]
+        try:
+            job = self._jobs[job_id]
+        except KeyError:
+            raise JobNotFound(job_id) from None
+        if not job.hydrated:
+            job.hydrate()
+        return job
+
+    def find(self, task_definition=None, suspended=None, trigger_type=None, queue_name=None,
+             last_run_since=None, last_run_until=None, next_run_since=None, next_run_until=None):
+        """
+        Find jobs matching all of the given criteria.
+
+        Criteria that are not specified are not used for matching.
+        Time ranges include their start and exclude their end;
+        jobs without a value for a ranged field never match a range on that field.
+
+        :param task_definition: Task definition name
+        :param suspended: Suspended flag
+        :param trigger_type: Trigger type, e.g. sqs
+        :param queue_name: Trigger queue name
+        :param last_run_since: Earliest last run time
+        :param last_run_until: Latest last run time
+        :param next_run_since: Earliest estimated next run time
+        :param next_run_until: Latest estimated next run time
+        :returns: A list of matching jobs ordered by job id
+        """
+        criteria = {
+            'task_definition': task_definition,
+            'suspended': suspended,
+            'trigger_type': trigger_type,
+            'queue_name': queue_name
+        }
+        ranges = {
+            'last_run': (last_run_since, last_run_until),
+            'next_run': (next_run_since, next_run_until)
+        }
+        with self._lock:
+            job_ids = self._index.find(
+                {k: v for k, v in criteria.items() if v is not None},
+                {k: v for k, v in ranges.items() if v != (None, None)})
+            jobs = self._jobs.values() if job_ids is None else (self._jobs[job_id] for job_id in job_ids)
+            return sorted(jobs, key=lambda j: j.id)
+
+    def next_runs(self, until, since=None):
+        """
+        Find jobs whose estimated next run falls within a time range.
+
+        :param until: Latest estimated next run time, exclusive
+        :param since: Earliest estimated next run time, inclusive; unbounded if not specified
+        :returns: A list of matching jobs ordered by estimated next run time
+        """
+        with self._lock:
+            return [self._jobs[job_id] for job_id in self._index.next_runs(until, since)]
 
-    @_sync
     def create(self, job_data):
         """
         Create a new job.
 
+        The job store write happens outside the data context lock
+        so slow stores do not block other job operations;
+        the store rejects the write if another caller created the job first.
+
         :param job_data: Data dictionary for the new job
         :returns: The newly created job
         :raises: JobAlreadyExists if job already exists
         :raises: InvalidJobData if job fields fail validation
         :raises: JobPersistenceError if job creation fails
         """
-        job = self._create_job(job_data)
-        if job.id in self._jobs:
-            raise JobAlreadyExists(job.id)
+        with self._lock:
+            job = self._create_job(job_data)
+            if job.id in self._jobs:
+                raise JobAlreadyExists(job.id)
+            stored_data = self._schema.dump_data(job.data)
         try:
-            self._store.create(job.id, self._schema.dump(job.data).data)
+            revision = self._store.create(job.id, stored_data)
+        except persistence.WriteConflict as ex:
+            raise JobAlreadyExists(job.id) from ex
         except Exception as ex:
             # TODO: inner exception not printed in flask logs :(
             raise JobPersistenceError(job.id) from ex
-        self._jobs[job.id] = job
+        job._update_data({'revision': revision})
+        self._commit(created=[job])
         return job
 
-    @_sync
-    def delete(self, job_id):
+    def delete(self, job_id, revision=None):
         """
         Delete a job.
 
+        The job store write happens outside the data context lock.
+
         :param job_id: The id of the job to delete
+        :param revision: Expected current job revision; the delete is unconditional if not specified
         :raises: JobNotFound if job not found
+        :raises: JobConflict if the stored job is not at the expected revision
         :raises: JobPersistenceError if job deletion fails
         """
         if job_id not in self._jobs:
             raise JobNotFound(job_id)
         try:
-            self._store.delete(job_id)
+            self._store.delete(job_id, revision=revision)
+        except persistence.WriteConflict as ex:
+            raise JobConflict(job_id) from ex
         except Exception as ex:
             raise JobPersistenceError(job_id) from ex
-        del self._jobs[job_id]
+        job = self._jobs.get(job_id)
+        if job:
+            self._commit(deleted=[job])
+
+    def batch(self, ops):
+        """
+        Create, update and delete several jobs with a single job store write.
+
+        Every operation is validated before anything is written and only valid operations are written;
+        a failed operation does not prevent the rest of the batch from being applied.
+        The job store write happens outside the data context lock while holding the locks of the batch's jobs.
+
+        :param ops: Sequence of persistence.StoreOperations; job_data holds the unvalidated fields
+            of a job to create or update and the id of a job to create is taken from its fields
+        :returns: List of results aligned with ops; the created or updated job, None for a deleted job
+            and the JobError for each failed operation: InvalidJobData, JobNotFound, JobAlreadyExists,
+            JobConflict or JobPersistenceError
+        """
+        results = [None] * len(ops)
+        writes = []
+        job_ids = set()
+        for i, op in enumerate(ops):
+            try:
+                write = self._prepare_write(i, op)
+                if write.store_op.job_id in job_ids:
+                    raise InvalidJobData(write.store_op.job_id, {'id': ['Job appears more than once in the batch.']})
+            except JobError as ex:
+                results[i] = ex
+                continue
+            job_ids.add(write.store_op.job_id)
+            writes.append(write)
+        if not writes:
+            return results
+        with contextlib.ExitStack() as stack:
+            for lock in _job_locks.get_all(job_ids):
+                stack.enter_context(lock)
+            try:
+                store_results = persistence.bulk_write(self._store, [w.store_op for w in writes])
+            except Exception as ex:
+                store_results = [ex] * len(writes)
+            self._apply_writes(writes, store_results, results)
+        return results
+
+    def _prepare_write(self, index, op):
+        if op.action == persistence.StoreOperation.CREATE:
+            fields = self._validate(op.job_data)
+            if fields['id'] in self._jobs:
+                raise JobAlreadyExists(fields['id'])
+            store_op = persistence.StoreOperation.create(fields['id'], self._schema.dump_data(fields))
+            return _BatchWrite(index, store_op, fields, None)
+        job = self._jobs.get(op.job_id)
+        if job is None:
+            raise JobNotFound(op.job_id)
+        if op.action == persistence.StoreOperation.DELETE:
+            return _BatchWrite(index, persistence.StoreOperation.delete(job.id, op.revision), None, job)
+        if not job.hydrated:
+            job.hydrate()
+        fields, errors = _job_schema.load(op.job_data)
+        if errors:
+            raise InvalidJobData(job.id, errors)
+        store_op = persistence.StoreOperation.update(job.id, _job_schema.dump_data(fields), op.revision)
+        return _BatchWrite(index, store_op, fields, job)
 
-    def _fill(self):
-        parsed_jobs = (self._create_job(raw_data) for raw_data in self._store.load_all())
-        self._jobs = {job.id: job for job in parsed_jobs}
+    def _apply_writes(self, writes, store_results, results):
+        created = []
+        deleted = []
+        with self._lock:
+            for write, result in zip(writes, store_results):
+                op = write.store_op
+                if isinstance(result, Exception):
+                    results[write.index] = _store_write_error(op, result)
+                elif op.action == persistence.StoreOperation.CREATE:
+                    results[write.index] = self._make_job({**write.fields, 'revision': result})
+                    created.append(results[write.index])
+                elif op.action == persistence.StoreOperation.UPDATE:
+                    write.job._update_data({**write.fields, 'revision': result})
+                    results[write.index] = write.job
+                else:
+                    deleted.append(write.job)
+            if created or deleted:
+                self._commit(created, deleted)
+
+    def _fill(self, cache=None):
+        self._quarantined = []
+        if self._lazy and not cache:
+            self._fill_lazy()
+            return
+        if cache:
+            job_data = cache.load_jobs(self._store, self._load_or_quarantine)
+        elif self._processes > 1:
+            job_data = {data['id']: data for data in self._load_parallel()}
+        else:
+            loaded = map(self._load_or_quarantine, self._store.load_all())
+            job_data = {data['id']: data for data in loaded if data is not None}
+        with self._lock:
+            self._publish({job_id: self._make_job(data) for job_id, data in job_data.items()}, sorted(job_data))
+            self._rebuild_index()
+
+    def _fill_lazy(self):
+        records = {stored_data['id']: stored_data for stored_data in self._store.load_all()}
+        with self._lock:
+            self._publish({job_id: Job(stored_data, self._store, on_change=self._reindex, hydrate=self._load_job_data)
+                for job_id, stored_data in records.items()}, sorted(records))
+            self._rebuild_index()
+        _logger.info('Lazily loaded %s jobs', len(records))
+
+    def _rebuild_index(self):
+        # NOTE: indexes the raw stored fields of lazily loaded jobs without hydrating them
+        self._index = _JobIndex()
+        for job_id, job in self._jobs.items():
+            self._index.add(job_id, job._data)
+
+    def _commit(self, created=(), deleted=()):
+        # NOTE: changes queued while another writer holds the lock are published with that writer's snapshot
+        self._changes.append((created, deleted))
+        with self._lock:
+            if not self._changes:
+                return
+            jobs = dict(self._jobs)
+            changed_ids = set()
+            while self._changes:
+                created, deleted = self._changes.popleft()
+                for job in deleted:
+                    if jobs.get(job.id) is job:
+                        del jobs[job.id]
+                        self._index.remove(job.id)
+                        changed_ids.add(job.id)
+                for job in created:
+                    jobs[job.id] = job
+                    self._index.add(job.id, job._data)
+                    changed_ids.add(job.id)
+            if changed_ids:
+                self._publish(jobs, _updated_ids(self._ordered[0], jobs, changed_ids))
+
+    def _publish(self, jobs, job_ids):
+        # NOTE: callers hold the lock; readers pick up the new snapshot with a single reference read.
+        # The sorted id list is published with the jobs it indexes and is never modified afterwards.
+        self._jobs = types.MappingProxyType(jobs)
+        self._ordered = (job_ids, self._jobs)
+        self._version += 1
+        self._revision += 1
 
     def _create_job(self, raw_data):
+        return self._make_job(self._validate(raw_data))
+
+    def _make_job(self, job_data):
+        return Job(job_data, self._store, on_change=self._reindex)
+
+    def _reindex(self, job, old_data):
+        with self._lock:
+            # NOTE: skip jobs that are not (or no longer) part of the job set
+            if self._jobs.get(job.id) is job:
+                self._index.add(job.id, job._data)
+                self._revision += 1
+
+    def _load_parallel(self):
+        records = iter(self._store.load_all())
+        chunks = iter(lambda: list(itertools.islice(records, self._chunk_size)), [])
+        # NOTE: keep a bounded window of chunks in flight so the store is only read as fast as workers validate
+        window = collections.deque()
+        max_pending = self._processes * 2
+        with concurrent.futures.ProcessPoolExecutor(self._processes) as pool:
+            try:
+                for chunk in chunks:
+                    window.append(pool.submit(_validate_chunk, chunk))
+                    if len(window) >= max_pending:
+                        yield from self._validated_chunk(window.popleft().result())
+                while window:
+                    yield from self._validated_chunk(window.popleft().result())
+            finally:
+                for future in window:
+                    future.cancel()
+
+    def _validated_chunk(self, results):
+        for job_data, errors in results:
+            if not errors:
+                yield job_data
+            elif self._quarantine:
+                self._quarantine_job(InvalidJobData(job_data.get('id'), errors))
+            else:
+                raise InvalidJobData(job_data.get('id'), errors)
+
+    def _load_or_quarantine(self, stored_data):
+        if not self._quarantine:
+            return self._load_job_data(stored_data)
+        try:
+            return self._load_job_data(stored_data)
+        except InvalidJobData as ex:
+            self._quarantine_job(ex)
+            return None
+
+    def _quarantine_job(self, error):
+        _logger.warning('Quarantined invalid stored job %s: %s', error.job_id, error.errors)
+        self._quarantined.append(error)
+
+    def _load_job_data(self, stored_data):
+        job_data = self._validate(stored_data)
+        job_data['revision'] = stored_data.get('revision', 0)
+        return job_data
+
+    def _validate(self, raw_data):
         job_data, errors = self._schema.load(raw_data)
         if errors:
             raise InvalidJobData(job_data.get('id'), errors)
-        return Job(job_data, self._store)
+        return job_data
+
+
+def _updated_ids(job_ids, jobs, changed_ids):
+    if len(changed_ids) > _MAX_ID_INSERTS:
+        return list(heapq.merge((job_id for job_id in job_ids if job_id not in changed_ids),
+                                sorted(job_id for job_id in changed_ids if job_id in jobs)))
+    job_ids = list(job_ids)
+    for job_id in changed_ids:
+        i = bisect.bisect_left(job_ids, job_id)
+        listed = i < len(job_ids) and job_ids[i] == job_id
+        if job_id in jobs and not listed:
+            job_ids.insert(i, job_id)
+        elif job_id not in jobs and listed:
+            del job_ids[i]
+    return job_ids
+
+
+def _store_write_error(op, ex):
+    if isinstance(ex, persistence.WriteConflict):
+        conflict = JobAlreadyExists if op.action == persistence.StoreOperation.CREATE else JobConflict
+        error = conflict(op.job_id)
+    else:
+        error = JobPersistenceError(op.job_id)
+    error.__cause__ = ex
+    return error
+
+
+_BatchWrite = collections.namedtuple('_BatchWrite', ['index', 'store_op', 'fields', 'job'])
+
+
+class _LockPool:
+    """Reentrant locks per key that only exist while a thread holds or waits for them."""
+    def __init__(self):
+        self._mutex = Lock()
+        self._locks = {}
+
+    def get(self, key):
+        return _PooledLock(self, key)
+
+    def get_all(self, keys):
+        # NOTE: always ordered by key so callers holding several locks cannot deadlock each other
+        return [self.get(key) for key in sorted(set(keys))]
+
+    def _acquire(self, key):
+        with self._mutex:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [RLock(), 0]
+            entry[1] += 1
+        entry[0].acquire()
+
+    def _release(self, key):
+        with self._mutex:
+            entry = self._locks[key]
+            entry[0].release()
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+
+class _PooledLock:
+    __slots__ = ('_pool', '_key')
+
+    def __init__(self, pool, key):
+        self._pool = pool
+        self._key = key
+
+    def __enter__(self):
+        self._pool._acquire(self._key)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._pool._release(self._key)
+
+
+# NOTE: marshmallow schemas create per-call marshalling state so one instance is safe to share between threads
+_job_schema = JobSchema()
+_job_locks = _LockPool()
+# NOTE: next() on a count is atomic under the GIL so data versions are unique across all jobs
+_data_versions = itertools.count(1)
 
 
 class Job:
@@ -153,10 +620,13 @@ class Job:
     A persistent job representing an ECS scheduled task.
 
     Stored and retrieved by a Jobs data context.
+    Jobs share a single job schema and only hold a lock object
+    while the job is being changed, to keep the per-job memory footprint small.
     """
-    _RESERVED_FIELDS = {'id'}
+    __slots__ = ('_data', '_mapping', '_version', '_store', '_on_change', '_hydrate')
+    _RESERVED_FIELDS = {'id', 'revision'}
 
-    def __init__(self, data, store):
+    def __init__(self, data, store, on_change=None, hydrate=None):
         """
         Create a persistent job.
 
@@ -165,12 +635,21 @@ class Job:
 
         :param data: The job fields that make up the job
         :param store: The data store to use for persistence, provided by the Jobs instance
+        :param on_change: Callable invoked with the job and its previous data after the job data changes,
+            provided by the Jobs instance
+        :param hydrate: Callable that validates and parses the job data on first access,
+            provided by the Jobs instance when loading lazily; data is the raw stored record if specified
         """
-        self._schema = JobSchema()
         self._data = data
         self._mapping = JobDataMapping(self._data)
-        self._lock = RLock()
+        self._version = next(_data_versions)
         self._store = store
+        self._on_change = on_change
+        self._hydrate = hydrate
+
+    @property
+    def _lock(self):
+        return _job_locks.get(self.id)
 
     @property
     def id(self):
@@ -181,15 +660,69 @@ class Job:
         """
         return self._data['id']
 
+    @property
+    def revision(self):
+        """
+        Get the job revision.
+
+        The revision is set by the job store and changes on every persisted update.
+
+        :returns: The job revision number
+        """
+        return self._data.get('revision', 0)
+
+    @property
+    def version(self):
+        """
+        Get the job data version.
+
+        Unlike the revision the version is not persisted; it changes every time the job data changes,
+        including annotations, and is never reused by another job.
+
+        :returns: The job data version number
+        """
+        return self._version
+
+    @property
+    def hydrated(self):
+        """
+        Get whether the job data has been validated and parsed.
+
+        :returns: False if the job was loaded lazily and its data has not been accessed yet, otherwise True
+        """
+        return self._hydrate is None
+
     @property
     def data(self):
         """
         Get a read-only view of the job data.
 
         :returns: The job data read-only dict
+        :raises: InvalidJobData if the job was loaded lazily and its stored data fails validation
         """
+        if self._hydrate is not None:
+            self.hydrate()
         return self._mapping
 
+    def hydrate(self):
+        """
+        Validate and parse lazily loaded job data if that has not happened yet.
+
+        Hydrated jobs return without taking the job lock.
+
+        :raises: InvalidJobData if the stored job data fails validation
+        """
+        if self._hydrate is None:
+            return
+        with self._lock:
+            # NOTE: checked again under the lock in case another thread hydrated the job while this one waited
+            if self._hydrate is None:
+                return
+            job_data = self._hydrate(self._data)
+            self._update_data(job_data, replace=True)
+            # NOTE: cleared last so lock-free readers never see the raw record as hydrated data
+            self._hydrate = None
+
     @property
     def suspended(self):
         """
@@ -209,23 +742,33 @@ class Job:
         """
         return self.data['parsedSchedule']
 
-    @_sync
-    def update(self, fields):
+    def update(self, fields, revision=None):
         """
         Update the job.
 
+        Fields are validated before taking the job lock; the lock is then held
+        across the store write so updates of the same job are applied in store order,
+        but it is never shared with other jobs.
+
         :param fields: Fields to update on the given job
+        :param revision: Expected current job revision; the update is unconditional if not specified
         :raises: InvalidJobData if job data fails field validation
+        :raises: JobConflict if the stored job is not at the expected revision
         :raises: JobPersistenceError if job update fails
         """
-        validated_fields, errors = self._schema.load(fields)
+        self.hydrate()
+        validated_fields, errors = _job_schema.load(fields)
         if errors:
             raise InvalidJobData(self.id, errors)
-        try:
-            self._store.update(self.id, self._schema.dump(validated_fields).data)
-        except Exception as ex:
-            raise JobPersistenceError(self.id) from ex
-        self._update_data(validated_fields)
+        stored_fields = _job_schema.dump_data(validated_fields)
+        with self._lock:
+            try:
+                new_revision = self._store.update(self.id, stored_fields, revision=revision)
+            except persistence.WriteConflict as ex:
+                raise JobConflict(self.id) from ex
+            except Exception as ex:
+                raise JobPersistenceError(self.id) from ex
+            self._update_data({**validated_fields, 'revision': new_revision})
 
     @_sync
     def annotate(self, fields):
@@ -240,8 +783,8 @@ class Job:
         :raises: JobFieldsRequirePersistence if attempting to set persistent fields
         :raises: ImmutableJobFields if attempting to set immutable fields
         """
-        persisted_data, errors = self._schema.load(fields)
-        persisted_fields = persisted_data.keys() | errors.keys()
+        self.hydrate()
+        persisted_fields = _job_schema.loaded_fields(fields)
         if persisted_fields:
             raise JobFieldsRequirePersistence(self.id, persisted_fields)
 
@@ -251,12 +794,88 @@ class Job:
 
         self._update_data(fields)
 
-    def _update_data(self, fields):
-        self._data.update(fields)
+    def _update_data(self, fields, replace=False):
+        # NOTE: copy-on-write so readers iterating the previous data are not disturbed
+        old_data = self._data
+        self._data = fields if replace else {**old_data, **fields}
+        self._mapping = JobDataMapping(self._data)
+        self._version = next(_data_versions)
+        if self._on_change:
+            self._on_change(self, old_data)
+
+
+class _JobIndex:
+    # NOTE: not thread-safe; guarded by the owning Jobs lock
+    _FIELDS = {
+        'task_definition': lambda data: data.get('taskDefinition'),
+        'suspended': lambda data: data.get('suspended', False),
+        'trigger_type': lambda data: (data.get('trigger') or {}).get('type'),
+        'queue_name': lambda data: (data.get('trigger') or {}).get('queueName')
+    }
+    _RANGES = {
+        'last_run': 'lastRun',
+        'next_run': 'estimatedNextRun'
+    }
+
+    def __init__(self):
+        self._values = {name: collections.defaultdict(set) for name in self._FIELDS}
+        self._ranges = {name: [] for name in self._RANGES}
+        # NOTE: the indexed values of each job so entries are removed by job id;
+        # a job's data may already have been replaced by the time its entries are removed
+        self._keys = {}
+
+    def add(self, job_id, data):
+        self.remove(job_id)
+        values = tuple(key(data) for key in self._FIELDS.values())
+        bounds = tuple(data.get(field) for field in self._RANGES.values())
+        for name, value in zip(self._FIELDS, values):
+            self._values[name][value].add(job_id)
+        for name, value in zip(self._RANGES, bounds):
+            if value is not None:
+                bisect.insort(self._ranges[name], (value, job_id))
+        self._keys[job_id] = values, bounds
+
+    def remove(self, job_id):
+        keys = self._keys.pop(job_id, None)
+        if keys is None:
+            return
+        values, bounds = keys
+        for name, value in zip(self._FIELDS, values):
+            ids = self._values[name].get(value)
+            if ids is not None:
+                ids.discard(job_id)
+                if not ids:
+                    del self._values[name][value]
+        for name, value in zip(self._RANGES, bounds):
+            if value is not None:
+                entries = self._ranges[name]
+                i = bisect.bisect_left(entries, (value, job_id))
+                if i < len(entries) and entries[i] == (value, job_id):
+                    del entries[i]
+
+    def find(self, criteria, ranges=None):
+        if not criteria and not ranges:
+            return None
+        matches = [self._values[name].get(value, set()) for name, value in criteria.items()]
+        matches.extend(set(self.range(name, *bounds)) for name, bounds in (ranges or {}).items())
+        matches.sort(key=len)
+        return set.intersection(*matches)
+
+    def range(self, name, since=None, until=None):
+        # NOTE: a 1-tuple sorts before every entry with the same value so job ids at the boundaries do not matter
+        entries = self._ranges[name]
+        start = 0 if since is None else bisect.bisect_left(entries, (since,))
+        end = len(entries) if until is None else bisect.bisect_left(entries, (until,), lo=start)
+        return [job_id for _, job_id in entries[start:end]]
+
+    def next_runs(self, until, since=None):
+        return self.range('next_run', since, until)
 
 
 class JobDataMapping(collections.abc.Mapping):
     """A read-only dictionary wrapper for job data."""
+    __slots__ = ('_data',)
+
     def __init__(self, data):
         """
         Create a mapping for the given dictionary.
@@ -315,6 +934,11 @@ class JobAlreadyExists(JobError):
     pass
 
 
+class JobConflict(JobError):
+    """Error for a job write that expected a different job revision."""
+    pass
+
+
 class JobPersistenceError(JobError):
     """
     General error for job persistence failures.
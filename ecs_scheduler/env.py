@@ -1,6 +1,7 @@
 """ECS scheduler initialization helper methods."""
 import os
 import logging
+import functools
 import logging.handlers
 
 import setuptools_scm
@@ -30,9 +31,12 @@ def get_var(name, required=False, default=None):
     return val.format(**os.environ) if val else val
 
 
+@functools.lru_cache(maxsize=None)
 def get_version():
     """
     Get the current application version.
+
+    The version is resolved once per process since setuptools_scm may call out to git.
     """
     # TODO: remove hardcoded version once package can be built for docker
     try:
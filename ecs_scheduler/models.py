@@ -4,6 +4,8 @@ Miscellaneous model classes.
 JobOperation communicates updates between the webapi and scheduler.
 
 Pagination is a simple model object for webapi pagination operations.
+
+JobQuery is a simple model object for webapi job filtering, sorting and projection.
 """
 class JobOperation:
     """
@@ -13,10 +15,12 @@ class JobOperation:
     :attribute ADD: Add operation label
     :attribute MODIFY: Modify operation label
     :attribute REMOVE: Remove operation label
+    :attribute BATCH: Batch operation label
     """
     ADD = 1
     MODIFY = 2
     REMOVE = 3
+    BATCH = 4
     
     @classmethod
     def add(cls, job_id):
@@ -45,22 +49,33 @@ class JobOperation:
         """
         return cls(cls.REMOVE, job_id)
 
-    def __init__(self, operation, job_id):
+    @classmethod
+    def batch(cls, job_ops):
+        """
+        Create a batch job operation.
+
+        :param job_ops: The add, modify and remove job operations to apply to the scheduler together
+        """
+        return cls(cls.BATCH, None, job_ops)
+
+    def __init__(self, operation, job_id, job_ops=None):
         """
         Create a job operation.
 
         Use the factory class methods instead of __init___ directly to create an instance.
 
         :param operation: The operation label
-        :param job_id: The string id of the job to apply the operation to
+        :param job_id: The string id of the job to apply the operation to; None for batch operations
+        :param job_ops: The job operations of a batch operation
         """
         self.operation = operation
         self.job_id = job_id
+        self.job_ops = job_ops or []
 
 
 class Pagination:
     """Job pagination parameters."""
-    def __init__(self, skip, count, total=0):
+    def __init__(self, skip, count, total=0, cursor=None):
         """
         Create a pagination object.
 
@@ -68,7 +83,35 @@ class Pagination:
         :param count: The number of jobs to return
         :param total: The total number of jobs across all pages.
             Used to calculate next and prev page links
+        :param cursor: The id of the last job on the previous page for keyset pagination;
+            None for offset pagination
         """
         self.skip = skip
         self.count = count
         self.total = total
+        self.cursor = cursor
+
+
+class JobQuery:
+    """Job listing query parameters."""
+    def __init__(self, criteria=None, sort=None, fields=None):
+        """
+        Create a job query.
+
+        :param criteria: Dictionary of Jobs.find() keyword arguments to filter jobs by
+        :param sort: Name of the job field to order jobs by, prefixed by '-' for descending order;
+            orders jobs by id if not specified
+        :param fields: Names of the job fields to return; returns all fields if not specified
+        """
+        self.criteria = criteria or {}
+        self.sort = sort
+        self.fields = fields
+
+    @property
+    def filtered(self):
+        """
+        Get whether the query filters or reorders jobs.
+
+        :returns: True if the query has criteria or a sort other than job id, otherwise False
+        """
+        return bool(self.criteria) or self.sort not in (None, 'id')
@@ -3,20 +3,85 @@ import logging
 import posixpath
 import collections
 import json
+import gzip
 import sqlite3
 import os
+import time
+import uuid
+import queue
+import threading
+import contextlib
+import decimal
+import concurrent.futures
+import importlib
 from datetime import datetime
 
-import boto3
-import botocore.exceptions
-import elasticsearch
-import elasticsearch.helpers
-import yaml
-
 from . import env
 
 
 _logger = logging.getLogger(__name__)
+_ENTRY_POINT_GROUP = 'ecs_scheduler.stores'
+_env_factories = {}
+_config_factories = {}
+
+
+class _LazyModule:
+    """
+    Module placeholder that imports the real module on first attribute access.
+
+    Keeps store client libraries from being imported unless their store is used.
+    Submodules that the parent package does not import itself are imported on demand.
+    """
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        module = importlib.import_module(self._name)
+        try:
+            return getattr(module, attr)
+        except AttributeError:
+            submodule = f'{self._name}.{attr}'
+            try:
+                return importlib.import_module(submodule)
+            except ModuleNotFoundError as ex:
+                if ex.name != submodule:
+                    raise
+                raise AttributeError(attr) from None
+
+
+boto3 = _LazyModule('boto3')
+botocore = _LazyModule('botocore')
+elasticsearch = _LazyModule('elasticsearch')
+yaml = _LazyModule('yaml')
+_metadata = _LazyModule('importlib.metadata')
+
+
+def register_env_store(env_var, factory):
+    """
+    Register a data store selected by an environment variable.
+
+    Stores are checked in registration order and the first one
+    whose environment variable is set is created.
+
+    :param env_var: Name of the env variable (sans ECSS_ prefix) that selects the store
+    :param factory: Callable taking the env variable value and returning the data store
+    """
+    _env_factories[env_var] = factory
+
+
+def register_config_store(key, factory):
+    """
+    Register a data store selected by a top-level configuration file key.
+
+    Stores not registered here are looked up by key among the
+    ecs_scheduler.stores setuptools entry points.
+
+    :param key: The configuration file key that selects the store
+    :param factory: Callable taking the key's configuration mapping and returning the data store
+    """
+    _config_factories[key] = factory
 
 
 def resolve():
@@ -25,34 +90,147 @@ def resolve():
 
     :returns: A data store implementation
     """
-    env_factories = {
-        'S3_BUCKET': lambda ev: S3Store(ev, prefix=env.get_var('S3_PREFIX')),
-        'DYNAMODB_TABLE': lambda ev: DynamoDBStore(ev),
-        'SQLITE_FILE': lambda ev: SQLiteStore(ev),
-        'ELASTICSEARCH_INDEX': lambda ev: ElasticsearchStore(ev, **{
-            'hosts': [h.strip() for h in env.get_var('ELASTICSEARCH_HOSTS', required=True).split(',')]
-        })
-    }
-    for env_var, factory in env_factories.items():
+    for env_var, factory in _env_factories.items():
         env_value = env.get_var(env_var)
         if env_value:
             return factory(env_value)
 
-    conf_factories = {
-        'elasticsearch': lambda kwargs: ElasticsearchStore(kwargs['index'], **kwargs['client'])
-    }
     config_file = env.get_var('CONFIG_FILE')
     if config_file:
         with open(config_file) as f:
             conf = yaml.safe_load(f)
-            for key, factory in conf_factories.items():
-                kwargs = conf.get(key)
-                if kwargs:
+            for key, kwargs in conf.items():
+                if not kwargs:
+                    continue
+                factory = _config_factories.get(key) or _entry_point_factory(key)
+                if factory:
                     return factory(kwargs)
 
     return NullStore()
 
 
+def _entry_point_factory(key):
+    entry_points = _metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        group = entry_points.select(group=_ENTRY_POINT_GROUP)
+    else:
+        group = entry_points.get(_ENTRY_POINT_GROUP, ())
+    for entry_point in group:
+        if entry_point.name == key:
+            _logger.info('Loading data store "%s" from %s', key, entry_point.value)
+            store_factory = entry_point.load()
+            return lambda kwargs: store_factory(**kwargs)
+    return None
+
+
+register_env_store('S3_BUCKET', lambda ev: S3Store(ev, **{
+    'prefix': env.get_var('S3_PREFIX'),
+    'concurrency': env.get_var('S3_CONCURRENCY'),
+    'snapshot_interval': env.get_var('S3_SNAPSHOT_INTERVAL')
+}))
+register_env_store('DYNAMODB_TABLE', lambda ev: DynamoDBStore(ev, scan_segments=env.get_var('DYNAMODB_SCAN_SEGMENTS')))
+register_env_store('SQLITE_FILE', lambda ev: SQLiteStore(ev, **{
+    'synchronous': env.get_var('SQLITE_SYNCHRONOUS'),
+    'cache_size': env.get_var('SQLITE_CACHE_SIZE'),
+    'mmap_size': env.get_var('SQLITE_MMAP_SIZE')
+}))
+register_env_store('ELASTICSEARCH_INDEX', lambda ev: ElasticsearchStore(ev, **{
+    'hosts': [h.strip() for h in env.get_var('ELASTICSEARCH_HOSTS', required=True).split(',')]
+}))
+register_config_store('elasticsearch', lambda kwargs: ElasticsearchStore(kwargs['index'], bulk_chunk_size=kwargs.get('bulk_chunk_size'), **kwargs['client']))
+
+
+class StoreOperation(collections.namedtuple('StoreOperation', ['action', 'job_id', 'job_data', 'revision'])):
+    """
+    A single job store write used for batched writes.
+
+    Stores that can apply several writes in one round trip implement
+    bulk_write(ops) taking a sequence of these operations.
+
+    :attribute CREATE: Create action label
+    :attribute UPDATE: Update action label
+    :attribute DELETE: Delete action label
+    """
+    __slots__ = ()
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+    @classmethod
+    def create(cls, job_id, job_data):
+        """
+        Create a create-job store operation.
+
+        :param job_id: Id of the job to create
+        :param job_data: Job contents
+        """
+        return cls(cls.CREATE, job_id, job_data, None)
+
+    @classmethod
+    def update(cls, job_id, job_data, revision=None):
+        """
+        Create an update-job store operation.
+
+        :param job_id: Id of the job to update
+        :param job_data: Job fields to update
+        :param revision: Expected current job revision; the write is unconditional if not specified
+        """
+        return cls(cls.UPDATE, job_id, job_data, revision)
+
+    @classmethod
+    def delete(cls, job_id, revision=None):
+        """
+        Create a delete-job store operation.
+
+        :param job_id: Id of the job to delete
+        :param revision: Expected current job revision; the write is unconditional if not specified
+        """
+        return cls(cls.DELETE, job_id, None, revision)
+
+
+class StoreOperationError(Exception):
+    """Error for a single failed operation within a bulk write."""
+    def __init__(self, op, details, *args, **kwargs):
+        """
+        Create a store operation error.
+
+        :param op: The StoreOperation that failed
+        :param details: Store-specific description of the failure
+        :param *args: Additional exception positional arguments
+        :param **kwargs: Additional exception keyword arugments
+        """
+        super().__init__(f'{op.action} failed for job {op.job_id}: {details}', *args, **kwargs)
+        self.op = op
+        self.details = details
+
+
+class WriteConflict(Exception):
+    """
+    Error for a conditional job write that did not match the stored job.
+
+    Raised when creating a job that already exists or when updating or deleting
+    a job whose stored revision differs from the expected revision.
+    """
+    def __init__(self, job_id, revision, *args, **kwargs):
+        """
+        Create a write conflict error.
+
+        :param job_id: Id of the job that failed to write
+        :param revision: The expected job revision, None for a create
+        :param *args: Additional exception positional arguments
+        :param **kwargs: Additional exception keyword arugments
+        """
+        expected = 'no existing job' if revision is None else f'revision {revision}'
+        super().__init__(f'Write conflict for job {job_id}; expected {expected}', *args, **kwargs)
+        self.job_id = job_id
+        self.revision = revision
+
+
+def _check_revision(job_id, current, expected):
+    if expected is not None and current != expected:
+        raise WriteConflict(job_id, expected)
+
+
 class NullStore:
     """
     Null data store.
@@ -60,33 +238,122 @@ class NullStore:
     Default data store if no other store is specified.
     This store loads nothing and saves nothing.
     Effectively implements an in-memory store.
+    Job revisions are tracked in memory so conditional writes behave as they do in other stores.
     """
     def __init__(self):
         _logger.warning('!!! Warning !!!: No registered persistence layer found; using null data store! '
                         'Jobs will not be saved when the application terminates!')
+        self._revisions = {}
+        self._lock = threading.Lock()
 
     def load_all(self):
         yield from {}.items()
 
     def create(self, job_id, job_data):
-        pass
+        with self._lock:
+            if job_id in self._revisions:
+                raise WriteConflict(job_id, None)
+            self._revisions[job_id] = 1
+            return 1
+
+    def update(self, job_id, job_data, revision=None):
+        with self._lock:
+            if job_id not in self._revisions:
+                raise LookupError(f'Job {job_id} not found')
+            _check_revision(job_id, self._revisions[job_id], revision)
+            self._revisions[job_id] += 1
+            return self._revisions[job_id]
+
+    def delete(self, job_id, revision=None):
+        with self._lock:
+            _check_revision(job_id, self._revisions.get(job_id), revision)
+            self._revisions.pop(job_id, None)
+
+    def bulk_write(self, ops):
+        return _apply_each(self, ops)
+
+
+def bulk_write(store, ops):
+    """
+    Apply a batch of job writes to a data store.
+
+    Uses the store's own bulk_write(ops) if it has one, otherwise applies the operations one at a time.
+
+    :param store: The data store to write to
+    :param ops: Sequence of StoreOperations to apply in order
+    :returns: List of results aligned with ops; the new job revision for each successful create or update,
+        None for each successful delete and the exception for each failed operation
+    """
+    store_bulk_write = getattr(store, 'bulk_write', None)
+    return store_bulk_write(ops) if store_bulk_write else _apply_each(store, ops)
 
-    def update(self, job_id, job_data):
-        pass
 
-    def delete(self, job_id):
-        pass
+def _apply_each(store, ops):
+    results = []
+    for op in ops:
+        try:
+            if op.action == StoreOperation.CREATE:
+                results.append(store.create(op.job_id, op.job_data))
+            elif op.action == StoreOperation.UPDATE:
+                results.append(store.update(op.job_id, op.job_data, revision=op.revision))
+            elif op.action == StoreOperation.DELETE:
+                results.append(store.delete(op.job_id, revision=op.revision))
+            else:
+                raise ValueError(f'Unknown store operation {op.action}')
+        except Exception as ex:
+            results.append(ex)
+    return results
 
 
 class SQLiteStore:
-    """SQLite data store."""
+    """
+    SQLite data store.
+
+    Connections are pooled and reused across calls; each connection is
+    checked out by a single thread at a time so the store is safe to use
+    from both webapi request threads and scheduler executor threads.
+    The database runs in WAL journal mode so readers do not block the writer.
+    Updates are merged inside SQLite with the JSON1 extension when available,
+    checking and incrementing the row revision in the same UPDATE statement;
+    otherwise the row is read and rewritten within one write transaction.
+    """
     _TABLE = 'jobs'
     _KEYCOL = 'id'
     _DATACOL = 'data'
+    _REVCOL = 'revision'
     _DATATYPE = 'JSONTEXT'
+    _SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+    _DEFAULT_POOL_SIZE = 8
+    _CACHED_STATEMENTS = 32
+    # NOTE: statement text is fixed so sqlite3's per-connection statement cache reuses prepared statements
+    _SELECT_ALL = f"SELECT {_KEYCOL}, {_DATACOL}, {_REVCOL} FROM {_TABLE}"
+    _INSERT = f"INSERT INTO {_TABLE} ({_KEYCOL}, {_DATACOL}, {_REVCOL}) VALUES (?, ?, 1)"
+    _SELECT_ONE = f"SELECT {_DATACOL}, {_REVCOL} FROM {_TABLE} WHERE {_KEYCOL} = ?"
+    _SELECT_REVISION = f"SELECT {_REVCOL} FROM {_TABLE} WHERE {_KEYCOL} = ?"
+    _UPDATE = f"UPDATE {_TABLE} SET {_DATACOL} = ?, {_REVCOL} = ? WHERE {_KEYCOL} = ?"
+    _MERGE_UPDATE = f"UPDATE {_TABLE} SET {_DATACOL} = json_set({_DATACOL}{{}}), {_REVCOL} = {_REVCOL} + 1 WHERE {_KEYCOL} = ?{{}}{{}}"
+    _MERGE_REVISION_CHECK = f" AND {_REVCOL} = ?"
+    _MERGE_RETURNING = f" RETURNING {_REVCOL}"
+    _MERGE_FIELD_ARGS = ', ?, json(?)'
+    _DELETE = f"DELETE FROM {_TABLE} WHERE {_KEYCOL} = ?"
+    _CONDITIONAL_DELETE = f"DELETE FROM {_TABLE} WHERE {_KEYCOL} = ? AND {_REVCOL} = ?"
+
+    def __init__(self, db_file, synchronous=None, cache_size=None, mmap_size=None, pool_size=_DEFAULT_POOL_SIZE):
+        """
+        Create store.
 
-    def __init__(self, db_file):
+        :param db_file: Path to the SQLite database file
+        :param synchronous: Optional synchronous pragma (OFF, NORMAL, FULL, EXTRA); defaults to NORMAL
+        :param cache_size: Optional cache_size pragma; negative values are in KiB, positive values in pages
+        :param mmap_size: Optional mmap_size pragma in bytes
+        :param pool_size: Maximum number of idle connections kept open for reuse
+        :raises: ValueError if a pragma value is invalid
+        """
         self._db_file = db_file
+        self._pragmas = self._build_pragmas(synchronous, cache_size, mmap_size)
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._json1 = False
+        self._returning = sqlite3.sqlite_version_info >= (3, 35, 0)
         sqlite3.register_adapter(dict, self._store_job_data)
         sqlite3.register_converter(self._DATATYPE, self._load_job_data)
         self._ensure_table()
@@ -99,8 +366,8 @@ class SQLiteStore:
         """
         _logger.info('Loading jobs from SQLite database %s', self._db_file)
         with self._connection() as conn:
-            for job_id, job_data in conn.execute(f"SELECT * FROM {self._TABLE}"):
-                yield {'id': job_id, **job_data}
+            for job_id, job_data, revision in conn.execute(self._SELECT_ALL):
+                yield {'id': job_id, **job_data, 'revision': revision}
 
     def create(self, job_id, job_data):
         """
@@ -108,78 +375,257 @@ class SQLiteStore:
 
         :param job_id: Job row id
         :param job_data: Job row contents
+        :returns: The new job revision
+        :raises: WriteConflict if the job row already exists
         """
         with self._connection() as conn:
-            conn.execute(f"INSERT INTO {self._TABLE} VALUES (?, ?)", (job_id, job_data))
+            return self._insert(conn, job_id, job_data)
 
-    def update(self, job_id, job_data):
+    def update(self, job_id, job_data, revision=None):
         """
         Update existing job row.
 
         :param job_id: Job row id
         :param job_data: Job row body
+        :param revision: Expected current job revision; the update is unconditional if not specified
+        :returns: The new job revision
+        :raises: LookupError if the job row does not exist
+        :raises: WriteConflict if the job row is not at the expected revision
         """
         with self._connection() as conn:
-            cur = conn.execute(
-                f"SELECT * FROM {self._TABLE} WHERE {self._KEYCOL} = ?",
-                (job_id,))
-            current_data = cur.fetchone()[1]
-            current_data.update(job_data)
-            conn.execute(
-                f"UPDATE {self._TABLE} SET {self._DATACOL} = ? WHERE {self._KEYCOL} = ?",
-                (current_data, job_id))
+            # NOTE: a single merge statement is atomic on its own; otherwise the revision is checked in a transaction
+            if not (self._json1 and self._returning):
+                conn.execute('BEGIN IMMEDIATE')
+            return self._update_row(conn, job_id, job_data, revision)
 
-    def delete(self, job_id):
+    def delete(self, job_id, revision=None):
         """
         Delete a job row.
 
         :param job_id: Job row id
+        :param revision: Expected current job revision; the delete is unconditional if not specified
+        :raises: WriteConflict if the job row is not at the expected revision
         """
         with self._connection() as conn:
-            conn.execute(f"DELETE FROM {self._TABLE} WHERE {self._KEYCOL} = ?", (job_id,))
+            self._delete_row(conn, job_id, revision)
+
+    def bulk_write(self, ops):
+        """
+        Apply a batch of job writes in a single transaction.
 
+        Each operation runs under its own savepoint so a failed operation
+        is rolled back without discarding the rest of the batch.
+
+        :param ops: Sequence of StoreOperations to apply in order
+        :returns: List of results aligned with ops; the new job revision for each successful create or update,
+            None for each successful delete and the exception for each failed operation
+        """
+        results = []
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for op in ops:
+                conn.execute('SAVEPOINT job_op')
+                try:
+                    results.append(self._apply(conn, op))
+                except Exception as ex:
+                    conn.execute('ROLLBACK TO job_op')
+                    results.append(ex)
+                conn.execute('RELEASE job_op')
+        return results
+
+    def close(self):
+        """Close all idle pooled connections."""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+    def _apply(self, conn, op):
+        if op.action == StoreOperation.CREATE:
+            return self._insert(conn, op.job_id, op.job_data)
+        elif op.action == StoreOperation.UPDATE:
+            return self._update_row(conn, op.job_id, op.job_data, op.revision)
+        elif op.action == StoreOperation.DELETE:
+            return self._delete_row(conn, op.job_id, op.revision)
+        else:
+            raise ValueError(f'Unknown store operation {op.action}')
+
+    def _insert(self, conn, job_id, job_data):
+        try:
+            conn.execute(self._INSERT, (job_id, job_data))
+        except sqlite3.IntegrityError as ex:
+            raise WriteConflict(job_id, None) from ex
+        return 1
+
+    def _update_row(self, conn, job_id, job_data, revision):
+        if self._json1:
+            return self._merge_update(conn, job_id, job_data, revision)
+        # NOTE: callers hold a write transaction so the revision check and the update are atomic
+        row = conn.execute(self._SELECT_ONE, (job_id,)).fetchone()
+        if row is None:
+            raise LookupError(f'Job row {job_id} not found')
+        data, current_revision = row
+        _check_revision(job_id, current_revision, revision)
+        conn.execute(self._UPDATE, ({**data, **job_data}, current_revision + 1, job_id))
+        return current_revision + 1
+
+    def _merge_update(self, conn, job_id, job_data, revision):
+        sql = self._MERGE_UPDATE.format(self._MERGE_FIELD_ARGS * len(job_data),
+            '' if revision is None else self._MERGE_REVISION_CHECK,
+            self._MERGE_RETURNING if self._returning else '')
+        args = []
+        for key, value in job_data.items():
+            args.append(f'$."{key}"')
+            args.append(json.dumps(value, sort_keys=True))
+        args.append(job_id)
+        if revision is not None:
+            args.append(revision)
+        cur = conn.execute(sql, args)
+        rows = cur.fetchall() if self._returning else None
+        if not (rows if self._returning else cur.rowcount):
+            # NOTE: only a missed update needs another read, to tell a missing row from a revision conflict
+            if conn.execute(self._SELECT_REVISION, (job_id,)).fetchone() is None:
+                raise LookupError(f'Job row {job_id} not found')
+            raise WriteConflict(job_id, revision)
+        if self._returning:
+            return rows[0][0]
+        if revision is not None:
+            return revision + 1
+        return conn.execute(self._SELECT_REVISION, (job_id,)).fetchone()[0]
+
+    def _delete_row(self, conn, job_id, revision):
+        if revision is None:
+            conn.execute(self._DELETE, (job_id,))
+            return None
+        cur = conn.execute(self._CONDITIONAL_DELETE, (job_id, revision))
+        if cur.rowcount == 0:
+            raise WriteConflict(job_id, revision)
+        return None
+
+    @contextlib.contextmanager
     def _connection(self):
-        return sqlite3.connect(self._db_file, isolation_level=None, detect_types=sqlite3.PARSE_DECLTYPES)
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            with conn as txn:
+                yield txn
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self._db_file,
+            isolation_level=None,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            cached_statements=self._CACHED_STATEMENTS)
+        for pragma in self._pragmas:
+            conn.execute(pragma)
+        return conn
+
+    def _build_pragmas(self, synchronous, cache_size, mmap_size):
+        synchronous = (synchronous or 'NORMAL').upper()
+        if synchronous not in self._SYNCHRONOUS_MODES:
+            raise ValueError(f'Invalid SQLite synchronous mode: {synchronous}')
+        pragmas = [f'PRAGMA synchronous = {synchronous}']
+        if cache_size is not None:
+            pragmas.append(f'PRAGMA cache_size = {int(cache_size)}')
+        if mmap_size is not None:
+            pragmas.append(f'PRAGMA mmap_size = {int(mmap_size)}')
+        return pragmas
 
     def _ensure_table(self):
         db_folder = os.path.dirname(self._db_file)
         if db_folder:
             os.makedirs(os.path.abspath(db_folder), exist_ok=True)
         with self._connection() as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
             conn.execute(f"""
                 CREATE TABLE IF NOT EXISTS
-                {self._TABLE}({self._KEYCOL} TEXT PRIMARY KEY NOT NULL, {self._DATACOL} {self._DATATYPE} NOT NULL)
+                {self._TABLE}({self._KEYCOL} TEXT PRIMARY KEY NOT NULL, {self._DATACOL} {self._DATATYPE} NOT NULL,
+                    {self._REVCOL} INTEGER NOT NULL DEFAULT 0)
             """)
+            self._ensure_revision_column(conn)
+            self._json1 = self._detect_json1(conn)
+
+    def _ensure_revision_column(self, conn):
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({self._TABLE})')}
+        if self._REVCOL not in columns:
+            _logger.info('Adding revision column to SQLite jobs table')
+            conn.execute(f'ALTER TABLE {self._TABLE} ADD COLUMN {self._REVCOL} INTEGER NOT NULL DEFAULT 0')
+
+    def _detect_json1(self, conn):
+        try:
+            conn.execute("SELECT json_set('{}', '$.a', json('1'))")
+        except sqlite3.OperationalError:
+            _logger.warning('SQLite JSON1 extension not available; job updates will merge data in Python')
+            return False
+        return True
 
     def _store_job_data(self, job_data):
         return json.dumps(job_data, sort_keys=True)
 
     def _load_job_data(self, job_bytes):
-        return json.loads(job_bytes, encoding='utf-8')
+        return json.loads(job_bytes)
 
 
 class S3Store:
-    """AWS S3 data store."""
+    """
+    AWS S3 data store.
+
+    Each job is stored as its own S3 object. If snapshots are enabled the store also
+    maintains a compressed snapshot of all jobs plus a log of job changes made since
+    the snapshot was written; loading all jobs then reads the snapshot and replays the
+    change log instead of fetching every job object. A background thread periodically
+    compacts the change log into a new snapshot.
+    """
     _JobObject = collections.namedtuple('JobObject', ['summary', 'prefix', 'job_id', 'ext'])
     _JOB_EXT = '.json'
     _ENCODING = 'utf-8'
-
-    def __init__(self, bucket, prefix=None):
+    _DEFAULT_CONCURRENCY = 10
+    _SNAPSHOT_NAME = '_snapshot.ndjson.gz'
+    _SNAPSHOT_VERSION = 1
+    _DELTA_FOLDER = '_delta'
+    _DELETE_BATCH_SIZE = 1000
+    # NOTE: change log entries younger than this may still be in flight or come from a writer with a skewed clock
+    _DELTA_SETTLE_SECONDS = 600
+    _MAX_UPDATE_ATTEMPTS = 5
+    _PRECONDITION_CODES = {'PreconditionFailed', 'ConditionalRequestConflict'}
+
+    def __init__(self, bucket, prefix=None, concurrency=None, snapshot_interval=None):
         """
         Create store.
 
         :param bucket: Name of the S3 bucket to use
         :param prefix: Key prefix to use for job objects
+        :param concurrency: Number of job objects to fetch in parallel when loading all jobs
+        :param snapshot_interval: Seconds between snapshot compactions; snapshots are disabled if not set
         """
-        self._s3 = boto3.resource('s3')
+        self._concurrency = max(1, int(concurrency or self._DEFAULT_CONCURRENCY))
+        self._s3 = boto3.resource('s3', config=botocore.config.Config(max_pool_connections=self._concurrency))
         self._bucket = self._s3.Bucket(bucket)
         self._prefix = prefix or ''
+        self._snapshot_interval = float(snapshot_interval) if snapshot_interval else None
+        self._compact_lock = threading.Lock()
+        self._compact_requested = threading.Event()
         self._ensure_bucket()
+        if self._snapshot_interval:
+            threading.Thread(target=self._run_compactor, name='s3-snapshot-compactor', daemon=True).start()
 
     def load_all(self):
         """
         Get all job objects from the S3 location.
 
+        If snapshots are enabled and a snapshot exists jobs are read from the snapshot
+        and change log. Otherwise object bodies are fetched in parallel so jobs
+        are yielded in completion order.
+
         :returns: Generator yielding job data dictionary for each job
         """
         msg = f'Loading jobs from S3 bucket {self._bucket.name}'
@@ -187,10 +633,69 @@ class S3Store:
             msg += f', prefix {self._prefix}'
         msg += '...'
         _logger.info(msg)
-        job_objects = self._get_objects()
-        for jo in job_objects:
-            job_data = self._load_obj_contents(jo.summary)
-            yield {'id': jo.job_id, **job_data}
+        if self._snapshot_interval:
+            jobs = self._load_snapshot_jobs()
+            if jobs is not None:
+                yield from ({'id': job_id, **job_data} for job_id, job_data in jobs.items())
+                return
+            _logger.info('No S3 job snapshot found; loading individual job objects')
+            self._compact_requested.set()
+        yield from self._load_job_objects()
+
+    def load_changes(self, watermark):
+        """
+        Get job objects changed since a previous load.
+
+        Objects are compared by ETag against the watermark so only new
+        or modified job objects are fetched.
+
+        :param watermark: Watermark returned by a previous call, or None to load all jobs
+        :returns: Tuple of (generator yielding changed job data, deleted job ids, new watermark),
+            or None if the watermark does not belong to this store
+        """
+        location = {'bucket': self._bucket.name, 'prefix': self._prefix}
+        if watermark is None:
+            watermark = {**location, 'etags': {}}
+        elif {k: watermark.get(k) for k in location} != location:
+            return None
+        job_objects = list(self._get_objects())
+        etags = {jo.job_id: jo.summary.e_tag for jo in job_objects}
+        old_etags = watermark['etags']
+        changed = [jo for jo in job_objects if old_etags.get(jo.job_id) != etags[jo.job_id]]
+        deleted = [job_id for job_id in old_etags if job_id not in etags]
+        _logger.info('%s of %s S3 job objects changed since last load', len(changed), len(job_objects))
+        return self._load_job_objects(changed), deleted, {**location, 'etags': etags}
+
+    def compact(self):
+        """
+        Fold the job change log into a new snapshot.
+
+        Creates the snapshot from the individual job objects if none exists yet.
+        Only change log entries older than a settling period are folded in,
+        since a writer may still be storing an entry with an earlier key;
+        entries are removed once they are part of the snapshot.
+        """
+        with self._compact_lock:
+            settled_key = f'{self._delta_prefix()}{time.time_ns() - int(self._DELTA_SETTLE_SECONDS * 1e9):020d}'
+            deltas = [d for d in self._get_deltas() if d.key < settled_key]
+            snapshot = self._read_snapshot()
+            if snapshot is None:
+                # NOTE: job objects are written before their change log entry so settled entries are already reflected
+                jobs = {job.pop('id'): job for job in self._load_job_objects()}
+                last_delta = deltas[-1].key if deltas else ''
+            else:
+                last_delta, jobs = snapshot
+                new_deltas = [d for d in deltas if d.key > last_delta]
+                for delta in new_deltas:
+                    self._apply_delta(jobs, self._load_obj_contents(delta))
+                if not new_deltas:
+                    jobs = None
+                else:
+                    last_delta = new_deltas[-1].key
+            if jobs is not None:
+                self._write_snapshot(last_delta, jobs)
+                _logger.info('Wrote S3 job snapshot with %s jobs', len(jobs))
+            self._delete_keys([d.key for d in deltas])
 
     def create(self, job_id, job_data):
         """
@@ -198,30 +703,72 @@ class S3Store:
 
         :param job_id: Job object id
         :param job_data: Job object contents
+        :returns: The new job revision
+        :raises: WriteConflict if the job object already exists
         """
         new_obj = self._make_object(job_id)
-        self._store_obj(new_obj, job_data)
+        try:
+            self._store_obj(new_obj, {**job_data, 'revision': 1}, IfNoneMatch='*')
+        except botocore.exceptions.ClientError as ex:
+            if not self._precondition_failed(ex):
+                raise
+            raise WriteConflict(job_id, None) from ex
+        self._log_delta(StoreOperation(StoreOperation.CREATE, job_id, job_data, 1))
+        return 1
 
-    def update(self, job_id, job_data):
+    def update(self, job_id, job_data, revision=None):
         """
         Update existing job object.
 
+        The object is rewritten only if its ETag still matches the version that was read;
+        unconditional updates are retried if another writer got there first.
+
         :param job_id: Job object id
         :param job_data: Job object body
+        :param revision: Expected current job revision; the update is unconditional if not specified
+        :returns: The new job revision
+        :raises: WriteConflict if the job object is not at the expected revision
         """
         updated_obj = self._make_object(job_id)
-        current_data = self._load_obj_contents(updated_obj)
-        current_data.update(job_data)
-        self._store_obj(updated_obj, current_data)
-
-    def delete(self, job_id):
+        for _ in range(self._MAX_UPDATE_ATTEMPTS):
+            response = updated_obj.get()
+            current_data = self._parse_body(response)
+            current_revision = current_data.pop('revision', 0)
+            _check_revision(job_id, current_revision, revision)
+            new_revision = current_revision + 1
+            try:
+                self._store_obj(updated_obj, {**current_data, **job_data, 'revision': new_revision}, IfMatch=response['ETag'])
+            except botocore.exceptions.ClientError as ex:
+                if not self._precondition_failed(ex):
+                    raise
+                if revision is not None:
+                    raise WriteConflict(job_id, revision) from ex
+                continue
+            self._log_delta(StoreOperation.update(job_id, job_data, new_revision))
+            return new_revision
+        raise WriteConflict(job_id, revision)
+
+    def delete(self, job_id, revision=None):
         """
         Delete a job object.
 
         :param job_id: Job object id
+        :param revision: Expected current job revision; the delete is unconditional if not specified
+        :raises: WriteConflict if the job object is not at the expected revision
         """
         deleted_obj = self._make_object(job_id)
-        deleted_obj.delete()
+        if revision is None:
+            deleted_obj.delete()
+        else:
+            try:
+                response = deleted_obj.get()
+                _check_revision(job_id, self._parse_body(response).get('revision', 0), revision)
+                deleted_obj.delete(IfMatch=response['ETag'])
+            except botocore.exceptions.ClientError as ex:
+                if not self._precondition_failed(ex) and ex.response['Error']['Code'] not in ('NoSuchKey', '404'):
+                    raise
+                raise WriteConflict(job_id, revision) from ex
+        self._log_delta(StoreOperation.delete(job_id))
 
     def _ensure_bucket(self):
         s3_client = boto3.client('s3')
@@ -257,49 +804,169 @@ class S3Store:
         key = posixpath.join(self._prefix, job_id) + self._JOB_EXT
         return self._s3.Object(self._bucket.name, key)
 
+    def _load_job_objects(self, job_objects=None):
+        job_objects = self._get_objects() if job_objects is None else job_objects
+        # NOTE: cap in-flight fetches so a large bucket does not buffer every job body at once
+        max_pending = self._concurrency * 2
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._concurrency) as pool:
+            pending = set()
+            for jo in job_objects:
+                pending.add(pool.submit(self._load_job, jo))
+                if len(pending) >= max_pending:
+                    done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    yield from (f.result() for f in done)
+            yield from (f.result() for f in concurrent.futures.as_completed(pending))
+
+    def _load_snapshot_jobs(self):
+        snapshot = self._read_snapshot()
+        if snapshot is None:
+            return None
+        last_delta, jobs = snapshot
+        for delta in self._get_deltas():
+            if delta.key > last_delta:
+                self._apply_delta(jobs, self._load_obj_contents(delta))
+        return jobs
+
+    def _run_compactor(self):
+        while True:
+            self._compact_requested.wait(self._snapshot_interval)
+            self._compact_requested.clear()
+            try:
+                self.compact()
+            except Exception:
+                _logger.exception('S3 job snapshot compaction failed')
+
+    def _snapshot_object(self):
+        return self._s3.Object(self._bucket.name, posixpath.join(self._prefix, self._SNAPSHOT_NAME))
+
+    def _read_snapshot(self):
+        try:
+            body = self._snapshot_object().get()['Body'].read()
+        except botocore.exceptions.ClientError as ex:
+            if ex.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+        lines = gzip.decompress(body).decode(self._ENCODING).splitlines()
+        header = json.loads(lines[0])
+        if header.get('version') != self._SNAPSHOT_VERSION:
+            _logger.warning('Ignoring S3 job snapshot with unknown version %s', header.get('version'))
+            return None
+        jobs = {}
+        for line in lines[1:]:
+            job_data = json.loads(line)
+            jobs[job_data.pop('id')] = job_data
+        return header['lastDelta'], jobs
+
+    def _write_snapshot(self, last_delta, jobs):
+        lines = [json.dumps({'version': self._SNAPSHOT_VERSION, 'lastDelta': last_delta})]
+        lines.extend(json.dumps({'id': job_id, **job_data}, sort_keys=True) for job_id, job_data in jobs.items())
+        body = gzip.compress('\n'.join(lines).encode(self._ENCODING))
+        self._snapshot_object().put(Body=body, ContentType='application/x-ndjson', ContentEncoding='gzip')
+
+    def _delta_prefix(self):
+        return posixpath.join(self._prefix, self._DELTA_FOLDER) + '/'
+
+    def _get_deltas(self):
+        return sorted(self._bucket.objects.filter(Prefix=self._delta_prefix()), key=lambda o: o.key)
+
+    def _log_delta(self, op):
+        if not self._snapshot_interval:
+            return
+        # NOTE: keys sort in write order so the log can be replayed by key
+        key = f'{self._delta_prefix()}{time.time_ns():020d}-{uuid.uuid4().hex}{self._JOB_EXT}'
+        self._store_obj(self._s3.Object(self._bucket.name, key), op._asdict())
+
+    def _apply_delta(self, jobs, delta):
+        job_id = delta['job_id']
+        if delta['action'] == StoreOperation.CREATE:
+            jobs[job_id] = {**delta['job_data'], 'revision': delta.get('revision') or 1}
+        elif delta['action'] == StoreOperation.UPDATE:
+            job_data = jobs.setdefault(job_id, {})
+            revision = delta.get('revision') or job_data.get('revision', 0) + 1
+            job_data.update(delta['job_data'])
+            job_data['revision'] = revision
+        elif delta['action'] == StoreOperation.DELETE:
+            jobs.pop(job_id, None)
+
+    def _delete_keys(self, keys):
+        for i in range(0, len(keys), self._DELETE_BATCH_SIZE):
+            batch = keys[i:i + self._DELETE_BATCH_SIZE]
+            self._bucket.delete_objects(Delete={'Objects': [{'Key': k} for k in batch], 'Quiet': True})
+
+    def _load_job(self, job_object):
+        return {'id': job_object.job_id, **self._load_obj_contents(job_object.summary)}
+
     def _load_obj_contents(self, obj_handle):
-        job_bytes = obj_handle.get()['Body'].read()
-        return json.loads(job_bytes, encoding=self._ENCODING)
+        return self._parse_body(obj_handle.get())
 
-    def _store_obj(self, obj_handle, data):
-        obj_handle.put(Body=json.dumps(data, sort_keys=True).encode(self._ENCODING))
+    def _parse_body(self, response):
+        return json.loads(response['Body'].read().decode(self._ENCODING))
+
+    def _store_obj(self, obj_handle, data, **put_args):
+        obj_handle.put(Body=json.dumps(data, sort_keys=True).encode(self._ENCODING), **put_args)
+
+    def _precondition_failed(self, client_error):
+        return client_error.response['Error']['Code'] in self._PRECONDITION_CODES
 
 
 class DynamoDBStore:
-    """DynamoDB data store."""
-    _KEY_NAME = 'job-id'
-    _DATA_NAME = 'json-data'
+    """
+    DynamoDB data store.
 
-    def __init__(self, table):
+    Each top-level job field is stored as its own item attribute so updates
+    only write the changed fields. Items written by earlier versions kept the
+    whole job as a JSON document in a single attribute; these are still read
+    and are converted to the attribute layout when updated or by migrate().
+    Job revisions are kept in their own attribute and checked with condition expressions.
+    """
+    _KEY_NAME = 'job-id'
+    _LEGACY_DATA_NAME = 'json-data'
+    _REVISION_NAME = 'job-revision'
+    _UPDATE_CONDITION = 'attribute_exists(#key) AND attribute_not_exists(#legacy)'
+    _MAX_UPDATE_ATTEMPTS = 5
+    _MAX_TRANSACTION_ITEMS = 100
+    _MAX_BATCH_GET_KEYS = 100
+
+    def __init__(self, table, scan_segments=None):
         """
         Create store.
 
         :param table: Name of the dynamodb table to use
+        :param scan_segments: Number of parallel scan segments to use when loading all jobs
         """
-        self._table = boto3.resource('dynamodb').Table(table)
+        self._scan_segments = max(1, int(scan_segments or 1))
+        self._dynamodb = boto3.resource('dynamodb', config=botocore.config.Config(max_pool_connections=max(10, self._scan_segments)))
+        self._table = self._dynamodb.Table(table)
         self._ensure_table()
 
     def load_all(self):
         """
         Get all job items from the DynamoDB table.
 
+        With more than one scan segment the segments are scanned in parallel
+        and jobs are yielded in the order their pages arrive.
+
         :returns: Generator yielding job data dictionary for each job
         """
         _logger.info('Loading jobs from DynamoDB table %s...', self._table.name)
-        batch = None
-        while True:
-            if batch:
-                if 'LastEvaluatedKey' in batch:
-                    batch = self._table.scan(ExclusiveStartKey=batch['LastEvaluatedKey'])
-                else:
-                    break
-            else:
-                batch = self._table.scan()
-            items = batch['Items']
-            for item in items:
-                job_id = item[self._KEY_NAME]
-                job_data = self._parse_item(item)
-                yield {'id': job_id, **job_data}
+        legacy_count = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self._scan_segments) as pool:
+            pending = {pool.submit(self._scan_page, segment) for segment in range(self._scan_segments)}
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for f in done:
+                    segment, batch = f.result()
+                    # NOTE: request the segment's next page before yielding so fetching overlaps consumption
+                    if 'LastEvaluatedKey' in batch:
+                        pending.add(pool.submit(self._scan_page, segment, batch['LastEvaluatedKey']))
+                    for item in batch['Items']:
+                        legacy_count += self._LEGACY_DATA_NAME in item
+                        job_id = item[self._KEY_NAME]
+                        job_data = self._parse_item(item)
+                        yield {'id': job_id, **job_data, 'revision': self._item_revision(item)}
+        if legacy_count:
+            _logger.warning('%s DynamoDB job items use the legacy single-document layout; '
+                            'they will be converted when next updated or by DynamoDBStore.migrate()', legacy_count)
 
     def create(self, job_id, job_data):
         """
@@ -307,28 +974,233 @@ class DynamoDBStore:
 
         :param job_id: Job item id
         :param job_data: Job item contents
+        :returns: The new job revision
+        :raises: WriteConflict if the job item already exists
         """
-        self._store_item(job_id, job_data)
+        try:
+            self._table.put_item(**self._create_args(job_id, job_data))
+        except botocore.exceptions.ClientError as ex:
+            if not self._condition_failed(ex):
+                raise
+            raise WriteConflict(job_id, None) from ex
+        return 1
 
-    def update(self, job_id, job_data):
+    def update(self, job_id, job_data, revision=None):
         """
         Update existing job item.
 
+        Only the given fields are written, using a single UpdateItem call.
+        Legacy single-document items are converted to the attribute layout.
+
         :param job_id: Job item id
         :param job_data: Job item body
+        :param revision: Expected current job revision; the update is unconditional if not specified
+        :returns: The new job revision
+        :raises: LookupError if the job item does not exist
+        :raises: WriteConflict if the job item is not at the expected revision
         """
-        item = self._table.get_item(Key={self._KEY_NAME: job_id})['Item']
-        current_data = self._parse_item(item)
-        current_data.update(job_data)
-        self._store_item(job_id, current_data)
-
-    def delete(self, job_id):
+        for _ in range(self._MAX_UPDATE_ATTEMPTS):
+            try:
+                response = self._table.update_item(**self._update_args(job_id, job_data, revision), ReturnValues='UPDATED_NEW')
+                return self._item_revision(response['Attributes'])
+            except botocore.exceptions.ClientError as ex:
+                if not self._condition_failed(ex):
+                    raise
+            item = self._get_item(job_id)
+            current_revision = self._item_revision(item)
+            _check_revision(job_id, current_revision, revision)
+            if self._LEGACY_DATA_NAME not in item:
+                # NOTE: the item changed between the update and the read; try again
+                continue
+            try:
+                self._table.put_item(Item=self._make_item(job_id, {**self._parse_item(item), **job_data}, current_revision + 1),
+                    ConditionExpression='attribute_exists(#legacy)',
+                    ExpressionAttributeNames={'#legacy': self._LEGACY_DATA_NAME})
+                return current_revision + 1
+            except botocore.exceptions.ClientError as ex:
+                if not self._condition_failed(ex):
+                    raise
+        raise WriteConflict(job_id, revision)
+
+    def delete(self, job_id, revision=None):
         """
         Delete a job item.
 
         :param job_id: Job item id
+        :param revision: Expected current job revision; the delete is unconditional if not specified
+        :raises: WriteConflict if the job item is not at the expected revision
+        """
+        try:
+            self._table.delete_item(**self._delete_args(job_id, revision))
+        except botocore.exceptions.ClientError as ex:
+            if not self._condition_failed(ex):
+                raise
+            raise WriteConflict(job_id, revision) from ex
+
+    def bulk_write(self, ops):
+        """
+        Apply a batch of job writes with TransactWriteItems.
+
+        Operations are sent in transactions of up to 100 items, starting a new
+        transaction whenever a job appears twice. Current revisions of jobs with
+        unconditional updates are read up front so every write is conditional;
+        if a transaction is cancelled its operations are retried one at a time.
+
+        :param ops: Sequence of StoreOperations to apply in order
+        :returns: List of results aligned with ops; the new job revision for each successful create or update,
+            None for each successful delete and the exception for each failed operation
+        """
+        results = [None] * len(ops)
+        revisions = self._get_revisions(dict.fromkeys(op.job_id for op in ops if op.action == StoreOperation.UPDATE and op.revision is None))
+        chunk = []
+        for i, op in enumerate(ops):
+            if len(chunk) == self._MAX_TRANSACTION_ITEMS or any(ops[j].job_id == op.job_id for j, _, _ in chunk):
+                self._write_transaction(ops, chunk, results, revisions)
+                chunk = []
+            try:
+                chunk.append((i, *self._transaction_item(op, revisions)))
+            except Exception as ex:
+                results[i] = ex
+        if chunk:
+            self._write_transaction(ops, chunk, results, revisions)
+        return results
+
+    def migrate(self):
         """
-        self._table.delete_item(Key={self._KEY_NAME: job_id})
+        Convert all legacy single-document job items to the attribute layout.
+
+        :returns: The number of converted items
+        """
+        migrated = 0
+        scan_kwargs = {}
+        with self._table.batch_writer(overwrite_by_pkeys=[self._KEY_NAME]) as batch:
+            while True:
+                page = self._table.scan(**scan_kwargs)
+                for item in page['Items']:
+                    if self._LEGACY_DATA_NAME in item:
+                        batch.put_item(Item=self._make_item(item[self._KEY_NAME], self._parse_item(item), self._item_revision(item) + 1))
+                        migrated += 1
+                if 'LastEvaluatedKey' not in page:
+                    break
+                scan_kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+        _logger.info('Migrated %s legacy DynamoDB job items', migrated)
+        return migrated
+
+    def _get_item(self, job_id):
+        item = self._table.get_item(Key={self._KEY_NAME: job_id}).get('Item')
+        if item is None:
+            raise LookupError(f'Job item {job_id} not found')
+        return item
+
+    def _get_revisions(self, job_ids):
+        revisions = {}
+        job_ids = list(job_ids)
+        for start in range(0, len(job_ids), self._MAX_BATCH_GET_KEYS):
+            request = {self._table.name: {
+                'Keys': [{self._KEY_NAME: job_id} for job_id in job_ids[start:start + self._MAX_BATCH_GET_KEYS]],
+                'ProjectionExpression': '#key, #rev',
+                'ExpressionAttributeNames': {'#key': self._KEY_NAME, '#rev': self._REVISION_NAME}
+            }}
+            while request:
+                response = self._dynamodb.batch_get_item(RequestItems=request)
+                for item in response['Responses'].get(self._table.name, []):
+                    revisions[item[self._KEY_NAME]] = self._item_revision(item)
+                request = response.get('UnprocessedKeys')
+        return revisions
+
+    def _transaction_item(self, op, revisions):
+        if op.action == StoreOperation.CREATE:
+            return {'Put': {'TableName': self._table.name, **self._create_args(op.job_id, op.job_data)}}, 1
+        elif op.action == StoreOperation.UPDATE:
+            expected = revisions.get(op.job_id) if op.revision is None else op.revision
+            if expected is None:
+                raise LookupError(f'Job item {op.job_id} not found')
+            return {'Update': {'TableName': self._table.name, **self._update_args(op.job_id, op.job_data, expected)}}, expected + 1
+        elif op.action == StoreOperation.DELETE:
+            return {'Delete': {'TableName': self._table.name, **self._delete_args(op.job_id, op.revision)}}, None
+        else:
+            raise ValueError(f'Unknown store operation {op.action}')
+
+    def _write_transaction(self, ops, chunk, results, revisions):
+        try:
+            self._table.meta.client.transact_write_items(TransactItems=[item for _, item, _ in chunk])
+            outcomes = [planned for _, _, planned in chunk]
+        except botocore.exceptions.ClientError as ex:
+            if ex.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            _logger.info('DynamoDB transaction cancelled; applying %s job writes individually', len(chunk))
+            outcomes = _apply_each(self, [ops[i] for i, _, _ in chunk])
+        for (i, _, _), outcome in zip(chunk, outcomes):
+            results[i] = outcome
+            if isinstance(outcome, Exception):
+                continue
+            if ops[i].action == StoreOperation.DELETE:
+                revisions.pop(ops[i].job_id, None)
+            else:
+                revisions[ops[i].job_id] = outcome
+
+    def _create_args(self, job_id, job_data):
+        return {
+            'Item': self._make_item(job_id, job_data, 1),
+            'ConditionExpression': 'attribute_not_exists(#key)',
+            'ExpressionAttributeNames': {'#key': self._KEY_NAME}
+        }
+
+    def _update_args(self, job_id, job_data, revision):
+        names = {'#key': self._KEY_NAME, '#legacy': self._LEGACY_DATA_NAME, '#rev': self._REVISION_NAME}
+        values = {}
+        assignments = []
+        for i, (field, value) in enumerate(job_data.items()):
+            names[f'#f{i}'] = field
+            values[f':v{i}'] = _to_dynamodb_value(value)
+            assignments.append(f'#f{i} = :v{i}')
+        condition = self._UPDATE_CONDITION
+        if revision is None:
+            assignments.append('#rev = if_not_exists(#rev, :zero) + :one')
+            values.update({':zero': 0, ':one': 1})
+        else:
+            assignments.append('#rev = :next')
+            values[':next'] = revision + 1
+            revision_condition, revision_values = self._revision_condition(revision)
+            condition += ' AND ' + revision_condition
+            values.update(revision_values)
+        return {
+            'Key': {self._KEY_NAME: job_id},
+            'UpdateExpression': 'SET ' + ', '.join(assignments),
+            'ConditionExpression': condition,
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': values
+        }
+
+    def _delete_args(self, job_id, revision):
+        args = {'Key': {self._KEY_NAME: job_id}}
+        if revision is not None:
+            revision_condition, revision_values = self._revision_condition(revision)
+            args['ConditionExpression'] = 'attribute_exists(#key) AND ' + revision_condition
+            args['ExpressionAttributeNames'] = {'#key': self._KEY_NAME, '#rev': self._REVISION_NAME}
+            if revision_values:
+                args['ExpressionAttributeValues'] = revision_values
+        return args
+
+    def _revision_condition(self, revision):
+        # NOTE: items written before revisions were tracked have no revision attribute and are at revision 0
+        if revision == 0:
+            return 'attribute_not_exists(#rev)', {}
+        return '#rev = :expected', {':expected': revision}
+
+    def _item_revision(self, item):
+        return int(item.get(self._REVISION_NAME, 0))
+
+    def _condition_failed(self, client_error):
+        return client_error.response['Error']['Code'] == 'ConditionalCheckFailedException'
+
+    def _scan_page(self, segment, start_key=None):
+        scan_kwargs = {}
+        if self._scan_segments > 1:
+            scan_kwargs.update(Segment=segment, TotalSegments=self._scan_segments)
+        if start_key:
+            scan_kwargs['ExclusiveStartKey'] = start_key
+        return segment, self._table.scan(**scan_kwargs)
 
     def _ensure_table(self):
         dyn_client = boto3.client('dynamodb')
@@ -345,26 +1217,59 @@ class DynamoDBStore:
             self._table.wait_until_exists()
 
     def _parse_item(self, item):
-        return json.loads(item[self._DATA_NAME])
+        if self._LEGACY_DATA_NAME in item:
+            return json.loads(item[self._LEGACY_DATA_NAME])
+        return {k: _from_dynamodb_value(v) for k, v in item.items() if k not in (self._KEY_NAME, self._REVISION_NAME)}
+
+    def _make_item(self, key, data, revision):
+        return {self._KEY_NAME: key, **{k: _to_dynamodb_value(v) for k, v in data.items()}, self._REVISION_NAME: revision}
+
+
+def _to_dynamodb_value(value):
+    # NOTE: DynamoDB numbers must be Decimals; boto3 rejects floats
+    if isinstance(value, float):
+        return decimal.Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: _to_dynamodb_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_dynamodb_value(v) for v in value]
+    return value
+
 
-    def _store_item(self, key, data):
-        self._table.put_item(Item={self._KEY_NAME: key, self._DATA_NAME: json.dumps(data, sort_keys=True)})
+def _from_dynamodb_value(value):
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {k: _from_dynamodb_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_from_dynamodb_value(v) for v in value]
+    return value
 
 
 class ElasticsearchStore:
-    """Elasticsearch data store."""
+    """
+    Elasticsearch data store.
+
+    Job revisions are document versions; conditional writes check the
+    sequence number and primary term read alongside the expected version.
+    """
     _DOC_TYPE = 'job'
     _SCROLL_PERIOD = '1m'
+    _RETRY_ON_CONFLICT = 3
+    _DEFAULT_BULK_CHUNK_SIZE = 500
+    _BULK_CONDITION_KEYS = ('if_seq_no', 'if_primary_term')
 
-    def __init__(self, index, **client_args):
+    def __init__(self, index, bulk_chunk_size=None, **client_args):
         """
         Create store.
 
         :param index: Name of the elasticsearch index to use
+        :param bulk_chunk_size: Maximum number of documents sent per bulk API request
         :param **client_args: Arguments for the underlying elasticsearch client
         """
         self._es = elasticsearch.Elasticsearch(**client_args)
         self._index = index
+        self._bulk_chunk_size = int(bulk_chunk_size or self._DEFAULT_BULK_CHUNK_SIZE)
         self._ensure_index()
 
     def load_all(self):
@@ -377,9 +1282,38 @@ class ElasticsearchStore:
         hits = elasticsearch.helpers.scan(client=self._es,
             index=self._index,
             doc_type=self._DOC_TYPE,
-            scroll=self._SCROLL_PERIOD)
+            scroll=self._SCROLL_PERIOD,
+            version=True)
         for hit in hits:
-            yield {'id': hit['_id'], **hit['_source']}
+            yield {'id': hit['_id'], **hit['_source'], 'revision': hit['_version']}
+
+    def load_changes(self, watermark):
+        """
+        Get job documents changed since a previous load.
+
+        Document versions are scanned without their source and compared against
+        the watermark so only new or modified documents are fetched.
+
+        :param watermark: Watermark returned by a previous call, or None to load all jobs
+        :returns: Tuple of (generator yielding changed job data, deleted job ids, new watermark),
+            or None if the watermark does not belong to this store
+        """
+        if watermark is None:
+            watermark = {'index': self._index, 'versions': {}}
+        elif watermark.get('index') != self._index:
+            return None
+        hits = elasticsearch.helpers.scan(client=self._es,
+            index=self._index,
+            doc_type=self._DOC_TYPE,
+            scroll=self._SCROLL_PERIOD,
+            _source=False,
+            version=True)
+        versions = {hit['_id']: hit['_version'] for hit in hits}
+        old_versions = watermark['versions']
+        changed = [job_id for job_id, version in versions.items() if old_versions.get(job_id) != version]
+        deleted = [job_id for job_id in old_versions if job_id not in versions]
+        _logger.info('%s of %s elasticsearch job documents changed since last load', len(changed), len(versions))
+        return self._get_docs(changed), deleted, {'index': self._index, 'versions': versions}
 
     def create(self, job_id, job_data):
         """
@@ -387,25 +1321,147 @@ class ElasticsearchStore:
 
         :param job_id: Job document id
         :param job_data: Job document body
+        :returns: The new job revision
+        :raises: WriteConflict if the job document already exists
         """
-        self._es.create(index=self._index, doc_type=self._DOC_TYPE, id=job_id, body=job_data)
+        try:
+            response = self._es.create(index=self._index, doc_type=self._DOC_TYPE, id=job_id, body=job_data)
+        except elasticsearch.ConflictError as ex:
+            raise WriteConflict(job_id, None) from ex
+        return response['_version']
 
-    def update(self, job_id, job_data):
+    def update(self, job_id, job_data, revision=None):
         """
         Update existing job document.
 
         :param job_id: Job document id
         :param job_data: Job document body
+        :param revision: Expected current job revision; the update is unconditional if not specified
+        :returns: The new job revision
+        :raises: WriteConflict if the job document is not at the expected revision
         """
-        self._es.update(index=self._index, doc_type=self._DOC_TYPE, id=job_id, body={'doc': job_data}, retry_on_conflict=3)
+        if revision is None:
+            write_args = {'retry_on_conflict': self._RETRY_ON_CONFLICT}
+        else:
+            write_args = self._conditional_args(job_id, revision)
+        try:
+            response = self._es.update(index=self._index, doc_type=self._DOC_TYPE, id=job_id, body={'doc': job_data}, **write_args)
+        except elasticsearch.ConflictError as ex:
+            raise WriteConflict(job_id, revision) from ex
+        return response['_version']
 
-    def delete(self, job_id):
+    def delete(self, job_id, revision=None):
         """
         Delete a job document.
 
         :param job_id: Job document id
+        :param revision: Expected current job revision; the delete is unconditional if not specified
+        :raises: WriteConflict if the job document is not at the expected revision
+        """
+        write_args = {} if revision is None else self._conditional_args(job_id, revision)
+        try:
+            self._es.delete(index=self._index, doc_type=self._DOC_TYPE, id=job_id, **write_args)
+        except elasticsearch.ConflictError as ex:
+            raise WriteConflict(job_id, revision) from ex
+
+    def bulk_write(self, ops):
         """
-        self._es.delete(index=self._index, doc_type=self._DOC_TYPE, id=job_id)
+        Apply a batch of job writes with the bulk API.
+
+        Sequence numbers for conditional operations are fetched with one mget
+        before the batch is sent; a conditional operation on a job already
+        written earlier in the batch starts a new bulk request.
+
+        :param ops: Sequence of StoreOperations to apply in order
+        :returns: List of results aligned with ops; the new job revision for each successful create or update,
+            None for each successful delete and the exception for each failed operation;
+            revision mismatches are reported as WriteConflict and other failures as StoreOperationError
+        """
+        results = [None] * len(ops)
+        start = 0
+        while start < len(ops):
+            end = self._segment_end(ops, start)
+            self._bulk_segment(ops, range(start, end), results)
+            start = end
+        return results
+
+    def _segment_end(self, ops, start):
+        written = set()
+        for i in range(start, len(ops)):
+            if ops[i].revision is not None and ops[i].job_id in written:
+                return i
+            written.add(ops[i].job_id)
+        return len(ops)
+
+    def _bulk_segment(self, ops, indices, results):
+        seq_nos = self._get_seq_nos([ops[i].job_id for i in indices if ops[i].revision is not None])
+        sent = []
+        actions = []
+        for i in indices:
+            op = ops[i]
+            action = self._bulk_action(op)
+            if op.revision is not None:
+                version, seq_no, primary_term = seq_nos.get(op.job_id, (None, None, None))
+                if version != op.revision:
+                    results[i] = WriteConflict(op.job_id, op.revision)
+                    continue
+                action.update(if_seq_no=seq_no, if_primary_term=primary_term)
+            sent.append(i)
+            actions.append(action)
+        bulk_results = elasticsearch.helpers.streaming_bulk(self._es,
+            actions,
+            chunk_size=self._bulk_chunk_size,
+            expand_action_callback=self._expand_bulk_action,
+            raise_on_error=False,
+            raise_on_exception=False)
+        for i, (ok, item) in zip(sent, bulk_results):
+            op = ops[i]
+            details = next(iter(item.values()), item)
+            if ok:
+                results[i] = None if op.action == StoreOperation.DELETE else details.get('_version')
+            elif details.get('status') == 409 and op.revision is not None:
+                results[i] = WriteConflict(op.job_id, op.revision)
+            else:
+                results[i] = StoreOperationError(op, details)
+
+    def _get_seq_nos(self, job_ids):
+        seq_nos = {}
+        for i in range(0, len(job_ids), self._bulk_chunk_size):
+            response = self._es.mget(index=self._index, doc_type=self._DOC_TYPE, body={'ids': job_ids[i:i + self._bulk_chunk_size]}, _source=False)
+            for doc in response['docs']:
+                if doc.get('found'):
+                    seq_nos[doc['_id']] = doc['_version'], doc['_seq_no'], doc['_primary_term']
+        return seq_nos
+
+    def _conditional_args(self, job_id, revision):
+        doc = self._es.get(index=self._index, doc_type=self._DOC_TYPE, id=job_id, _source=False)
+        _check_revision(job_id, doc['_version'], revision)
+        return {'if_seq_no': doc['_seq_no'], 'if_primary_term': doc['_primary_term']}
+
+    def _get_docs(self, job_ids):
+        for i in range(0, len(job_ids), self._bulk_chunk_size):
+            response = self._es.mget(index=self._index, doc_type=self._DOC_TYPE, body={'ids': job_ids[i:i + self._bulk_chunk_size]})
+            for doc in response['docs']:
+                if doc.get('found'):
+                    yield {'id': doc['_id'], **doc['_source'], 'revision': doc['_version']}
+
+    def _bulk_action(self, op):
+        action = {'_op_type': op.action, '_index': self._index, '_type': self._DOC_TYPE, '_id': op.job_id}
+        if op.action == StoreOperation.CREATE:
+            action['_source'] = op.job_data
+        elif op.action == StoreOperation.UPDATE:
+            if op.revision is None:
+                action['retry_on_conflict'] = self._RETRY_ON_CONFLICT
+            action['doc'] = op.job_data
+        return action
+
+    def _expand_bulk_action(self, data):
+        # NOTE: the client's default action expansion does not know the sequence number conditions
+        data = dict(data)
+        conditions = {key: data.pop(key) for key in self._BULK_CONDITION_KEYS if key in data}
+        action, source = elasticsearch.helpers.expand_action(data)
+        next(iter(action.values())).update(conditions)
+        return action, source
 
     def _ensure_index(self):
         if self._es.indices.exists(self._index):
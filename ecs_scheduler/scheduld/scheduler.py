@@ -6,8 +6,9 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.base import JobLookupError
 
 from .execution import JobExecutor
+from .. import crontriggers
 from ..models import JobOperation
-from ..datacontext import JobNotFound
+from ..datacontext import JobNotFound, InvalidJobData
 
 
 _logger = logging.getLogger(__name__)
@@ -29,7 +30,7 @@ class Scheduler:
             'max_instances': 1,
             'misfire_grace_time': 60 * 60 # 1 hour
         }
-        self._sched = BackgroundScheduler(timezone='UTC', job_defaults=job_defaults)
+        self._sched = BackgroundScheduler(timezone=crontriggers.DEFAULT_TIMEZONE, job_defaults=job_defaults)
         self._handler = ScheduleEventHandler(self._sched, datacontext)
         self._sched.add_listener(self._handler,
             apscheduler.events.EVENT_JOB_ADDED
@@ -42,10 +43,15 @@ class Scheduler:
         """Start the scheduler."""
         job_count = 0
         for job in self._dc.get_all():
-            self._insert_job(job)
+            try:
+                self._insert_job(job)
+            except InvalidJobData as ex:
+                _logger.error('Skipping invalid stored job %s: %s', ex.job_id, ex.errors)
+                continue
             job_count += 1
         self._sched.start()
         _logger.info('Scheduler started with %s initial jobs', job_count)
+        _logger.info('Cron trigger cache: %s', crontriggers.cache_info())
 
     def stop(self):
         """
@@ -66,9 +72,23 @@ class Scheduler:
             self._insert_job_from_id(job_op.job_id)
         elif job_op.operation == JobOperation.REMOVE:
             self._remove_job(job_op.job_id)
+        elif job_op.operation == JobOperation.BATCH:
+            self._apply_batch(job_op.job_ops)
         else:
             raise RuntimeError(f'Received unknown job operation {job_op.job_id} {{{job_op.operation}}}')
 
+    def _apply_batch(self, job_ops):
+        # NOTE: apply the whole batch even if some operations fail, then report the first failure
+        first_error = None
+        for job_op in job_ops:
+            try:
+                self.notify(job_op)
+            except Exception as ex:
+                _logger.exception('Unable to apply batched job operation %s {%s}', job_op.job_id, job_op.operation)
+                first_error = first_error or ex
+        if first_error:
+            raise first_error
+
     def _insert_job_from_id(self, job_id):
         job = self._dc.get(job_id)
         self._insert_job(job)
@@ -83,20 +103,13 @@ class Scheduler:
         # see: https://apscheduler.readthedocs.org/en/latest/modules/schedulers/base.html#apscheduler.schedulers.base.BaseScheduler.add_job
         if job.suspended:
             job_kwargs['next_run_time'] = None
-        self._sched.add_job(self._exec, 'cron', **job_kwargs, **self._build_trigger_kwargs(job))
-
-    def _build_trigger_kwargs(self, job):
-        kwargs = job.parsed_schedule.copy()
-        start_date = job.data.get('lastRun', job.data.get('scheduleStart'))
-        if start_date:
-            kwargs['start_date'] = start_date
-        end_date = job.data.get('scheduleEnd')
-        if end_date:
-            kwargs['end_date'] = end_date
-        tz = job.data.get('timezone')
-        if tz:
-            kwargs['timezone'] = tz
-        return kwargs
+        self._sched.add_job(self._exec, self._build_trigger(job), **job_kwargs)
+
+    def _build_trigger(self, job):
+        return crontriggers.build(job.parsed_schedule,
+                                  timezone=job.data.get('timezone') or crontriggers.DEFAULT_TIMEZONE,
+                                  start_date=job.data.get('lastRun', job.data.get('scheduleStart')),
+                                  end_date=job.data.get('scheduleEnd'))
 
     def _remove_job(self, job_id):
         try:
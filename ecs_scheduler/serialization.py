@@ -1,16 +1,121 @@
 """Serialization schemas for scheduler classes."""
 import re
+import base64
 import random
+import binascii
+import datetime
+import collections.abc
 
 import marshmallow
-import apscheduler.triggers.cron
+from marshmallow.marshalling import missing
 from pytz.exceptions import UnknownTimeZoneError
 
-from .models import Pagination
+from . import crontriggers
+from .models import Pagination, JobQuery
+from .persistence import StoreOperation
 
 
 _MIN_TASKS = 1
 _MAX_TASKS = 50
+_MAX_BATCH_OPERATIONS = 1000
+
+
+_FALLBACK = object()
+_NATIVE_TYPES = {
+    marshmallow.fields.String: str,
+    marshmallow.fields.Integer: int,
+    marshmallow.fields.Boolean: bool
+}
+
+
+def compile_dump(schema):
+    """
+    Compile a serializer for a schema.
+
+    The compiled serializer returns the same data as schema.dump(obj).data for a single mapping.
+    Values that already have a field's native type are copied as-is, nested schemas are compiled too
+    and any other value is serialized by its marshmallow field.
+    Schemas that use dump processors, custom accessors or other dump-time options are not compiled
+    and are serialized with schema.dump instead.
+
+    :param schema: The schema instance to compile
+    :returns: A callable that serializes a mapping to a dictionary
+    """
+    return _compile_dump(schema, schema.strict)
+
+
+def _compile_dump(schema, strict):
+    def schema_dump(obj):
+        return schema.dump(obj).data
+
+    if not _is_compilable(schema):
+        return schema_dump
+    plan = [(name, field.attribute or name, field.dump_to or name, field, _compile_field(field))
+            for name, field in schema.fields.items() if not field.load_only]
+    accessor = schema.get_attribute
+    dict_class = schema.dict_class
+
+    def dump(obj):
+        if not isinstance(obj, collections.abc.Mapping):
+            return schema_dump(obj)
+        result = dict_class()
+        for name, attr, key, field, convert in plan:
+            if convert is not None:
+                value = obj[attr] if attr in obj else missing
+                if value is missing:
+                    if field.default is missing:
+                        continue
+                elif value is not None:
+                    output = convert(value)
+                    if output is not _FALLBACK:
+                        result[key] = output
+                        continue
+            try:
+                output = field.serialize(name, obj, accessor=accessor)
+            except marshmallow.ValidationError:
+                if strict:
+                    raise
+                continue
+            if output is not missing:
+                result[key] = output
+        return result
+    return dump
+
+
+def _is_compilable(schema):
+    processors = schema.__processors__
+    return (not schema.many and not schema.prefix and not schema.extra
+            and not schema.opts.fields and not schema.opts.additional
+            and getattr(schema, '__accessor__', None) is None
+            and type(schema).get_attribute is marshmallow.Schema.get_attribute
+            and not any(processors.get((tag, many)) for tag in ('pre_dump', 'post_dump') for many in (True, False))
+            and not any('.' in (field.attribute or name) for name, field in schema.fields.items()))
+
+
+def _compile_field(field):
+    field_type = type(field)
+    if not field._CHECK_ATTRIBUTE:
+        return None
+    if field_type is marshmallow.fields.Raw:
+        return lambda value: value
+    native_type = _NATIVE_TYPES.get(field_type)
+    if native_type and not getattr(field, 'as_string', False):
+        return lambda value: value if type(value) is native_type else _FALLBACK
+    if field_type is marshmallow.fields.Nested and not field.many and not isinstance(field.only, str):
+        nested = _compile_dump(field.schema, True)
+        return lambda value: nested(value) if isinstance(value, collections.abc.Mapping) else _FALLBACK
+    if field_type is marshmallow.fields.List:
+        item = _compile_field(field.container)
+        if item is None:
+            return None
+
+        def convert_list(value):
+            if type(value) is not list or any(v is None for v in value):
+                return _FALLBACK
+            output = [item(v) for v in value]
+            return _FALLBACK if any(v is _FALLBACK for v in output) else output
+        return convert_list
+    return None
 
 
 def _validate_task_definition_name(value):
@@ -76,12 +181,47 @@ class JobSchema(marshmallow.Schema):
     parsedSchedule = marshmallow.fields.Raw(load_only=True)
     overrides = marshmallow.fields.List(marshmallow.fields.Nested(OverrideSchema))
 
+    def dump_data(self, obj):
+        """
+        Serialize a job with a serializer compiled from this schema on first use.
+
+        :param obj: The job data mapping to serialize
+        :returns: The same data as dump(obj).data
+        """
+        try:
+            compiled = self._compiled_dump
+        except AttributeError:
+            compiled = self._compiled_dump = compile_dump(self)
+        return compiled(obj)
+
+    def loaded_fields(self, data):
+        """
+        Get the fields load(data) would return as data or errors, without validating data.
+
+        :param data: Raw job data dictionary
+        :returns: A set of field names
+        """
+        names = set()
+        for name, field in self.fields.items():
+            if field.dump_only:
+                continue
+            if name in data:
+                names.add(name)
+            elif field.load_from and field.load_from in data:
+                names.add(field.load_from)
+            elif field.missing is not missing or field.required:
+                names.add(field.load_from or name)
+        # NOTE: mirrors parse_schedule, which adds the parsed schedule for any non-empty schedule
+        if data.get('schedule'):
+            names.add('parsedSchedule')
+        return names
+
     @marshmallow.validates('parsedSchedule')
     def validate_parsed_schedule(self, value):
         if not value:
             return
         try:
-            apscheduler.triggers.cron.CronTrigger(**value)
+            crontriggers.get(value)
         except ValueError as ex:
             raise marshmallow.ValidationError([f'Invalid schedule syntax: {error}' for error in ex.args]) from ex
 
@@ -90,7 +230,7 @@ class JobSchema(marshmallow.Schema):
         if not value:
             return
         try:
-            apscheduler.triggers.cron.CronTrigger(timezone=value)
+            crontriggers.get({}, timezone=value)
         except UnknownTimeZoneError:
             raise marshmallow.ValidationError(f'Invalid timezone format: {value}')
 
@@ -145,6 +285,7 @@ class JobResponseSchema(JobSchema):
     """
     # override id to include in dump output
     id = marshmallow.fields.String(dump_only=True)
+    revision = marshmallow.fields.Integer(dump_only=True)
     link = marshmallow.fields.Method('link_generator', dump_only=True)
     lastRun = marshmallow.fields.LocalDateTime(dump_only=True)
     lastRunTasks = marshmallow.fields.List(marshmallow.fields.Nested(TaskInfoSchema), dump_only=True)
@@ -158,19 +299,43 @@ class JobResponseSchema(JobSchema):
         return self._link_func(obj['id'])
 
 
+class PageCursor(marshmallow.fields.Field):
+    """
+    Opaque pagination cursor.
+
+    Serializes the id of the last job on a page to a URL-safe token
+    and deserializes the token back to the job id.
+    An empty cursor deserializes to an empty id, which starts before the first job.
+    """
+    def _serialize(self, value, attr, obj):
+        if value is None:
+            return None
+        return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+    def _deserialize(self, value, attr, data):
+        try:
+            token = value.encode('ascii')
+            return base64.b64decode(token + b'=' * (-len(token) % 4), altchars=b'-_', validate=True).decode()
+        except (AttributeError, ValueError, binascii.Error):
+            raise marshmallow.ValidationError('Invalid pagination cursor.')
+
+
 class PaginationSchema(marshmallow.Schema):
     """Schema for pagination arguments."""
     skip = marshmallow.fields.Integer(missing=0)
     count = marshmallow.fields.Integer(missing=10)
+    cursor = PageCursor(missing=None)
 
     @marshmallow.post_load
     def make_pagination(self, data):
-        for field in self.fields.keys():
+        for field in ('skip', 'count'):
             data[field] = max(0, data[field])
         return Pagination(**data)
 
     @marshmallow.pre_dump
     def adjust_page_frame(self, obj):
+        if obj.cursor is not None:
+            return
         if obj.total <= 0 or (obj.skip + obj.count) <= 0 or obj.skip >= obj.total:
             return {}
         obj.skip = max(0, obj.skip)
@@ -182,3 +347,97 @@ class PaginationSchema(marshmallow.Schema):
     def _get_field_missing_value(self, name):
         field = self.fields.get(name)
         return field.missing if field else None
+
+
+class JobQuerySchema(marshmallow.Schema):
+    """
+    Schema for job listing query arguments.
+
+    Time ranges include their start and exclude their end;
+    times without a UTC offset are treated as UTC.
+    """
+    _CRITERIA = {
+        'taskDefinition': 'task_definition',
+        'suspended': 'suspended',
+        'triggerType': 'trigger_type',
+        'queueName': 'queue_name',
+        'lastRunSince': 'last_run_since',
+        'lastRunUntil': 'last_run_until',
+        'estimatedNextRunSince': 'next_run_since',
+        'estimatedNextRunUntil': 'next_run_until'
+    }
+    SORT_FIELDS = ('id', 'taskDefinition', 'lastRun', 'estimatedNextRun')
+
+    taskDefinition = marshmallow.fields.String()
+    suspended = marshmallow.fields.Boolean()
+    triggerType = marshmallow.fields.String()
+    queueName = marshmallow.fields.String()
+    lastRunSince = marshmallow.fields.DateTime()
+    lastRunUntil = marshmallow.fields.DateTime()
+    estimatedNextRunSince = marshmallow.fields.DateTime()
+    estimatedNextRunUntil = marshmallow.fields.DateTime()
+    sort = marshmallow.fields.String(
+        validate=marshmallow.validate.OneOf(SORT_FIELDS + tuple('-' + f for f in SORT_FIELDS)))
+    fields = marshmallow.fields.String()
+
+    @marshmallow.validates('fields')
+    def validate_fields(self, value):
+        unknown = set(self._split_fields(value)) - self._projection_fields()
+        if unknown:
+            raise marshmallow.ValidationError(f'Unknown job fields: {", ".join(sorted(unknown))}')
+
+    @marshmallow.post_load
+    def make_query(self, data):
+        criteria = {self._CRITERIA[k]: self._utc(v) for k, v in data.items() if k in self._CRITERIA}
+        fields = data.get('fields')
+        return JobQuery(criteria, data.get('sort'), self._split_fields(fields) if fields is not None else None)
+
+    def _projection_fields(self):
+        return {name for name, field in JobResponseSchema._declared_fields.items() if not field.load_only}
+
+    def _split_fields(self, value):
+        return [name for name in (part.strip() for part in value.split(',')) if name]
+
+    def _utc(self, value):
+        if isinstance(value, datetime.datetime) and value.tzinfo is None:
+            return value.replace(tzinfo=datetime.timezone.utc)
+        return value
+
+
+class JobBatchOperationSchema(marshmallow.Schema):
+    """
+    Schema of a single operation in a job batch request.
+
+    Job fields are validated by the data context when the batch is applied.
+    """
+    _ACTIONS = (StoreOperation.CREATE, StoreOperation.UPDATE, StoreOperation.DELETE)
+
+    action = marshmallow.fields.String(required=True, validate=marshmallow.validate.OneOf(_ACTIONS))
+    id = marshmallow.fields.String()
+    job = marshmallow.fields.Dict()
+    revision = marshmallow.fields.Integer()
+
+    @marshmallow.validates_schema
+    def validate_operation(self, data):
+        # NOTE: field errors already cover operations that are not objects or have no valid action
+        action = data.get('action') if data else None
+        if action not in self._ACTIONS:
+            return
+        if action == StoreOperation.CREATE and 'id' in data:
+            raise marshmallow.ValidationError('create operations take the job id from the job taskDefinition', 'id')
+        if action != StoreOperation.CREATE and 'id' not in data:
+            raise marshmallow.ValidationError(f'{action} operations require a job id', 'id')
+        if action != StoreOperation.DELETE and 'job' not in data:
+            raise marshmallow.ValidationError(f'{action} operations require job fields', 'job')
+
+    @marshmallow.post_load
+    def make_operation(self, data):
+        return StoreOperation(data['action'], data.get('id'), data.get('job'), data.get('revision'))
+
+
+class JobBatchSchema(marshmallow.Schema):
+    """Schema of a job batch request."""
+    operations = marshmallow.fields.List(
+        marshmallow.fields.Nested(JobBatchOperationSchema),
+        required=True,
+        validate=marshmallow.validate.Length(min=1, max=_MAX_BATCH_OPERATIONS))
@@ -0,0 +1,129 @@
+"""
+Local warm-start cache of validated jobs.
+
+WarmStartCache keeps a binary snapshot of the validated job set on local disk
+so restarts do not have to re-read and re-validate every job in a remote store.
+Stores that implement load_changes(watermark) only return records that changed
+since the cached watermark; other stores are read in full but records that are
+unchanged since the snapshot skip validation.
+"""
+import os
+import pickle
+import hashlib
+import json
+import logging
+
+from . import env
+
+
+_logger = logging.getLogger(__name__)
+
+
+def resolve():
+    """
+    Get the warm-start cache configured by the current execution environment.
+
+    :returns: A WarmStartCache if enabled, otherwise None
+    """
+    cache_file = env.get_var('WARM_START_FILE')
+    return WarmStartCache(cache_file) if cache_file else None
+
+
+class WarmStartCache:
+    """
+    On-disk snapshot of validated job data.
+
+    The snapshot file is a short magic header followed by a pickled payload holding
+    the store watermark and, per job, a fingerprint of the raw stored record and the
+    validated job data. The file is replaced atomically when written.
+
+    The snapshot is unpickled when read, which can run arbitrary code, so it must
+    only be writable by the user running ECS Scheduler.
+    """
+    _MAGIC = b'ECSSWS01'
+
+    def __init__(self, path):
+        """
+        Create cache.
+
+        :param path: Path of the snapshot file
+        """
+        self._path = path
+
+    def load_jobs(self, store, validate):
+        """
+        Load validated job data, reading as little of the store as possible.
+
+        Falls back to a full store load if there is no usable snapshot or
+        the store rejects the snapshot watermark. The snapshot is rewritten afterwards.
+
+        :param store: The job store to load from
+        :param validate: Callable that validates a raw job record and returns the job data,
+            or None to leave the record out of the loaded jobs and the snapshot
+        :returns: Dictionary of validated job data by job id
+        """
+        snapshot = self._read()
+        cached = snapshot['jobs'] if snapshot else {}
+        load_changes = getattr(store, 'load_changes', None)
+        if not load_changes:
+            entries = {}
+            for raw_data in store.load_all():
+                self._add_entry(entries, raw_data, cached, validate)
+            self._write(None, entries)
+            return {job_id: job_data for job_id, (_, job_data) in entries.items()}
+
+        # NOTE: a snapshot written without a watermark cannot tell which cached jobs were deleted since
+        watermark = snapshot['watermark'] if snapshot else None
+        changes = load_changes(watermark) if watermark is not None else None
+        if changes is None:
+            _logger.info('No usable warm-start snapshot watermark; loading all jobs')
+            changes, base = load_changes(None), {}
+        else:
+            base = cached
+        changed, deleted, watermark = changes
+        deleted = set(deleted)
+        entries = {job_id: entry for job_id, entry in base.items() if job_id not in deleted}
+        count = 0
+        for raw_data in changed:
+            self._add_entry(entries, raw_data, cached, validate)
+            count += 1
+        _logger.info('Warm-start loaded %s changed jobs and removed %s deleted jobs', count, len(deleted))
+        self._write(watermark, entries)
+        return {job_id: job_data for job_id, (_, job_data) in entries.items()}
+
+    def _add_entry(self, entries, raw_data, cached, validate):
+        fingerprint = self._fingerprint(raw_data)
+        entry = cached.get(raw_data.get('id'))
+        if not entry or entry[0] != fingerprint:
+            job_data = validate(raw_data)
+            if job_data is None:
+                return
+            entry = fingerprint, job_data
+        entries[entry[1]['id']] = entry
+
+    def _fingerprint(self, raw_data):
+        raw_bytes = json.dumps(raw_data, sort_keys=True, default=str).encode()
+        return hashlib.blake2b(raw_bytes, digest_size=16).digest()
+
+    def _read(self):
+        try:
+            with open(self._path, 'rb') as f:
+                if f.read(len(self._MAGIC)) != self._MAGIC:
+                    _logger.warning('Ignoring warm-start snapshot %s with unknown format', self._path)
+                    return None
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            _logger.warning('Ignoring unreadable warm-start snapshot %s', self._path, exc_info=True)
+            return None
+
+    def _write(self, watermark, entries):
+        tmp_path = f'{self._path}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(self._MAGIC)
+                pickle.dump({'watermark': watermark, 'jobs': entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path)
+        except OSError:
+            _logger.warning('Unable to write warm-start snapshot %s', self._path, exc_info=True)
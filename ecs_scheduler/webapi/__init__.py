@@ -7,8 +7,10 @@ import flask_restful
 import flask_cors
 
 from .home import Home
-from .spec import Spec
-from .jobs import Jobs, Job
+from .spec import Spec, SpecDocument
+from .jobs import Jobs, Job, JobsBatch
+from .metrics import Metrics
+from . import cache
 
 
 def create():
@@ -38,10 +40,14 @@ def setup(app, ops_queue, datacontext):
 
     api.add_resource(Home, '/')
 
-    api.add_resource(Spec, '/spec')
+    api.add_resource(Spec, '/spec', resource_class_args=(SpecDocument(),))
 
-    api.add_resource(Jobs, '/jobs', resource_class_args=(ops_queue, datacontext))
-    api.add_resource(Job, '/jobs/<job_id>', resource_class_args=(ops_queue, datacontext))
+    response_cache = cache.resolve()
+    api.add_resource(Jobs, '/jobs', resource_class_args=(ops_queue, datacontext, response_cache))
+    api.add_resource(Job, '/jobs/<job_id>', resource_class_args=(ops_queue, datacontext, response_cache))
+    api.add_resource(JobsBatch, '/jobs:batch', resource_class_args=(ops_queue, datacontext, response_cache))
+
+    api.add_resource(Metrics, '/metrics', resource_class_args=(response_cache, datacontext))
 
     _update_logger(app)
 
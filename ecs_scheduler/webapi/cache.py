@@ -0,0 +1,106 @@
+"""Job response caching."""
+import sys
+import threading
+import collections
+
+from .. import env
+
+
+_DEFAULT_MAXSIZE = 10000
+
+
+def resolve():
+    """
+    Create the job response cache configured by the environment.
+
+    :returns: A ResponseCache sized by the environment or caching up to 10000 job responses if not set
+    """
+    return ResponseCache(int(env.get_var('RESPONSE_CACHE_SIZE') or _DEFAULT_MAXSIZE))
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of serialized job responses.
+
+    Holds one response per job id tagged with the job data version it was serialized from;
+    a cached response is only reused while the job is still at that version.
+    """
+    def __init__(self, maxsize):
+        """
+        Create a response cache.
+
+        :param maxsize: The maximum number of job responses to keep; responses are not cached if 0
+        """
+        self._maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._bytes = 0
+
+    def get(self, job, render):
+        """
+        Get the serialized response for a job.
+
+        :param job: The job to get the response for
+        :param render: Callable that serializes the job if its response is not cached
+        :returns: The serialized job response; callers must not modify it
+        """
+        # NOTE: read the version before rendering so a concurrent job change is never cached under its new version
+        version = job.version
+        with self._lock:
+            entry = self._entries.get(job.id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(job.id)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+        response = render(job)
+        if self._maxsize > 0:
+            size = _sizeof(response)
+            with self._lock:
+                old_entry = self._entries.pop(job.id, None)
+                if old_entry is not None:
+                    self._bytes -= old_entry[2]
+                self._entries[job.id] = version, response, size
+                self._bytes += size
+                while len(self._entries) > self._maxsize:
+                    self._bytes -= self._entries.popitem(last=False)[1][2]
+        return response
+
+    def discard(self, job_id):
+        """
+        Remove a job's response from the cache if present.
+
+        :param job_id: The id of the job
+        """
+        with self._lock:
+            entry = self._entries.pop(job_id, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+
+    def stats(self):
+        """
+        Get the cache statistics.
+
+        :returns: A dictionary of hit and miss counts, hit rate, entry counts and approximate memory use in bytes
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hitRate': self._hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'maxSize': self._maxsize,
+                'bytes': self._bytes
+            }
+
+
+def _sizeof(obj):
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_sizeof(k) + _sizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_sizeof(v) for v in obj)
+    return size
@@ -4,6 +4,7 @@ import flask_restful
 
 from .jobs import Jobs
 from .spec import Spec
+from .metrics import Metrics
 
 
 class Home(flask_restful.Resource):
@@ -24,6 +25,7 @@ class Home(flask_restful.Resource):
         return {
             'resources': [
                 {'link': {'rel': 'jobs', 'title': 'Jobs', 'href': flask.url_for(Jobs.__name__.lower())}},
-                {'link': {'rel': 'spec', 'title': 'Spec', 'href': flask.url_for(Spec.__name__.lower())}}
+                {'link': {'rel': 'spec', 'title': 'Spec', 'href': flask.url_for(Spec.__name__.lower())}},
+                {'link': {'rel': 'metrics', 'title': 'Metrics', 'href': flask.url_for(Metrics.__name__.lower())}}
             ]
         }
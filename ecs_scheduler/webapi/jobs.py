@@ -1,17 +1,27 @@
 """Job REST resources."""
+import json
+import uuid
+import bisect
 import logging
 import functools
-from itertools import islice
+import itertools
 
 import flask
 import flask_restful
+from werkzeug.http import quote_etag
 
-from ..serialization import PaginationSchema, JobResponseSchema
+from .cache import ResponseCache
+from ..serialization import PaginationSchema, JobQuerySchema, JobResponseSchema, JobBatchSchema
 from ..models import Pagination, JobOperation
-from ..datacontext import JobAlreadyExists, JobNotFound, InvalidJobData
+from ..persistence import StoreOperation
+from ..datacontext import JobError, JobAlreadyExists, JobNotFound, JobConflict, InvalidJobData
 
 
 _logger = logging.getLogger(__name__)
+# NOTE: job versions and job set revisions start over on restart so etags are tagged with the process instance
+_instance_tag = uuid.uuid4().hex[:8]
+_NDJSON = 'application/x-ndjson'
+_STREAM_CHUNK_SIZE = 100
 
 
 def require_json_content_type(verb):
@@ -28,10 +38,11 @@ def _job_link(job_id):
     return {'rel': 'item', 'title': f'Job for {job_id}', 'href': flask.url_for(Job.__name__.lower(), job_id=job_id)}
 
 
-def _job_committed_response(job_id):
+def _job_committed_response(job):
     return {
-        'id': job_id,
-        'link': _job_link(job_id)
+        'id': job.id,
+        'revision': job.revision,
+        'link': _job_link(job.id)
     }
 
 
@@ -48,21 +59,120 @@ def _post_operation(job_op, ops_queue, job_response):
 _job_response_schema = JobResponseSchema(_job_link, strict=True)
 
 
+def _render_job(job):
+    return _job_response_schema.dump_data(job.data)
+
+
+def _render_listed_job(job):
+    # NOTE: a lazily loaded job is validated on first access; an invalid stored job is listed
+    # with its validation errors instead of failing the whole listing
+    try:
+        return _render_job(job)
+    except InvalidJobData as ex:
+        _logger.warning('Listing invalid stored job %s: %s', job.id, ex.errors)
+        return {'id': job.id, 'link': _job_link(job.id), 'errors': ex.errors}
+
+
+def _raise_invalid_stored_job(error):
+    flask_restful.abort(500, messages=error.errors,
+        message=f'Stored job {error.job_id} is invalid; correct it in the job store or delete it.')
+
+
+def _project(response, fields):
+    return {k: v for k, v in response.items() if k in fields}
+
+
+def _projector(fields):
+    if fields is None:
+        return lambda response: response
+    fields = {'id', 'link', 'errors', *fields}
+    return lambda response: _project(response, fields)
+
+
+def _job_etag(job):
+    return f'{job.revision}.{job.version}.{_instance_tag}'
+
+
+def _jobs_etag(datacontext, media_type):
+    # NOTE: the json page and the ndjson stream are different representations so they must not share an etag
+    return f'{datacontext.revision}.{_instance_tag}.{media_type.rpartition("/")[2]}'
+
+
+def _not_modified(etag, headers=None):
+    return '', 304, {**(headers or {}), 'ETag': quote_etag(etag)}
+
+
+def _etag_revision(etag):
+    revision, _, _ = etag.partition('.')
+    return int(revision) if revision.isdigit() else None
+
+
+def _expected_revision(job):
+    if_match = flask.request.if_match
+    if not if_match or if_match.star_tag:
+        return None
+    # NOTE: only the persisted revision is compared so runtime annotations like estimatedNextRun do not fail edits
+    if job.revision not in {_etag_revision(etag) for etag in if_match.as_set()}:
+        _raise_precondition_failed(job.id)
+    return job.revision
+
+
+def _raise_precondition_failed(job_id):
+    flask_restful.abort(412, message=f'Job {job_id} does not match the If-Match header.')
+
+
+def _batch_error(error):
+    if isinstance(error, InvalidJobData):
+        return {'status': 400, 'id': error.job_id, 'messages': error.errors}
+    if isinstance(error, JobNotFound):
+        return {'status': 404, 'id': error.job_id, 'message': f'Job {error.job_id} does not exist.'}
+    if isinstance(error, JobAlreadyExists):
+        return {'status': 409, 'id': error.job_id, 'message': f'Job {error.job_id} already exists.'}
+    if isinstance(error, JobConflict):
+        return {'status': 412, 'id': error.job_id,
+                'message': f'Job {error.job_id} does not match the operation revision.'}
+    _logger.error('Batched operation failed for job %s.', error.job_id, exc_info=error)
+    return {'status': 500, 'id': error.job_id, 'message': f'Job {error.job_id} could not be saved.'}
+
+
+def _sort_jobs(jobs, sort):
+    if sort in (None, 'id'):
+        return jobs
+    field = sort.lstrip('-')
+    # NOTE: jobs without a value for the sort field always come last; sorting is stable so ties stay in id order
+    values = {j.id: _sort_value(j, field) for j in jobs}
+    present = [j for j in jobs if values[j.id] is not None]
+    present.sort(key=lambda j: values[j.id], reverse=sort.startswith('-'))
+    return present + [j for j in jobs if values[j.id] is None]
+
+
+def _sort_value(job, field):
+    # NOTE: invalid stored jobs sort with the jobs missing the sort field
+    try:
+        return job.data.get(field)
+    except InvalidJobData:
+        return None
+
+
 class Jobs(flask_restful.Resource):
     """
     Jobs REST Resource
     REST operations for a collection of jobs.
     """
-    def __init__(self, ops_queue, datacontext):
+    def __init__(self, ops_queue, datacontext, response_cache=None):
         """
         Create jobs resource.
 
         :param ops_queue: Ops queue to post job operations to after updating document store
         :param datacontext: The jobs data context for loading and saving jobs
+        :param response_cache: Cache of serialized job responses shared with the job resource;
+            job responses are not cached if not specified
         """
         self._ops_queue = ops_queue
         self._dc = datacontext
+        self._cache = ResponseCache(0) if response_cache is None else response_cache
         self._pagination_schema = PaginationSchema()
+        self._query_schema = JobQuerySchema()
 
     def get(self):
         """
@@ -73,6 +183,7 @@ class Jobs(flask_restful.Resource):
             - jobs
         produces:
             - application/json
+            - application/x-ndjson
         parameters:
             -   name: skip
                 in: query
@@ -83,22 +194,111 @@ class Jobs(flask_restful.Resource):
                 in: query
                 type: integer
                 default: 10
-                description: number of jobs to return
+                description: number of jobs to return; streamed listings return all remaining jobs if not specified
+            -   name: cursor
+                in: query
+                type: string
+                description: opaque cursor from a next page link; pass an empty cursor to start paging from the first job;
+                    only supported when jobs are ordered by id
+            -   name: taskDefinition
+                in: query
+                type: string
+                description: only return jobs for this task definition
+            -   name: suspended
+                in: query
+                type: boolean
+                description: only return suspended or unsuspended jobs
+            -   name: triggerType
+                in: query
+                type: string
+                description: only return jobs with this trigger type, e.g. sqs
+            -   name: queueName
+                in: query
+                type: string
+                description: only return jobs triggered by this queue
+            -   name: lastRunSince
+                in: query
+                type: string
+                format: date-time
+                description: only return jobs last run at or after this time
+            -   name: lastRunUntil
+                in: query
+                type: string
+                format: date-time
+                description: only return jobs last run before this time
+            -   name: estimatedNextRunSince
+                in: query
+                type: string
+                format: date-time
+                description: only return jobs estimated to run next at or after this time
+            -   name: estimatedNextRunUntil
+                in: query
+                type: string
+                format: date-time
+                description: only return jobs estimated to run next before this time
+            -   name: sort
+                in: query
+                type: string
+                enum: [id, taskDefinition, lastRun, estimatedNextRun, -id, -taskDefinition, -lastRun, -estimatedNextRun]
+                default: id
+                description: job field to order jobs by; prefix with - for descending order
+            -   name: fields
+                in: query
+                type: string
+                description: comma-separated job fields to return; id and link are always returned
+            -   name: If-None-Match
+                in: header
+                type: string
+                description: ETag of a previously returned list; returns 304 if no job has changed since
         responses:
             200:
-                description: Paginated list of scheduled jobs
+                description: >
+                    Paginated list of scheduled jobs ordered by job id unless sorted otherwise;
+                    if application/x-ndjson is accepted the jobs are streamed one JSON job per line without pagination links
+                headers:
+                    ETag:
+                        type: string
+                        description: Job set revision and media type; changes whenever any job is added, removed or changed
+                    Vary:
+                        type: string
+                        description: Always Accept since the list and the stream have different ETags
+            304:
+                description: No job has changed since the list matching If-None-Match
             400:
-                description: Invalid pagination arguments
+                description: Invalid pagination or query arguments
             default:
                 description: Server error
         """
+        stream = flask.request.accept_mimetypes.best_match(['application/json', _NDJSON]) == _NDJSON
+        media_type = _NDJSON if stream else 'application/json'
+        # NOTE: computed before reading any jobs so the etag never claims a newer job set than the response
+        etag = _jobs_etag(self._dc, media_type)
+        headers = {'ETag': quote_etag(etag), 'Vary': 'Accept'}
+        if flask.request.if_none_match.contains_weak(etag):
+            return _not_modified(etag, headers)
         pagination = self._parse_pagination(flask.request.values)
-        jobs_page = islice(self._dc.get_all(), pagination.skip, pagination.skip + pagination.count)
+        query = self._parse_query(flask.request.values)
+        if stream:
+            return self._stream_jobs(pagination, query, headers)
+        query_args = {k: flask.request.values[k] for k in self._query_schema.fields if k in flask.request.values}
+        limit = pagination.count if pagination.cursor is None else pagination.count + 1
+        if query.filtered:
+            jobs = self._find_jobs(query, pagination.cursor)
+            total = len(jobs)
+            jobs_page = jobs[pagination.skip:pagination.skip + limit]
+        else:
+            total = None
+            jobs_page = self._dc.get_page(limit, skip=pagination.skip, after=pagination.cursor)
+        project = _projector(query.fields)
         result = {
-            'jobs': [_job_response_schema.dump(j.data).data for j in jobs_page]
+            'jobs': [project(self._cache.get(j, _render_listed_job)) for j in jobs_page[:pagination.count]]
         }
-        self._set_pagination(result, pagination, self._dc.total())
-        return result
+        if pagination.cursor is None:
+            self._set_pagination(result, pagination, self._dc.total() if total is None else total, query_args)
+        elif len(jobs_page) > pagination.count > 0:
+            next_page = Pagination(0, pagination.count, cursor=jobs_page[pagination.count - 1].id)
+            result['next'] = self._pagination_link(next_page, query_args)
+        return result, 200, headers
 
     @require_json_content_type
     def post(self):
@@ -224,7 +424,7 @@ class Jobs(flask_restful.Resource):
             flask_restful.abort(400, messages=ex.errors)
         except JobAlreadyExists as ex:
             flask_restful.abort(409, message=f'Job {ex.job_id} already exists.')
-        web_response = _job_committed_response(new_job.id)
+        web_response = _job_committed_response(new_job)
         _post_operation(JobOperation.add(new_job.id), self._ops_queue, web_response)
         return web_response, 201
 
@@ -235,17 +435,49 @@ class Jobs(flask_restful.Resource):
         else:
             return obj
 
-    def _set_pagination(self, result, pagination, total):
-        prev_link = self._pagination_link(Pagination(pagination.skip - pagination.count, pagination.count, total))
+    def _parse_query(self, data):
+        obj, errors = self._query_schema.load(data)
+        if errors:
+            flask_restful.abort(400, messages=errors)
+        else:
+            return obj
+
+    def _stream_jobs(self, pagination, query, headers):
+        # NOTE: an explicit count is still honored but streams default to every remaining job
+        count = pagination.count if 'count' in flask.request.values else None
+        if query.filtered:
+            jobs = self._find_jobs(query, pagination.cursor)[pagination.skip:]
+            jobs = jobs if count is None else jobs[:count]
+        else:
+            jobs = self._dc.iter_page(count, skip=pagination.skip, after=pagination.cursor)
+        project = _projector(query.fields)
+
+        def generate():
+            jobs_iter = iter(jobs)
+            for chunk in iter(lambda: list(itertools.islice(jobs_iter, _STREAM_CHUNK_SIZE)), []):
+                yield ''.join(json.dumps(project(self._cache.get(j, _render_listed_job))) + '\n' for j in chunk)
+
+        return flask.Response(flask.stream_with_context(generate()), mimetype=_NDJSON, headers=headers)
+
+    def _find_jobs(self, query, cursor):
+        if cursor is not None and query.sort not in (None, 'id'):
+            flask_restful.abort(400, messages={'cursor': ['Cursor pagination requires jobs ordered by id.']})
+        jobs = _sort_jobs(self._dc.find(**query.criteria), query.sort)
+        if cursor is not None:
+            jobs = jobs[bisect.bisect_right([j.id for j in jobs], cursor):]
+        return jobs
+
+    def _set_pagination(self, result, pagination, total, query_args):
+        prev_link = self._pagination_link(Pagination(pagination.skip - pagination.count, pagination.count, total), query_args)
         if prev_link:
             result['prev'] = prev_link
-        next_link = self._pagination_link(Pagination(pagination.skip + pagination.count, pagination.count, total))
+        next_link = self._pagination_link(Pagination(pagination.skip + pagination.count, pagination.count, total), query_args)
         if next_link:
             result['next'] = next_link
 
-    def _pagination_link(self, page_frame):
+    def _pagination_link(self, page_frame, query_args):
         values, e = self._pagination_schema.dump(page_frame)
-        return flask.url_for(Jobs.__name__.lower(), **values) if values else None
+        return flask.url_for(Jobs.__name__.lower(), **query_args, **values) if values else None
 
 
 class Job(flask_restful.Resource):
@@ -253,16 +485,19 @@ class Job(flask_restful.Resource):
     Job REST Resource
     REST operations for a single job.
     """
-    def __init__(self, ops_queue, datacontext):
+    def __init__(self, ops_queue, datacontext, response_cache=None):
         """
         Create job resource.
 
         :param store: Document store for updating persistent data
         :param ops_queue: Ops queue to post job operations to after updating document store
         :param datacontext: The jobs data context for loading and saving jobs
+        :param response_cache: Cache of serialized job responses shared with the jobs resource;
+            job responses are not cached if not specified
         """
         self._ops_queue = ops_queue
         self._dc = datacontext
+        self._cache = ResponseCache(0) if response_cache is None else response_cache
 
     def get(self, job_id):
         """
@@ -279,9 +514,19 @@ class Job(flask_restful.Resource):
                 type: string
                 required: true
                 description: the job id
+            -   name: If-None-Match
+                in: header
+                type: string
+                description: ETag of a previously returned job; returns 304 if the job has not changed since
         responses:
             200:
                 description: The job for job id
+                headers:
+                    ETag:
+                        type: string
+                        description: Job revision and runtime version; changes whenever the job changes
+            304:
+                description: Job has not changed since the job matching If-None-Match
             404:
                 description: Job not found
             default:
@@ -291,7 +536,13 @@ class Job(flask_restful.Resource):
             job = self._dc.get(job_id)
         except JobNotFound:
             self._raise_job_notfound(job_id)
-        return _job_response_schema.dump(job.data).data
+        except InvalidJobData as ex:
+            _raise_invalid_stored_job(ex)
+        # NOTE: computed before reading the job data so the etag never claims a newer job than the response
+        etag = _job_etag(job)
+        if flask.request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
+        return self._cache.get(job, _render_job), 200, {'ETag': quote_etag(etag)}
 
     @require_json_content_type
     def put(self, job_id):
@@ -359,6 +610,12 @@ class Job(flask_restful.Resource):
                             type: array
                             items:
                                 $ref: '#/definitions/Override'
+            -   name: If-Match
+                in: header
+                type: string
+                description: >
+                    ETag of the job being updated; the update fails if the job has been updated since.
+                    Only the stored job revision is compared so runtime changes like estimatedNextRun do not fail the update
         responses:
             200:
                 description: Job updated and rescheduled
@@ -366,6 +623,8 @@ class Job(flask_restful.Resource):
                 description: Invalid body
             404:
                 description: Job not found
+            412:
+                description: Job does not match If-Match
             415:
                 description: Invalid request media type
             default:
@@ -375,12 +634,17 @@ class Job(flask_restful.Resource):
             current_job = self._dc.get(job_id)
         except JobNotFound:
             self._raise_job_notfound(job_id)
+        except InvalidJobData as ex:
+            _raise_invalid_stored_job(ex)
+        revision = _expected_revision(current_job)
         job_update = flask.request.json
         try:
-            current_job.update(job_update)
+            current_job.update(job_update, revision=revision)
         except InvalidJobData as ex:
             flask_restful.abort(400, messages=ex.errors)
-        web_response = _job_committed_response(job_id)
+        except JobConflict:
+            _raise_precondition_failed(job_id)
+        web_response = _job_committed_response(current_job)
         _post_operation(JobOperation.modify(job_id), self._ops_queue, web_response)
         return web_response
 
@@ -399,21 +663,140 @@ class Job(flask_restful.Resource):
                 type: string
                 required: true
                 description: the job id
+            -   name: If-Match
+                in: header
+                type: string
+                description: ETag of the job being deleted; the delete fails if the job has been updated since
         responses:
             200:
                 description: Job deleted
             404:
                 description: Job not found
+            412:
+                description: Job does not match If-Match
             default:
                 description: Server error
         """
         try:
-            self._dc.delete(job_id)
+            revision = _expected_revision(self._dc.get(job_id)) if flask.request.if_match else None
+            self._dc.delete(job_id, revision=revision)
         except JobNotFound:
             self._raise_job_notfound(job_id)
+        except InvalidJobData as ex:
+            _raise_invalid_stored_job(ex)
+        except JobConflict:
+            _raise_precondition_failed(job_id)
+        self._cache.discard(job_id)
         web_response = {'id': job_id}
         _post_operation(JobOperation.remove(job_id), self._ops_queue, web_response)
         return web_response
 
     def _raise_job_notfound(self, job_id):
         flask_restful.abort(404, message=f'Job {job_id} does not exist.')
+
+
+class JobsBatch(flask_restful.Resource):
+    """
+    Jobs batch REST Resource
+    REST operations for applying many job changes at once.
+    """
+    def __init__(self, ops_queue, datacontext, response_cache=None):
+        """
+        Create jobs batch resource.
+
+        :param ops_queue: Ops queue to post job operations to after updating document store
+        :param datacontext: The jobs data context for loading and saving jobs
+        :param response_cache: Cache of serialized job responses shared with the job resources;
+            job responses are not cached if not specified
+        """
+        self._ops_queue = ops_queue
+        self._dc = datacontext
+        self._cache = ResponseCache(0) if response_cache is None else response_cache
+        self._batch_schema = JobBatchSchema()
+
+    @require_json_content_type
+    def post(self):
+        """
+        Batch job changes
+        Create, update and delete many jobs in a single request.
+        All operations are validated before any is saved, valid operations are saved to the job store together
+        and the scheduler is notified once for the whole batch.
+        Each operation succeeds or fails on its own; the response reports the outcome of every operation in order.
+        ---
+        tags:
+            - jobs
+        consumes:
+            - application/json
+        produces:
+            - application/json
+        parameters:
+            -   name: batch
+                in: body
+                required: true
+                schema:
+                    required:
+                        - operations
+                    properties:
+                        operations:
+                            type: array
+                            minItems: 1
+                            maxItems: 1000
+                            items:
+                                required:
+                                    - action
+                                properties:
+                                    action:
+                                        type: string
+                                        enum:
+                                            - create
+                                            - update
+                                            - delete
+                                        description: The change to make to the job
+                                    id:
+                                        type: string
+                                        description: Id of the job to update or delete; created jobs take their id from taskDefinition
+                                    job:
+                                        type: object
+                                        description: >
+                                            Job fields to create or update, as in the body of POST /jobs or PUT /jobs/{job_id}
+                                    revision:
+                                        type: integer
+                                        description: >
+                                            Expected current revision of the job to update or delete;
+                                            the operation fails if the job has been updated since
+        responses:
+            200:
+                description: >
+                    Batch applied; results lists the outcome of each operation in request order
+                    with a status of 201 (created), 200 (updated or deleted), 400 (invalid job fields),
+                    404 (job not found), 409 (job already exists), 412 (revision mismatch) or 500 (not saved)
+            400:
+                description: Invalid body
+            415:
+                description: Invalid request media type
+            default:
+                description: Server error
+        """
+        batch, errors = self._batch_schema.load(flask.request.json)
+        if errors:
+            flask_restful.abort(400, messages=errors)
+        ops = batch['operations']
+        results = []
+        job_ops = []
+        for op, result in zip(ops, self._dc.batch(ops)):
+            if isinstance(result, JobError):
+                results.append(_batch_error(result))
+            elif op.action == StoreOperation.DELETE:
+                self._cache.discard(op.job_id)
+                results.append({'status': 200, 'id': op.job_id})
+                job_ops.append(JobOperation.remove(op.job_id))
+            elif op.action == StoreOperation.CREATE:
+                results.append({'status': 201, **_job_committed_response(result)})
+                job_ops.append(JobOperation.add(result.id))
+            else:
+                results.append({'status': 200, **_job_committed_response(result)})
+                job_ops.append(JobOperation.modify(result.id))
+        web_response = {'results': results}
+        if job_ops:
+            _post_operation(JobOperation.batch(job_ops), self._ops_queue, web_response)
+        return web_response
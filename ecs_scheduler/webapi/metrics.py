@@ -0,0 +1,47 @@
+"""Metrics REST resources."""
+import flask_restful
+
+from .. import crontriggers
+from ..writebehind import WriteBehindStore
+
+
+class Metrics(flask_restful.Resource):
+    """Metrics REST resource."""
+    def __init__(self, response_cache, datacontext):
+        """
+        Create metrics resource.
+
+        :param response_cache: The job response cache shared by the job resources
+        :param datacontext: The jobs data context
+        """
+        self._cache = response_cache
+        self._dc = datacontext
+
+    def get(self):
+        """
+        Metrics
+        Cache statistics for the web api and scheduler, and the write-behind queue depth if enabled.
+        ---
+        tags:
+            - docs
+        produces:
+            - application/json
+        responses:
+            200:
+                description: >
+                    Hit and miss counts and sizes of the job response and cron trigger caches;
+                    includes the number of job writes waiting to be flushed if write-behind is enabled
+        """
+        triggers = crontriggers.cache_info()
+        result = {
+            'responseCache': self._cache.stats(),
+            'cronTriggerCache': {
+                'hits': triggers.hits,
+                'misses': triggers.misses,
+                'size': triggers.currsize,
+                'maxSize': triggers.maxsize
+            }
+        }
+        if isinstance(self._dc.store, WriteBehindStore):
+            result['writeBehind'] = {'depth': self._dc.store.depth()}
+        return result
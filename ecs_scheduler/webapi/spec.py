@@ -1,13 +1,64 @@
 """Documentation REST resources."""
+import json
+import hashlib
+import threading
+
 import flask
 import flask_restful
 import flask_swagger
+from werkzeug.http import quote_etag
 
 from .. import env
 
 
+class SpecDocument:
+    """
+    Swagger spec of the web api.
+
+    The spec is generated on first use and then served from memory
+    as encoded JSON along with an ETag computed from its content.
+    """
+    def __init__(self):
+        """Create a spec document."""
+        self._lock = threading.Lock()
+        self._rendered = None
+
+    def get(self, app):
+        """
+        Get the encoded spec, generating it on first use.
+
+        :param app: The flask app to generate the spec from; all resources must be registered before first use
+        :returns: A tuple of the JSON encoded spec and its ETag
+        """
+        rendered = self._rendered
+        if rendered is None:
+            with self._lock:
+                if self._rendered is None:
+                    self._rendered = _render(app)
+                rendered = self._rendered
+        return rendered
+
+
+def _render(app):
+    swag = flask_swagger.swagger(app)
+    swag['info']['version'] = env.get_version()
+    swag['info']['title'] = 'ECS Scheduler Web Api (webapi)'
+    swag['basePath'] = '/'
+    body = json.dumps(swag, sort_keys=True).encode()
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+
 class Spec(flask_restful.Resource):
     """Swagger spec REST resource."""
+    def __init__(self, document=None):
+        """
+        Create spec resource.
+
+        :param document: The spec document shared across requests;
+            the spec is generated for every request if not specified
+        """
+        self._document = SpecDocument() if document is None else document
+
     def get(self):
         """
         API spec
@@ -17,12 +68,23 @@ class Spec(flask_restful.Resource):
             - docs
         produces:
             - application/json
+        parameters:
+            -   name: If-None-Match
+                in: header
+                type: string
+                description: ETag of a previously returned spec; returns 304 if the spec is unchanged
         responses:
             200:
                 description: API spec documentation
+                headers:
+                    ETag:
+                        type: string
+                        description: Spec version tag
+            304:
+                description: Spec not modified
         """
-        swag = flask_swagger.swagger(flask.current_app)
-        swag['info']['version'] = env.get_version()
-        swag['info']['title'] = 'ECS Scheduler Web Api (webapi)'
-        swag['basePath'] = '/'
-        return swag
+        body, etag = self._document.get(flask.current_app)
+        headers = {'ETag': quote_etag(etag)}
+        if flask.request.if_none_match.contains_weak(etag):
+            return flask.Response(status=304, headers=headers)
+        return flask.Response(body, mimetype='application/json', headers=headers)
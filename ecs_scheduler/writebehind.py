@@ -0,0 +1,218 @@
+"""
+Write-behind group commit for job data stores.
+
+WriteBehindStore sits between the jobs data context and a persistent store.
+Writes are queued and flushed in batches on a background thread;
+each caller blocks until the batch holding its write has been applied
+so a write is still durable before it is acknowledged.
+"""
+import logging
+import threading
+import collections
+
+from . import env, persistence
+from .persistence import StoreOperation
+
+
+_logger = logging.getLogger(__name__)
+_DEFAULT_BATCH_SIZE = 100
+_DEFAULT_QUEUE_SIZE = 1000
+
+
+def resolve(store):
+    """
+    Wrap a data store in a write-behind store if configured by the current execution environment.
+
+    :param store: The data store to wrap
+    :returns: A WriteBehindStore wrapping store if enabled, otherwise the original store
+    """
+    interval = env.get_var('WRITE_BEHIND_INTERVAL')
+    if not interval:
+        return store
+    return WriteBehindStore(store,
+        flush_interval=float(interval),
+        batch_size=int(env.get_var('WRITE_BEHIND_BATCH_SIZE') or _DEFAULT_BATCH_SIZE),
+        queue_size=int(env.get_var('WRITE_BEHIND_QUEUE_SIZE') or _DEFAULT_QUEUE_SIZE))
+
+
+class WriteBehindStore:
+    """
+    Group-commit wrapper for a job data store.
+
+    Repeated unconditional writes to the same job that are still waiting to be
+    flushed are coalesced into a single store operation. If the wrapped store implements
+    bulk_write(ops) each batch is written with it, otherwise the operations
+    are applied one at a time. Any other store attribute, such as load_changes,
+    is read from the wrapped store.
+    """
+    def __init__(self, store, flush_interval, batch_size=_DEFAULT_BATCH_SIZE, queue_size=_DEFAULT_QUEUE_SIZE):
+        """
+        Create store.
+
+        :param store: The data store to write through to
+        :param flush_interval: Maximum seconds a write waits for its batch to fill before being flushed
+        :param batch_size: Maximum number of store operations per flush
+        :param queue_size: Maximum number of pending store operations; writers block while the queue is full
+        """
+        self._store = store
+        self._flush_interval = flush_interval
+        self._batch_size = max(1, batch_size)
+        self._queue_size = max(1, queue_size)
+        self._pending = collections.deque()
+        self._latest = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._run, name='write-behind-flusher', daemon=True)
+        self._flusher.start()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._store, name)
+
+    def depth(self):
+        """
+        Get the number of store operations waiting to be flushed.
+
+        :returns: The pending operation count
+        """
+        with self._cond:
+            return len(self._pending)
+
+    def load_all(self):
+        """
+        Get all jobs from the wrapped store.
+
+        :returns: Generator yielding job data dictionary for each job
+        """
+        yield from self._store.load_all()
+
+    def create(self, job_id, job_data):
+        """
+        Create a new job, blocking until it is stored.
+
+        :param job_id: Job id
+        :param job_data: Job contents
+        :returns: The new job revision
+        """
+        return self._submit(StoreOperation.create(job_id, job_data))
+
+    def update(self, job_id, job_data, revision=None):
+        """
+        Update an existing job, blocking until it is stored.
+
+        :param job_id: Job id
+        :param job_data: Job fields to update
+        :param revision: Expected current job revision; the update is unconditional if not specified
+        :returns: The new job revision
+        """
+        return self._submit(StoreOperation.update(job_id, job_data, revision))
+
+    def delete(self, job_id, revision=None):
+        """
+        Delete a job, blocking until it is removed from the store.
+
+        :param job_id: Job id
+        :param revision: Expected current job revision; the delete is unconditional if not specified
+        """
+        self._submit(StoreOperation.delete(job_id, revision))
+
+    def bulk_write(self, ops):
+        """
+        Queue several store operations, blocking until all are stored.
+
+        :param ops: Sequence of StoreOperations to apply in order
+        :returns: List of results aligned with ops; the new job revision for each successful create or update,
+            None for each successful delete and the exception for each failed operation
+        """
+        writes = [self._enqueue(op) for op in ops]
+        return [w.wait() for w in writes]
+
+    def close(self):
+        """Flush any pending writes and stop the background flusher."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+
+    def _submit(self, op):
+        result = self._enqueue(op).wait()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _enqueue(self, op):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Write-behind store is closed')
+            write = self._latest.get(op.job_id)
+            if write and write.merge(op):
+                return write
+            while len(self._pending) >= self._queue_size:
+                self._cond.wait()
+            write = _PendingWrite(op)
+            self._pending.append(write)
+            self._latest[op.job_id] = write
+            self._cond.notify_all()
+            return write
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._flush(batch)
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._closed)
+            if not self._pending:
+                return None
+            if not self._closed:
+                self._cond.wait_for(lambda: len(self._pending) >= self._batch_size or self._closed, self._flush_interval)
+            batch = [self._pending.popleft() for _ in range(min(self._batch_size, len(self._pending)))]
+            for write in batch:
+                if self._latest.get(write.op.job_id) is write:
+                    del self._latest[write.op.job_id]
+            self._cond.notify_all()
+            return batch
+
+    def _flush(self, batch):
+        ops = [write.op for write in batch]
+        _logger.debug('Flushing %s job writes; %s still pending', len(ops), self.depth())
+        try:
+            results = self._write(ops)
+        except Exception as ex:
+            _logger.exception('Write-behind batch of %s job writes failed', len(ops))
+            results = [ex] * len(ops)
+        for write, result in zip(batch, results):
+            write.complete(result)
+
+    def _write(self, ops):
+        return persistence.bulk_write(self._store, ops)
+
+
+class _PendingWrite:
+    def __init__(self, op):
+        self.op = op
+        self._done = threading.Event()
+        self._result = None
+
+    def merge(self, op):
+        current = self.op
+        # NOTE: conditional writes are never coalesced so each is checked against the revision its caller expects
+        if op.revision is not None or current.revision is not None:
+            return False
+        if op.action == StoreOperation.UPDATE and current.action in (StoreOperation.CREATE, StoreOperation.UPDATE):
+            self.op = current._replace(job_data={**current.job_data, **op.job_data})
+            return True
+        # NOTE: a delete is queued after a pending update so the update's caller still gets its new revision
+        return False
+
+    def complete(self, result):
+        self._result = result
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        return self._result
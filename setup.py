@@ -32,14 +32,15 @@ setup(
         'Natural Language :: English',
 
         'Framework :: Flask',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3.8',
         'Environment :: Web Environment',
         'Operating System :: OS Independent'
     ],
     keywords='aws ecs docker scheduler scheduling rest',
     
     packages=find_packages(exclude=['test']),
+    python_requires='>=3.8',
     install_requires=install_requires,
     setup_requires=setup_requires,
     test_suite='test'
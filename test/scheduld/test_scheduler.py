@@ -1,7 +1,7 @@
 import unittest
 import logging
 import datetime
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, PropertyMock
 
 import apscheduler.jobstores.base
 import apscheduler.events
@@ -9,7 +9,7 @@ import apscheduler.events
 from ecs_scheduler.scheduld.scheduler import Scheduler, ScheduleEventHandler
 from ecs_scheduler.models import JobOperation
 from ecs_scheduler.scheduld.execution import JobExecutor, JobResult
-from ecs_scheduler.datacontext import JobNotFound
+from ecs_scheduler.datacontext import JobNotFound, InvalidJobData
 
 
 class SchedulerTests(unittest.TestCase):
@@ -20,6 +20,9 @@ class SchedulerTests(unittest.TestCase):
             self._test_exec = lambda: None
             self._dc = Mock()
             self._target = Scheduler(self._dc, self._test_exec)
+        build_patcher = patch('ecs_scheduler.crontriggers.build')
+        self._build_trigger = build_patcher.start()
+        self.addCleanup(build_patcher.stop)
 
     def test_init_sets_up_scheduler(self):
         self._bg_sched_cls.assert_called_with(timezone='UTC',
@@ -42,6 +45,18 @@ class SchedulerTests(unittest.TestCase):
         self.assertEqual(3, self._bg_sched.add_job.call_count)
         self._bg_sched.start.assert_called_with()
 
+    def test_start_skips_invalid_jobs(self):
+        invalid_job = Mock(id='job2')
+        type(invalid_job).parsed_schedule = PropertyMock(side_effect=InvalidJobData('job2', {'schedule': ['bad']}))
+        self._dc.get_all.return_value = (Mock(id='job1', parsed_schedule={'second': '10'}),
+                                            invalid_job,
+                                            Mock(id='job3', parsed_schedule={'year': '2013', 'month': '3'}))
+
+        self._target.start()
+
+        self.assertEqual(2, self._bg_sched.add_job.call_count)
+        self._bg_sched.start.assert_called_with()
+
     def test_start_with_no_existing_jobs(self):
         self._dc.get_all.return_value = []
 
@@ -62,8 +77,10 @@ class SchedulerTests(unittest.TestCase):
         self._target.notify(JobOperation.add('job4'))
 
         self._dc.get.assert_called_with('job4')
-        self._bg_sched.add_job.assert_called_with(self._test_exec, 'cron',
-            kwargs=job.data, id=job.id, replace_existing=True, day='23')
+        self._build_trigger.assert_called_with({'day': '23'}, timezone='UTC',
+            start_date=None, end_date=None)
+        self._bg_sched.add_job.assert_called_with(self._test_exec, self._build_trigger.return_value,
+            kwargs=job.data, id=job.id, replace_existing=True)
 
     def test_add_job_creates_new_job_as_paused_if_suspended(self):
         job = Mock(id='job4', parsed_schedule={'day': '23'}, suspended=True, data={})
@@ -72,8 +89,10 @@ class SchedulerTests(unittest.TestCase):
         self._target.notify(JobOperation.add('job4'))
 
         self._dc.get.assert_called_with('job4')
-        self._bg_sched.add_job.assert_called_with(self._test_exec, 'cron',
-            kwargs=job.data, id=job.id, replace_existing=True, next_run_time=None, day='23')
+        self._build_trigger.assert_called_with({'day': '23'}, timezone='UTC',
+            start_date=None, end_date=None)
+        self._bg_sched.add_job.assert_called_with(self._test_exec, self._build_trigger.return_value,
+            kwargs=job.data, id=job.id, replace_existing=True, next_run_time=None)
 
     def test_add_job_sets_end_date_if_given(self):
         test_date = datetime.datetime.now()
@@ -83,8 +102,10 @@ class SchedulerTests(unittest.TestCase):
         self._target.notify(JobOperation.add('job4'))
 
         self._dc.get.assert_called_with('job4')
-        self._bg_sched.add_job.assert_called_with(self._test_exec, 'cron',
-            kwargs=job.data, id=job.id, replace_existing=True, day='23', end_date=test_date)
+        self._build_trigger.assert_called_with({'day': '23'}, timezone='UTC',
+            start_date=None, end_date=test_date)
+        self._bg_sched.add_job.assert_called_with(self._test_exec, self._build_trigger.return_value,
+            kwargs=job.data, id=job.id, replace_existing=True)
 
     def test_add_job_sets_start_date_if_given(self):
         test_date = datetime.datetime.now()
@@ -94,8 +115,10 @@ class SchedulerTests(unittest.TestCase):
         self._target.notify(JobOperation.add('job4'))
 
         self._dc.get.assert_called_with('job4')
-        self._bg_sched.add_job.assert_called_with(self._test_exec, 'cron',
-            kwargs=job.data, id=job.id, replace_existing=True, day='23', start_date=test_date)
+        self._build_trigger.assert_called_with({'day': '23'}, timezone='UTC',
+            start_date=test_date, end_date=None)
+        self._bg_sched.add_job.assert_called_with(self._test_exec, self._build_trigger.return_value,
+            kwargs=job.data, id=job.id, replace_existing=True)
 
     def test_add_job_sets_timezone_if_given(self):
         job = Mock(id='job4', parsed_schedule={'day': '23'}, suspended=False, data={'timezone': 'US/Pacific'})
@@ -104,8 +127,10 @@ class SchedulerTests(unittest.TestCase):
         self._target.notify(JobOperation.add('job4'))
 
         self._dc.get.assert_called_with('job4')
-        self._bg_sched.add_job.assert_called_with(self._test_exec, 'cron',
-            kwargs=job.data, id=job.id, replace_existing=True, day='23', timezone='US/Pacific')
+        self._build_trigger.assert_called_with({'day': '23'}, timezone='US/Pacific',
+            start_date=None, end_date=None)
+        self._bg_sched.add_job.assert_called_with(self._test_exec, self._build_trigger.return_value,
+            kwargs=job.data, id=job.id, replace_existing=True)
 
     def test_add_job_sets_start_date_as_last_run_if_given(self):
         schedule_start = datetime.datetime(2013, 2, 28)
@@ -116,8 +141,10 @@ class SchedulerTests(unittest.TestCase):
         self._target.notify(JobOperation.add('job4'))
 
         self._dc.get.assert_called_with('job4')
-        self._bg_sched.add_job.assert_called_with(self._test_exec, 'cron',
-            kwargs=job.data, id=job.id, replace_existing=True, day='23', start_date=last_run)
+        self._build_trigger.assert_called_with({'day': '23'}, timezone='UTC',
+            start_date=last_run, end_date=None)
+        self._bg_sched.add_job.assert_called_with(self._test_exec, self._build_trigger.return_value,
+            kwargs=job.data, id=job.id, replace_existing=True)
 
     def test_modify_job_adds_job_to_scheduler(self):
         job = Mock(id='job4', parsed_schedule={'day': '23'}, suspended=False, data={})
@@ -126,8 +153,10 @@ class SchedulerTests(unittest.TestCase):
         self._target.notify(JobOperation.modify('job4'))
 
         self._dc.get.assert_called_with('job4')
-        self._bg_sched.add_job.assert_called_with(self._test_exec, 'cron',
-            kwargs=job.data, id=job.id, replace_existing=True, day='23')
+        self._build_trigger.assert_called_with({'day': '23'}, timezone='UTC',
+            start_date=None, end_date=None)
+        self._bg_sched.add_job.assert_called_with(self._test_exec, self._build_trigger.return_value,
+            kwargs=job.data, id=job.id, replace_existing=True)
 
     def test_modify_job_adds_job_as_paused_if_suspended(self):
         job = Mock(id='job4', parsed_schedule={'day': '23'}, suspended=True, data={})
@@ -136,8 +165,10 @@ class SchedulerTests(unittest.TestCase):
         self._target.notify(JobOperation.modify('job4'))
 
         self._dc.get.assert_called_with('job4')
-        self._bg_sched.add_job.assert_called_with(self._test_exec, 'cron',
-            kwargs=job.data, id=job.id, replace_existing=True, next_run_time=None, day='23')
+        self._build_trigger.assert_called_with({'day': '23'}, timezone='UTC',
+            start_date=None, end_date=None)
+        self._bg_sched.add_job.assert_called_with(self._test_exec, self._build_trigger.return_value,
+            kwargs=job.data, id=job.id, replace_existing=True, next_run_time=None)
 
     def test_remove_job(self):
         job_id = 'job3'
@@ -156,6 +187,26 @@ class SchedulerTests(unittest.TestCase):
 
         fake_log.assert_called()
 
+    def test_batch_applies_each_operation(self):
+        job = Mock(id='job4', parsed_schedule={'day': '23'}, suspended=False, data={})
+        self._dc.get.return_value = job
+
+        self._target.notify(JobOperation.batch([JobOperation.add('job4'), JobOperation.remove('job3')]))
+
+        self._dc.get.assert_called_once_with('job4')
+        self._bg_sched.add_job.assert_called_once()
+        self._bg_sched.remove_job.assert_called_once_with('job3')
+
+    @patch.object(logging.getLogger('ecs_scheduler.scheduld.scheduler'), 'exception')
+    def test_batch_applies_remaining_operations_then_raises_first_error(self, fake_log):
+        self._dc.get.side_effect = JobNotFound('job4')
+
+        with self.assertRaises(JobNotFound):
+            self._target.notify(JobOperation.batch([JobOperation.add('job4'), JobOperation.remove('job3')]))
+
+        fake_log.assert_called()
+        self._bg_sched.remove_job.assert_called_once_with('job3')
+
     def test_notify_raises_error_if_unknown_job_operation(self):
         with self.assertRaises(RuntimeError):
             self._target.notify(JobOperation(-1, 'job4'))
@@ -0,0 +1,110 @@
+import unittest
+import datetime
+from unittest.mock import patch
+
+import pytz
+from apscheduler.triggers.cron import CronTrigger
+
+from ecs_scheduler.crontriggers import TriggerCache, CacheInfo, get, build, cache_info
+
+
+class TriggerCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._target = TriggerCache(maxsize=2)
+
+    def test_get_compiles_trigger(self):
+        trigger = self._target.get({'minute': '*/5', 'hour': '3'})
+
+        self.assertIsInstance(trigger, CronTrigger)
+        self.assertEqual(pytz.utc, trigger.timezone)
+        self.assertIsNone(trigger.start_date)
+        self.assertEqual('*/5', str(trigger.fields[CronTrigger.FIELD_NAMES.index('minute')]))
+        self.assertEqual(CacheInfo(0, 1, 2, 1), self._target.info())
+
+    def test_get_returns_cached_trigger_for_same_schedule(self):
+        first = self._target.get({'minute': '*/5', 'hour': '3'}, timezone='US/Pacific')
+        second = self._target.get({'hour': '3', 'minute': '*/5', 'day': None}, timezone='US/Pacific')
+
+        self.assertIs(first, second)
+        self.assertEqual(CacheInfo(1, 1, 2, 1), self._target.info())
+
+    def test_get_normalizes_argument_types(self):
+        first = self._target.get({'minute': 5})
+        second = self._target.get({'minute': '5'})
+
+        self.assertIs(first, second)
+
+    def test_get_compiles_separate_trigger_per_timezone(self):
+        utc = self._target.get({'minute': '5'})
+        pacific = self._target.get({'minute': '5'}, timezone='US/Pacific')
+
+        self.assertIsNot(utc, pacific)
+        self.assertEqual(pytz.timezone('US/Pacific'), pacific.timezone)
+        self.assertEqual(CacheInfo(0, 2, 2, 2), self._target.info())
+
+    def test_get_evicts_least_recently_used(self):
+        first = self._target.get({'minute': '1'})
+        self._target.get({'minute': '2'})
+        self._target.get({'minute': '1'})
+        self._target.get({'minute': '3'})
+
+        self.assertIs(first, self._target.get({'minute': '1'}))
+        self.assertEqual(CacheInfo(2, 3, 2, 2), self._target.info())
+        self._target.get({'minute': '2'})
+        self.assertEqual(CacheInfo(2, 4, 2, 2), self._target.info())
+
+    def test_get_raises_for_invalid_schedule(self):
+        with self.assertRaises(ValueError):
+            self._target.get({'minute': '75'})
+
+        self.assertEqual(CacheInfo(0, 1, 2, 0), self._target.info())
+
+    def test_get_raises_for_invalid_timezone(self):
+        with self.assertRaises(pytz.UnknownTimeZoneError):
+            self._target.get({}, timezone='not/a/timezone')
+
+    def test_clear(self):
+        self._target.get({'minute': '1'})
+        self._target.get({'minute': '1'})
+
+        self._target.clear()
+
+        self.assertEqual(CacheInfo(0, 0, 2, 0), self._target.info())
+
+
+class GlobalCacheTests(unittest.TestCase):
+    def setUp(self):
+        cache_patcher = patch('ecs_scheduler.crontriggers._cache', TriggerCache())
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+
+    def test_get_uses_global_cache(self):
+        first = get({'minute': '1'})
+        second = get({'minute': '1'})
+
+        self.assertIs(first, second)
+        self.assertEqual(1, cache_info().hits)
+
+    def test_build_copies_cached_trigger_with_dates(self):
+        start = datetime.datetime(2017, 6, 1)
+        end = datetime.datetime(2017, 7, 1, tzinfo=pytz.utc)
+
+        trigger = build({'minute': '1'}, timezone='US/Pacific', start_date=start, end_date=end)
+
+        cached = get({'minute': '1'}, timezone='US/Pacific')
+        self.assertIsNot(cached, trigger)
+        self.assertIs(cached.fields, trigger.fields)
+        self.assertIsNone(cached.start_date)
+        self.assertIsNone(cached.end_date)
+        self.assertEqual(pytz.timezone('US/Pacific').localize(start), trigger.start_date)
+        self.assertEqual(end, trigger.end_date)
+
+    def test_build_matches_uncached_trigger(self):
+        start = datetime.datetime(2017, 6, 1, 12, 34, tzinfo=pytz.utc)
+        now = datetime.datetime(2017, 6, 14, 8, tzinfo=pytz.utc)
+        schedule = {'second': '0', 'minute': '*/5', 'hour': '*', 'day_of_week': 'mon-fri'}
+
+        trigger = build(schedule, timezone='America/New_York', start_date=start)
+
+        expected = CronTrigger(**schedule, timezone='America/New_York', start_date=start)
+        self.assertEqual(expected.get_next_fire_time(None, now), trigger.get_next_fire_time(None, now))
@@ -1,9 +1,14 @@
 import unittest
+import threading
+from datetime import datetime, timedelta, timezone
 from unittest.mock import Mock, patch
 
-from ecs_scheduler.datacontext import Jobs, Job, JobDataMapping, \
+from ecs_scheduler.persistence import WriteConflict, StoreOperation
+from ecs_scheduler.serialization import JobSchema
+
+from ecs_scheduler.datacontext import Jobs, Job, JobDataMapping, _LockPool, \
                                         JobNotFound, InvalidJobData, \
-                                        JobAlreadyExists, JobPersistenceError, \
+                                        JobAlreadyExists, JobPersistenceError, JobConflict, \
                                         JobFieldsRequirePersistence, ImmutableJobFields
 
 
@@ -15,7 +20,7 @@ class JobsTests(unittest.TestCase):
                 patch('ecs_scheduler.datacontext.RLock') as rp:
             self._schema = sp.return_value
             self._schema.load.side_effect = lambda d: (d, {})
-            self._schema.dump.side_effect = lambda d: Mock(data={'validated': True, **d})
+            self._schema.dump_data.side_effect = lambda d: {'validated': True, **d}
             self._lock = rp.return_value
             self._target = Jobs.load(self._store)
 
@@ -27,43 +32,101 @@ class JobsTests(unittest.TestCase):
         persistence.resolve.assert_called()
         persistence.resolve.return_value.load_all.assert_called_with()
 
+    @patch('ecs_scheduler.datacontext.writebehind')
+    @patch('ecs_scheduler.datacontext.persistence')
+    def test_load_wraps_auto_store_for_write_behind(self, persistence, writebehind):
+        result = Jobs.load()
+
+        writebehind.resolve.assert_called_with(persistence.resolve.return_value)
+        writebehind.resolve.return_value.load_all.assert_called_with()
+
+    def test_load_uses_warm_start_cache(self):
+        cache = Mock()
+        cache.load_jobs.return_value = {'foo': {'id': 'foo'}}
+
+        result = Jobs.load(self._store, cache)
+
+        cache.load_jobs.assert_called_with(self._store, result._load_or_quarantine)
+        self.assertEqual(['foo'], [j.id for j in result.get_all()])
+
+    @patch('ecs_scheduler.datacontext.warmstart')
+    def test_load_resolves_warm_start_cache(self, warmstart):
+        warmstart.resolve.return_value.load_jobs.return_value = {}
+
+        result = Jobs.load(self._store)
+
+        warmstart.resolve.return_value.load_jobs.assert_called_with(self._store, result._load_or_quarantine)
+        self.assertEqual(0, result.total())
+
     def test_get_all_returns_all(self):
+        self._lock.reset_mock()
+
         self._store.load_all.assert_called_with()
         self.assertCountEqual([1, 2], [j.id for j in self._target.get_all()])
-        self._lock.__enter__.assert_called()
-        self._lock.__exit__.assert_called()
+        self._lock.__enter__.assert_not_called()
+
+    def test_get_all_iterates_snapshot(self):
+        jobs = self._target.get_all()
+        first = next(jobs)
+
+        self._target.create({'id': 4, 'foo': 'bar'})
+        self._target.delete(first.id)
+
+        self.assertEqual(1, len(list(jobs)))
+        self.assertCountEqual([2, 4], [j.id for j in self._target.get_all()])
+
+    def test_store_returns_store(self):
+        self.assertIs(self._store, self._target.store)
+
+    def test_version_changes_when_jobs_change(self):
+        version = self._target.version
+
+        self._target.create({'id': 4, 'foo': 'bar'})
+
+        self.assertGreater(self._target.version, version)
 
     def test_len_gets_jobs_length(self):
+        self._lock.reset_mock()
+
         self.assertEqual(2, self._target.total())
-        self._lock.__enter__.assert_called()
-        self._lock.__exit__.assert_called()
+        self._lock.__enter__.assert_not_called()
 
     def test_get_retrieves_job(self):
+        self._lock.reset_mock()
+
         result = self._target.get(2)
 
         self.assertIsInstance(result, Job)
         self.assertEqual(2, result.id)
-        self._lock.__enter__.assert_called()
-        self._lock.__exit__.assert_called()
+        self._lock.__enter__.assert_not_called()
 
     def test_get_raises_error(self):
         with self.assertRaises(JobNotFound) as cm:
             result = self._target.get(3)
 
         self.assertEqual(3, cm.exception.job_id)
-        self._lock.__enter__.assert_called()
-        self._lock.__exit__.assert_called()
+
+    def test_load_sets_job_revisions(self):
+        self._schema.load.side_effect = lambda d: ({k: v for k, v in d.items() if k != 'revision'}, {})
+        self._store.load_all.return_value = {'id': 1, 'revision': 3}, {'id': 2}
+
+        self._target._fill()
+
+        self.assertEqual(3, self._target.get(1).revision)
+        self.assertEqual(0, self._target.get(2).revision)
 
     def test_create_new_job(self):
+        self._store.create.return_value = 1
         data = {'id': 4, 'foo': 'bar'}
 
         result = self._target.create(data)
 
         self.assertIsInstance(result, Job)
         self.assertEqual(4, result.id)
+        self.assertEqual(1, result.revision)
         self.assertIs(result, self._target.get(4))
         self.assertEqual(3, self._target.total())
-        self._store.create.assert_called_with(4, {'validated': True, **data})
+        self._store.create.assert_called_with(4, {'validated': True, 'id': 4, 'foo': 'bar'})
         self._lock.__enter__.assert_called()
         self._lock.__exit__.assert_called()
 
@@ -120,13 +183,31 @@ class JobsTests(unittest.TestCase):
         self._lock.__enter__.assert_called()
         self._lock.__exit__.assert_called()
 
+    def test_create_writes_store_outside_lock(self):
+        def check_unlocked(*args):
+            self.assertEqual(self._lock.__enter__.call_count, self._lock.__exit__.call_count)
+        self._store.create.side_effect = check_unlocked
+
+        self._target.create({'id': 4, 'foo': 'bar'})
+
+        self._store.create.assert_called()
+
+    def test_create_raises_if_store_conflict(self):
+        self._store.create.side_effect = WriteConflict(4, None)
+
+        with self.assertRaises(JobAlreadyExists) as cm:
+            self._target.create({'id': 4, 'foo': 'bar'})
+
+        self.assertEqual(4, cm.exception.job_id)
+        self.assertEqual(2, self._target.total())
+
     def test_delete_job(self):
         self._target.delete(1)
 
         self.assertEqual(1, self._target.total())
         with self.assertRaises(JobNotFound):
             self._target.get(1)
-        self._store.delete.assert_called_with(1)
+        self._store.delete.assert_called_with(1, revision=None)
         self._lock.__enter__.assert_called()
         self._lock.__exit__.assert_called()
 
@@ -140,6 +221,59 @@ class JobsTests(unittest.TestCase):
         self._lock.__enter__.assert_called()
         self._lock.__exit__.assert_called()
 
+    def test_delete_with_revision(self):
+        self._target.delete(1, revision=3)
+
+        self._store.delete.assert_called_with(1, revision=3)
+        self.assertEqual(1, self._target.total())
+
+    def test_delete_raises_if_store_conflict(self):
+        self._store.delete.side_effect = WriteConflict(1, 3)
+
+        with self.assertRaises(JobConflict) as cm:
+            self._target.delete(1, revision=3)
+
+        self.assertEqual(1, cm.exception.job_id)
+        self.assertEqual(2, self._target.total())
+
+    def test_delete_writes_store_outside_lock(self):
+        def check_unlocked(*args, **kwargs):
+            self.assertEqual(self._lock.__enter__.call_count, self._lock.__exit__.call_count)
+        self._store.delete.side_effect = check_unlocked
+
+        self._target.delete(1)
+
+        self._store.delete.assert_called()
+
+    def test_queued_changes_are_published_in_one_snapshot(self):
+        queued_job = self._target._make_job({'id': 3, 'foo': 'baz'})
+        self._target._changes.append(([queued_job], [self._target.get(1)]))
+        version = self._target.version
+
+        self._target.create({'id': 4, 'foo': 'bar'})
+
+        self.assertEqual(version + 1, self._target.version)
+        self.assertEqual([2, 3, 4], [j.id for j in self._target.get_page(10)])
+        self.assertIs(queued_job, self._target.get(3))
+
+    def test_many_changes_keep_ids_sorted(self):
+        self._store.bulk_write.side_effect = lambda ops: [None if op.action == StoreOperation.DELETE else 1 for op in ops]
+        ops = [StoreOperation.create(None, {'id': i}) for i in range(100, 3, -1)] + [StoreOperation.delete(2)]
+
+        self._target.batch(ops)
+
+        self.assertEqual([1] + list(range(4, 101)), [j.id for j in self._target.get_page(1000)])
+
+    def test_job_created_and_deleted_before_publishing_is_not_listed(self):
+        job = self._target._make_job({'id': 3, 'foo': 'baz'})
+        self._target._changes.append(([job], []))
+        self._target._changes.append(([], [job]))
+
+        self._target.create({'id': 4, 'foo': 'bar'})
+
+        self.assertEqual([1, 2, 4], [j.id for j in self._target.get_page(10)])
+        self.assertNotIn(3, [j.id for j in self._target.get_all()])
+
     def test_delete_raises_if_store_error(self):
         self._store.delete.side_effect = RuntimeError
 
@@ -151,18 +285,404 @@ class JobsTests(unittest.TestCase):
         self._lock.__enter__.assert_called()
         self._lock.__exit__.assert_called()
 
+    def test_batch(self):
+        self._store.bulk_write.return_value = [1, 7, None]
+        ops = [
+            StoreOperation.create(None, {'id': 4, 'foo': 'bar'}),
+            StoreOperation.update(1, {'taskCount': 4}, 6),
+            StoreOperation.delete(2),
+        ]
+        revision = self._target.revision
+
+        results = self._target.batch(ops)
+
+        self._store.bulk_write.assert_called_once_with([
+            StoreOperation.create(4, {'validated': True, 'id': 4, 'foo': 'bar'}),
+            StoreOperation.update(1, {'taskCount': 4}, 6),
+            StoreOperation.delete(2),
+        ])
+        self.assertEqual([self._target.get(4), self._target.get(1), None], results)
+        self.assertEqual({'id': 4, 'foo': 'bar', 'revision': 1}, results[0].data)
+        self.assertEqual(4, results[1].data['taskCount'])
+        self.assertEqual(7, results[1].revision)
+        self.assertEqual([1, 4], [job.id for job in self._target.get_all()])
+        self.assertEqual(revision + 2, self._target.revision)
+
+    def test_batch_reports_invalid_operations_without_writing_them(self):
+        self._store.bulk_write.return_value = [None]
+        ops = [
+            StoreOperation.create(None, {'id': 1}),
+            StoreOperation.update(3, {'taskCount': 4}),
+            StoreOperation.update(1, {'taskCount': 'many'}),
+            StoreOperation.delete(2),
+            StoreOperation.delete(2),
+        ]
+
+        results = self._target.batch(ops)
+
+        self._store.bulk_write.assert_called_once_with([StoreOperation.delete(2)])
+        self.assertIsInstance(results[0], JobAlreadyExists)
+        self.assertIsInstance(results[1], JobNotFound)
+        self.assertIsInstance(results[2], InvalidJobData)
+        self.assertIsNone(results[3])
+        self.assertIsInstance(results[4], InvalidJobData)
+        self.assertEqual({'id': ['Job appears more than once in the batch.']}, results[4].errors)
+        self.assertEqual(1, self._target.total())
+
+    def test_batch_does_not_write_if_no_valid_operations(self):
+        results = self._target.batch([StoreOperation.delete(3)])
+
+        self._store.bulk_write.assert_not_called()
+        self.assertIsInstance(results[0], JobNotFound)
+
+    def test_batch_reports_store_results(self):
+        conflict = WriteConflict(1, 6)
+        error = RuntimeError()
+        self._store.bulk_write.return_value = [WriteConflict(4, None), conflict, error]
+        ops = [
+            StoreOperation.create(None, {'id': 4}),
+            StoreOperation.update(1, {'taskCount': 4}, 6),
+            StoreOperation.delete(2),
+        ]
+
+        results = self._target.batch(ops)
+
+        self.assertIsInstance(results[0], JobAlreadyExists)
+        self.assertIsInstance(results[1], JobConflict)
+        self.assertIs(conflict, results[1].__cause__)
+        self.assertIsInstance(results[2], JobPersistenceError)
+        self.assertIs(error, results[2].__cause__)
+        self.assertEqual([1, 2], [job.id for job in self._target.get_all()])
+        self.assertNotIn('taskCount', self._target.get(1).data)
+
+    def test_batch_reports_failed_store_write_for_every_operation(self):
+        self._store.bulk_write.side_effect = RuntimeError
+
+        results = self._target.batch([StoreOperation.create(None, {'id': 4}), StoreOperation.delete(2)])
+
+        self.assertIsInstance(results[0], JobPersistenceError)
+        self.assertIsInstance(results[1], JobPersistenceError)
+        self.assertEqual(2, self._target.total())
+
+    def test_batch_writes_store_outside_lock(self):
+        def check_unlocked(ops):
+            self.assertEqual(self._lock.__enter__.call_count, self._lock.__exit__.call_count)
+            return [None]
+        self._store.bulk_write.side_effect = check_unlocked
+
+        self._target.batch([StoreOperation.delete(1)])
+
+        self._store.bulk_write.assert_called()
+
+
+class JobsLoadValidationTests(unittest.TestCase):
+    def setUp(self):
+        self._store = Mock()
+        self._store.load_all.return_value = [
+            {'id': 'a', 'taskDefinition': 'a', 'schedule': '0', 'revision': 3},
+            {'id': 'b', 'taskDefinition': 'b', 'schedule': 'not a schedule'},
+            {'id': 'c', 'taskDefinition': 'c', 'schedule': '0'},
+            {'id': 'd', 'taskDefinition': 'd', 'schedule': '0', 'taskCount': 0}
+        ]
+
+    def test_load_raises_first_invalid_job(self):
+        with self.assertRaises(InvalidJobData) as cm:
+            Jobs.load(self._store, cache=None, processes=0, quarantine=False)
+
+        self.assertEqual('b', cm.exception.job_id)
+
+    def test_load_quarantines_invalid_jobs(self):
+        target = Jobs.load(self._store, cache=None, processes=0, quarantine=True)
+
+        self.assertEqual(['a', 'c'], sorted(j.id for j in target.get_all()))
+        self.assertEqual(['b', 'd'], [ex.job_id for ex in target.quarantined])
+        self.assertEqual(3, target.get('a').revision)
+
+    def test_parallel_load_validates_jobs(self):
+        self._store.load_all.return_value = [{'id': f'job{i}', 'taskDefinition': f'job{i}', 'schedule': '0', 'revision': i} for i in range(7)]
+        target = Jobs(self._store, processes=2, chunk_size=2)
+
+        target._fill()
+
+        self.assertEqual(7, target.total())
+        self.assertEqual(4, target.get('job4').revision)
+        self.assertEqual({'second': '0'}, target.get('job4').parsed_schedule)
+
+    def test_parallel_load_raises_first_invalid_job(self):
+        target = Jobs(self._store, processes=2, chunk_size=1)
+
+        with self.assertRaises(InvalidJobData) as cm:
+            target._fill()
+
+        self.assertEqual('b', cm.exception.job_id)
+        self.assertEqual(0, target.total())
+
+    def test_parallel_load_stops_reading_store_after_invalid_job(self):
+        read = []
+        def records():
+            yield {'id': 'bad', 'taskDefinition': 'bad', 'schedule': '99 * * *'}
+            for i in range(20):
+                read.append(i)
+                yield {'id': f'job{i}', 'taskDefinition': f'job{i}', 'schedule': '0'}
+        self._store.load_all.return_value = records()
+        target = Jobs(self._store, processes=1, chunk_size=1)
+
+        with self.assertRaises(InvalidJobData):
+            target._fill()
+
+        self.assertLess(len(read), 20)
+
+    def test_parallel_load_quarantines_invalid_jobs(self):
+        target = Jobs(self._store, processes=2, chunk_size=3, quarantine=True)
+
+        target._fill()
+
+        self.assertEqual(['a', 'c'], sorted(j.id for j in target.get_all()))
+        self.assertEqual(['b', 'd'], [ex.job_id for ex in target.quarantined])
+
+    def test_cache_load_quarantines_invalid_jobs(self):
+        cache = Mock()
+        cache.load_jobs.side_effect = lambda store, validate: {
+            d['id']: d for d in map(validate, store.load_all()) if d is not None}
+        target = Jobs(self._store, quarantine=True)
+
+        target._fill(cache)
+
+        self.assertEqual(['a', 'c'], sorted(j.id for j in target.get_all()))
+        self.assertEqual(['b', 'd'], [ex.job_id for ex in target.quarantined])
+
+    def test_lazy_load_defers_validation(self):
+        target = Jobs.load(self._store, cache=None, lazy=True)
+
+        self.assertEqual(4, target.total())
+        self.assertFalse(any(j.hydrated for j in target.get_all()))
+        self.assertEqual(['a', 'b'], [j.id for j in target.get_page(2)])
+        self.assertEqual(3, target.get_page(1)[0].revision)
+
+    def test_lazy_load_hydrates_on_get(self):
+        target = Jobs.load(self._store, cache=None, lazy=True)
+
+        job = target.get('a')
+
+        self.assertTrue(job.hydrated)
+        self.assertEqual({'second': '0'}, job.parsed_schedule)
+        self.assertEqual(3, job.revision)
+        self.assertFalse(target.get_page(1, skip=2)[0].hydrated)
+
+    def test_lazy_load_raises_invalid_job_on_get(self):
+        target = Jobs.load(self._store, cache=None, lazy=True)
+
+        with self.assertRaises(InvalidJobData) as cm:
+            target.get('b')
+
+        self.assertEqual('b', cm.exception.job_id)
+
+    def test_lazy_load_hydrates_on_data_access(self):
+        target = Jobs.load(self._store, cache=None, lazy=True)
+        job = next(j for j in target.get_all() if j.id == 'c')
+
+        self.assertEqual(1, job.data['taskCount'])
+        self.assertTrue(job.hydrated)
+
+    def test_lazy_load_indexes_raw_records(self):
+        target = Jobs.load(self._store, cache=None, lazy=True)
+
+        self.assertEqual(['c'], [j.id for j in target.find(task_definition='c')])
+        target.get('c').annotate({'estimatedNextRun': datetime(2017, 6, 14, tzinfo=timezone.utc)})
+
+        self.assertEqual(['c'], [j.id for j in target.find(task_definition='c')])
+        self.assertEqual(['c'], [j.id for j in target.next_runs(datetime(2017, 6, 15, tzinfo=timezone.utc))])
+
+    def test_lazy_load_deletes_invalid_job(self):
+        target = Jobs.load(self._store, cache=None, lazy=True)
+
+        target.delete('b')
+
+        self._store.delete.assert_called_with('b', revision=None)
+        self.assertEqual(3, target.total())
+
+    @patch.dict('os.environ', {'ECSS_VALIDATION_PROCESSES': '3', 'ECSS_VALIDATION_CHUNK_SIZE': '50', 'ECSS_QUARANTINE_INVALID_JOBS': 'true',
+                                 'ECSS_LAZY_JOB_LOADING': 'true'})
+    @patch.object(Jobs, '_fill')
+    def test_load_reads_validation_options_from_environment(self, fill):
+        target = Jobs.load(self._store, cache=None)
+
+        self.assertEqual(3, target._processes)
+        self.assertEqual(50, target._chunk_size)
+        self.assertTrue(target._quarantine)
+        self.assertTrue(target._lazy)
+
+class JobsQueryTests(unittest.TestCase):
+    def setUp(self):
+        self._now = datetime(2017, 6, 14, 13, 0, tzinfo=timezone.utc)
+        self._store = Mock()
+        self._store.load_all.return_value = [
+            {'id': 'a', 'taskDefinition': 'task-1', 'schedule': '0'},
+            {'id': 'b', 'taskDefinition': 'task-1', 'schedule': '0', 'suspended': True},
+            {'id': 'c', 'taskDefinition': 'task-2', 'schedule': '0', 'trigger': {'type': 'sqs', 'queueName': 'q1'}},
+            {'id': 'd', 'taskDefinition': 'task-2', 'schedule': '0', 'trigger': {'type': 'sqs', 'queueName': 'q2'}}
+        ]
+        self._store.create.return_value = 1
+        self._store.update.return_value = 2
+        self._target = Jobs.load(self._store, cache=None)
+
+    def _ids(self, jobs):
+        return [j.id for j in jobs]
+
+    def test_find_by_task_definition(self):
+        self.assertEqual(['a', 'b'], self._ids(self._target.find(task_definition='task-1')))
+
+    def test_find_by_suspended(self):
+        self.assertEqual(['b'], self._ids(self._target.find(suspended=True)))
+        self.assertEqual(['a', 'c', 'd'], self._ids(self._target.find(suspended=False)))
+
+    def test_find_by_trigger(self):
+        self.assertEqual(['c', 'd'], self._ids(self._target.find(trigger_type='sqs')))
+        self.assertEqual(['d'], self._ids(self._target.find(trigger_type='sqs', queue_name='q2')))
+
+    def test_find_matches_all_criteria(self):
+        self.assertEqual([], self._ids(self._target.find(task_definition='task-1', trigger_type='sqs')))
+
+    def test_find_without_criteria_returns_all(self):
+        self.assertEqual(['a', 'b', 'c', 'd'], self._ids(self._target.find()))
+
+    def test_find_reflects_create_and_delete(self):
+        self._target.create({'id': 'e', 'taskDefinition': 'task-1', 'schedule': '0'})
+        self._target.delete('a')
+
+        self.assertEqual(['b', 'e'], self._ids(self._target.find(task_definition='task-1')))
+
+    def test_find_reflects_update(self):
+        self._target.get('a').update({'suspended': True, 'taskDefinition': 'task-3'})
+
+        self.assertEqual(['a', 'b'], self._ids(self._target.find(suspended=True)))
+        self.assertEqual(['b'], self._ids(self._target.find(task_definition='task-1')))
+        self.assertEqual(['a'], self._ids(self._target.find(task_definition='task-3')))
+
+    def test_get_page_orders_by_id(self):
+        self.assertEqual(['a', 'b'], self._ids(self._target.get_page(2)))
+        self.assertEqual(['c', 'd'], self._ids(self._target.get_page(2, skip=2)))
+        self.assertEqual([], self._ids(self._target.get_page(2, skip=4)))
+
+    def test_get_page_after_id(self):
+        self.assertEqual(['a', 'b'], self._ids(self._target.get_page(2, after='')))
+        self.assertEqual(['c', 'd'], self._ids(self._target.get_page(5, after='b')))
+        self.assertEqual(['c'], self._ids(self._target.get_page(1, after='bb')))
+        self.assertEqual(['d'], self._ids(self._target.get_page(5, skip=1, after='b')))
+        self.assertEqual([], self._ids(self._target.get_page(5, after='d')))
+
+    def test_iter_page_orders_by_id(self):
+        self.assertEqual(['a', 'b', 'c', 'd'], self._ids(self._target.iter_page()))
+        self.assertEqual(['b', 'c'], self._ids(self._target.iter_page(2, skip=1)))
+        self.assertEqual(['c', 'd'], self._ids(self._target.iter_page(after='b')))
+        self.assertEqual(['d'], self._ids(self._target.iter_page(5, skip=1, after='b')))
+        self.assertEqual([], self._ids(self._target.iter_page(skip=4)))
+
+    def test_iter_page_iterates_snapshot(self):
+        jobs = self._target.iter_page()
+        first = next(jobs)
+
+        self._target.create({'id': 'bb', 'taskDefinition': 'task-1', 'schedule': '0'})
+        self._target.delete('c')
+
+        self.assertEqual(['a', 'b', 'c', 'd'], [first.id] + self._ids(jobs))
+
+    def test_get_page_reflects_create_and_delete(self):
+        self._target.create({'id': 'bb', 'taskDefinition': 'task-1', 'schedule': '0'})
+        self._target.delete('c')
+
+        self.assertEqual(['bb', 'd'], self._ids(self._target.get_page(5, after='b')))
+
+    def test_revision_changes_when_any_job_changes(self):
+        revisions = [self._target.revision]
+        job = self._target.get('a')
+
+        job.annotate({'lastRun': self._now})
+        revisions.append(self._target.revision)
+        self._target.create({'id': 'bb', 'taskDefinition': 'task-1', 'schedule': '0'})
+        revisions.append(self._target.revision)
+        self._target.delete('a')
+        revisions.append(self._target.revision)
+        job.annotate({'lastRun': self._now + timedelta(hours=1)})
+
+        self.assertEqual(sorted(set(revisions)), revisions)
+        self.assertEqual(revisions[-1], self._target.revision)
+
+    def test_find_by_last_run_range(self):
+        self._target.get('a').annotate({'lastRun': self._now})
+        self._target.get('b').annotate({'lastRun': self._now + timedelta(hours=1)})
+        self._target.get('c').annotate({'lastRun': self._now + timedelta(hours=2)})
+
+        self.assertEqual(['b', 'c'], self._ids(self._target.find(last_run_since=self._now + timedelta(hours=1))))
+        self.assertEqual(['a'], self._ids(self._target.find(last_run_until=self._now + timedelta(hours=1))))
+        self.assertEqual(['a', 'b'], self._ids(self._target.find(task_definition='task-1', last_run_since=self._now)))
+
+    def test_find_by_next_run_range(self):
+        self._target.get('c').annotate({'estimatedNextRun': self._now})
+        self._target.get('d').annotate({'estimatedNextRun': self._now + timedelta(minutes=5)})
+
+        self.assertEqual(['d'], self._ids(self._target.find(trigger_type='sqs', next_run_since=self._now + timedelta(minutes=1))))
+        self.assertEqual(['c', 'd'], self._ids(self._target.find(next_run_until=self._now + timedelta(hours=1))))
+
+    def test_next_runs(self):
+        for i, job_id in enumerate(['d', 'a', 'c']):
+            self._target.get(job_id).annotate({'estimatedNextRun': self._now + timedelta(minutes=i)})
+
+        self.assertEqual(['d', 'a'], self._ids(self._target.next_runs(self._now + timedelta(minutes=2))))
+        self.assertEqual(['a', 'c'], self._ids(self._target.next_runs(self._now + timedelta(minutes=5), since=self._now + timedelta(minutes=1))))
+
+    def test_next_runs_reflects_annotate_and_delete(self):
+        self._target.get('a').annotate({'estimatedNextRun': self._now})
+        self._target.get('b').annotate({'estimatedNextRun': self._now})
+        self._target.get('a').annotate({'estimatedNextRun': self._now + timedelta(hours=1)})
+        self._target.delete('b')
+
+        self.assertEqual([], self._ids(self._target.next_runs(self._now + timedelta(minutes=5))))
+        self.assertEqual(['a'], self._ids(self._target.next_runs(self._now + timedelta(hours=2))))
+
+    def test_deleted_job_changes_are_not_indexed(self):
+        job = self._target.get('a')
+        self._target.delete('a')
+
+        job.annotate({'estimatedNextRun': self._now})
+
+        self.assertEqual([], self._target.next_runs(self._now + timedelta(minutes=5)))
+
+    def test_delete_between_data_change_and_reindex_removes_indexed_values(self):
+        job = self._target.get('a')
+        job.annotate({'estimatedNextRun': self._now})
+        reindex = job._on_change
+
+        def delete_then_reindex(changed_job, old_data):
+            self._target.delete('a')
+            reindex(changed_job, old_data)
+        job._on_change = delete_then_reindex
+
+        job.annotate({'estimatedNextRun': self._now + timedelta(minutes=1)})
+
+        self.assertEqual([], self._target.next_runs(self._now + timedelta(hours=1)))
+        self.assertEqual([], self._target.find(next_run_until=self._now + timedelta(hours=1)))
+
 
 class JobTests(unittest.TestCase):
     def setUp(self):
         self._store = Mock()
         self._job_data = {'id': 32, 'foo': 'bar'}
-        with patch('ecs_scheduler.datacontext.JobSchema') as sp, \
-                patch('ecs_scheduler.datacontext.RLock') as rp:
-            self._schema = sp.return_value
-            self._lock = rp.return_value
-            self._target = Job(self._job_data, self._store)
+        schema_patcher = patch('ecs_scheduler.datacontext._job_schema')
+        locks_patcher = patch('ecs_scheduler.datacontext._job_locks')
+        self._schema = schema_patcher.start()
+        self._locks = locks_patcher.start()
+        self.addCleanup(schema_patcher.stop)
+        self.addCleanup(locks_patcher.stop)
+        self._lock = self._locks.get.return_value
+        self._target = Job(self._job_data, self._store)
         self._schema.load.side_effect = lambda d: (d, {})
-        self._schema.dump.side_effect = lambda d: Mock(data={'validated': True, **d})
+        self._schema.dump_data.side_effect = lambda d: {'validated': True, **d}
+
+    def _use_real_schema(self):
+        patcher = patch('ecs_scheduler.datacontext._job_schema', JobSchema())
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     def test_data_returns_all_data(self):
         self.assertEqual(self._job_data, self._target.data)
@@ -187,14 +707,33 @@ class JobTests(unittest.TestCase):
 
         self.assertEqual('parsed', self._target.parsed_schedule)
 
+    def test_hydrate_skips_lock_if_hydrated(self):
+        self._target.hydrate()
+
+        self._lock.__enter__.assert_not_called()
+
+    def test_hydrate_validates_lazily_loaded_data_once(self):
+        hydrate = Mock(side_effect=lambda d: {**d, 'parsed': True})
+        target = Job({'id': 32, 'foo': 'bar'}, self._store, hydrate=hydrate)
+
+        target.hydrate()
+        self._lock.reset_mock()
+        target.hydrate()
+
+        hydrate.assert_called_once_with({'id': 32, 'foo': 'bar'})
+        self.assertTrue(target.data['parsed'])
+        self._lock.__enter__.assert_not_called()
+
     def test_update(self):
+        self._store.update.return_value = 5
         new_data = {'a': 1, 'b': 2}
 
         self._target.update(new_data)
 
         self.assertEqual(1, self._target.data['a'])
         self.assertEqual(2, self._target.data['b'])
-        self._store.update.assert_called_with(32, {'validated': True, **new_data})
+        self.assertEqual(5, self._target.revision)
+        self._store.update.assert_called_with(32, {'validated': True, **new_data}, revision=None)
         self._lock.__enter__.assert_called()
         self._lock.__exit__.assert_called()
 
@@ -205,18 +744,19 @@ class JobTests(unittest.TestCase):
 
         self.assertEqual(1, self._target.data['a'])
         self.assertEqual('baz', self._target.data['foo'])
-        self._store.update.assert_called_with(32, {'validated': True, **new_data})
+        self._store.update.assert_called_with(32, {'validated': True, **new_data}, revision=None)
         self._lock.__enter__.assert_called()
         self._lock.__exit__.assert_called()
 
     def test_update_does_not_allow_id_override(self):
+        self._use_real_schema()
         job_with_real_schema = Job({'id': 44, 'foo': 'bar'}, self._store)
         new_data = {'id': 77, 'taskCount': 4}
         
         job_with_real_schema.update(new_data)
 
         self.assertEqual(44, job_with_real_schema.id)
-        self._store.update.assert_called_with(44, {'taskCount': 4})
+        self._store.update.assert_called_with(44, {'taskCount': 4}, revision=None)
 
     def test_update_raises_if_invalid_data(self):
         self._schema.load.side_effect = lambda d: (d, {'error': 'bad'})
@@ -230,8 +770,7 @@ class JobTests(unittest.TestCase):
         self.assertNotIn('a', self._target.data)
         self.assertNotIn('b', self._target.data)
         self._store.update.assert_not_called()
-        self._lock.__enter__.assert_called()
-        self._lock.__exit__.assert_called()
+        self._lock.__enter__.assert_not_called()
 
     def test_update_raises_if_store_error(self):
         self._store.update.side_effect = RuntimeError
@@ -243,12 +782,62 @@ class JobTests(unittest.TestCase):
         self.assertEqual(32, cm.exception.job_id)
         self.assertNotIn('a', self._target.data)
         self.assertNotIn('b', self._target.data)
-        self._store.update.assert_called_with(32, {'validated': True, **new_data})
+        self._store.update.assert_called_with(32, {'validated': True, **new_data}, revision=None)
         self._lock.__enter__.assert_called()
         self._lock.__exit__.assert_called()
 
+    def test_update_with_revision(self):
+        self._store.update.return_value = 4
+
+        self._target.update({'a': 1}, revision=3)
+
+        self.assertEqual(4, self._target.revision)
+        self._store.update.assert_called_with(32, {'validated': True, 'a': 1}, revision=3)
+
+    def test_update_raises_if_store_conflict(self):
+        self._store.update.side_effect = WriteConflict(32, 3)
+
+        with self.assertRaises(JobConflict) as cm:
+            self._target.update({'a': 1}, revision=3)
+
+        self.assertEqual(32, cm.exception.job_id)
+        self.assertNotIn('a', self._target.data)
+
+    def test_revision_defaults_to_zero(self):
+        self.assertEqual(0, self._target.revision)
+
+    def test_version_changes_on_update_and_annotate(self):
+        self._schema.loaded_fields.return_value = set()
+        other_job = Job({'id': 33}, self._store)
+        initial = self._target.version
+
+        self._target.update({'a': 1})
+        updated = self._target.version
+        self._target.annotate({'b': 2})
+
+        self.assertNotEqual(initial, other_job.version)
+        self.assertNotIn(updated, (initial, other_job.version))
+        self.assertNotIn(self._target.version, (initial, updated, other_job.version))
+
+    def test_version_unchanged_if_update_fails(self):
+        self._store.update.side_effect = WriteConflict(32, 3)
+        initial = self._target.version
+
+        with self.assertRaises(JobConflict):
+            self._target.update({'a': 1}, revision=3)
+
+        self.assertEqual(initial, self._target.version)
+
+    def test_update_does_not_change_previous_data(self):
+        previous = self._target.data
+
+        self._target.update({'foo': 'baz'})
+
+        self.assertEqual('bar', previous['foo'])
+        self.assertEqual('baz', self._target.data['foo'])
+
     def test_annotate(self):
-        self._schema.load.side_effect = lambda d: ({}, {})
+        self._schema.loaded_fields.return_value = set()
         new_data = {'a': 1, 'b': 2}
 
         self._target.annotate(new_data)
@@ -260,6 +849,7 @@ class JobTests(unittest.TestCase):
         self._lock.__exit__.assert_called()
 
     def test_annotate_does_not_allow_id_override(self):
+        self._use_real_schema()
         job_with_real_schema = Job({'id': 44, 'foo': 'bar'}, self._store)
         new_data = {'id': 77, 'b': 2}
 
@@ -272,6 +862,7 @@ class JobTests(unittest.TestCase):
         self._store.update.assert_not_called()
 
     def test_annotate_does_not_allow_setting_persistent_fields(self):
+        self._use_real_schema()
         job_with_real_schema = Job({'id': 44, 'foo': 'bar'}, self._store)
         new_data = {'taskCount': 4, 'schedule': '* *', 'b': 2}
 
@@ -286,6 +877,85 @@ class JobTests(unittest.TestCase):
         self._store.update.assert_not_called()
 
 
+    def test_update_locks_job_stripe(self):
+        self._target.update({'a': 1})
+
+        self._locks.get.assert_called_with(32)
+
+    def test_jobs_share_schema_and_have_no_instance_dict(self):
+        other = Job({'id': 33}, self._store)
+
+        self.assertFalse(hasattr(self._target, '__dict__'))
+        self.assertFalse(hasattr(self._target.data, '__dict__'))
+        other.update({'a': 1})
+        self._schema.load.assert_called_with({'a': 1})
+
+
+class LockPoolTests(unittest.TestCase):
+    def test_lock_is_reentrant(self):
+        pool = _LockPool()
+
+        with pool.get('foo'), pool.get('foo'):
+            self.assertEqual(['foo'], list(pool._locks))
+
+        self.assertEqual({}, pool._locks)
+
+    def test_locks_are_not_shared_between_keys(self):
+        pool = _LockPool()
+        held = threading.Event()
+        release = threading.Event()
+        def hold_foo():
+            with pool.get('foo'):
+                held.set()
+                release.wait(5)
+        holder = threading.Thread(target=hold_foo)
+        holder.start()
+        self.addCleanup(holder.join)
+        self.addCleanup(release.set)
+        held.wait(5)
+
+        for i in range(100):
+            with pool.get(f'job-{i}'):
+                pass
+
+        self.assertEqual(['foo'], list(pool._locks))
+
+    def test_get_all_returns_each_key_once_in_key_order(self):
+        pool = _LockPool()
+
+        locks = pool.get_all(['b', 'a', 'c', 'a'])
+
+        self.assertEqual(['a', 'b', 'c'], [lock._key for lock in locks])
+
+
+class JobLockingTests(unittest.TestCase):
+    def test_update_does_not_block_other_jobs(self):
+        started = threading.Event()
+        release = threading.Event()
+        def update(job_id, job_data, revision=None):
+            if job_id == 'slow':
+                started.set()
+                release.wait(5)
+            return 1
+        store = Mock()
+        store.update.side_effect = update
+        slow_job = Job({'id': 'slow'}, store)
+        other_jobs = [Job({'id': f'job-{i}'}, store) for i in range(100)]
+        slow_update = threading.Thread(target=slow_job.update, args=({'taskCount': 2},))
+        slow_update.start()
+        self.addCleanup(slow_update.join)
+        self.addCleanup(release.set)
+        started.wait(5)
+
+        other_updates = threading.Thread(target=lambda: [job.update({'taskCount': 3}) for job in other_jobs])
+        other_updates.start()
+        other_updates.join(5)
+
+        self.assertFalse(other_updates.is_alive())
+        self.assertEqual([1] * 100, [job.revision for job in other_jobs])
+        self.assertEqual(0, slow_job.revision)
+
+
 class JobDataMappingTests(unittest.TestCase):
     def setUp(self):
         self._data = {'a': 1, 'b': 2}
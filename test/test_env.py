@@ -109,6 +109,10 @@ class GetVarTests(unittest.TestCase):
 
 @patch('setuptools_scm.get_version')
 class GetVersionTests(unittest.TestCase):
+    def setUp(self):
+        env.get_version.cache_clear()
+        self.addCleanup(env.get_version.cache_clear)
+
     def test_get_from_setuptools(self, scm):
         result = env.get_version()
 
@@ -120,3 +124,10 @@ class GetVersionTests(unittest.TestCase):
         result = env.get_version()
 
         self.assertEqual(__version__, result)
+
+    def test_get_resolves_version_once(self, scm):
+        first = env.get_version()
+        second = env.get_version()
+
+        self.assertIs(first, second)
+        scm.assert_called_once_with()
@@ -12,6 +12,7 @@ class JobOperationTests(unittest.TestCase):
 
         self.assertEqual(operation, op.operation)
         self.assertIs(job_id, op.job_id)
+        self.assertEqual([], op.job_ops)
 
     def test_add_creates_op(self):
         job_id = 'foo'
@@ -37,6 +38,15 @@ class JobOperationTests(unittest.TestCase):
         self.assertEqual(JobOperation.REMOVE, op.operation)
         self.assertIs(job_id, op.job_id)
 
+    def test_batch_creates_op(self):
+        job_ops = [JobOperation.add('foo'), JobOperation.remove('bar')]
+
+        op = JobOperation.batch(job_ops)
+
+        self.assertEqual(JobOperation.BATCH, op.operation)
+        self.assertIsNone(op.job_id)
+        self.assertIs(job_ops, op.job_ops)
+
 
 class PaginationTests(unittest.TestCase):
     def test_ctor_sets_attributes(self):
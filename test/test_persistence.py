@@ -2,14 +2,20 @@ import unittest
 import logging
 import sqlite3
 import os
-from unittest.mock import patch, Mock, call, ANY
+import json
+import gzip
+import tempfile
+import threading
+from unittest.mock import patch, Mock, MagicMock, call, ANY
 from datetime import datetime
+from decimal import Decimal
 from io import BytesIO
 
 import boto3
 import botocore.exceptions
+import elasticsearch
 
-from ecs_scheduler.persistence import resolve, NullStore, SQLiteStore, S3Store, DynamoDBStore, ElasticsearchStore
+from ecs_scheduler.persistence import resolve, register_env_store, register_config_store, bulk_write, StoreOperation, StoreOperationError, WriteConflict, NullStore, SQLiteStore, S3Store, DynamoDBStore, ElasticsearchStore
 
 
 class ResolveTests(unittest.TestCase):
@@ -19,7 +25,20 @@ class ResolveTests(unittest.TestCase):
         result = resolve()
 
         self.assertIs(sqlite.return_value, result)
-        sqlite.assert_called_with('test.db')
+        sqlite.assert_called_with('test.db', synchronous=None, cache_size=None, mmap_size=None)
+
+    @patch('ecs_scheduler.persistence.SQLiteStore')
+    @patch.dict(os.environ, {
+        'ECSS_SQLITE_FILE': 'test.db',
+        'ECSS_SQLITE_SYNCHRONOUS': 'FULL',
+        'ECSS_SQLITE_CACHE_SIZE': '-2000',
+        'ECSS_SQLITE_MMAP_SIZE': '268435456'
+    }, clear=True)
+    def test_resolve_sqlite_with_pragmas(self, sqlite):
+        result = resolve()
+
+        self.assertIs(sqlite.return_value, result)
+        sqlite.assert_called_with('test.db', synchronous='FULL', cache_size='-2000', mmap_size='268435456')
 
     @patch('ecs_scheduler.persistence.S3Store')
     @patch.dict(os.environ, {'ECSS_S3_BUCKET': 'test-bucket'}, clear=True)
@@ -27,7 +46,7 @@ class ResolveTests(unittest.TestCase):
         result = resolve()
 
         self.assertIs(s3.return_value, result)
-        s3.assert_called_with('test-bucket', prefix=None)
+        s3.assert_called_with('test-bucket', prefix=None, concurrency=None, snapshot_interval=None)
 
     @patch('ecs_scheduler.persistence.S3Store')
     @patch.dict(os.environ, {'ECSS_S3_BUCKET': 'test-bucket', 'ECSS_S3_PREFIX': 'test/prefix'}, clear=True)
@@ -35,7 +54,23 @@ class ResolveTests(unittest.TestCase):
         result = resolve()
 
         self.assertIs(s3.return_value, result)
-        s3.assert_called_with('test-bucket', prefix='test/prefix')
+        s3.assert_called_with('test-bucket', prefix='test/prefix', concurrency=None, snapshot_interval=None)
+
+    @patch('ecs_scheduler.persistence.S3Store')
+    @patch.dict(os.environ, {'ECSS_S3_BUCKET': 'test-bucket', 'ECSS_S3_CONCURRENCY': '32'}, clear=True)
+    def test_resolve_s3_with_concurrency(self, s3):
+        result = resolve()
+
+        self.assertIs(s3.return_value, result)
+        s3.assert_called_with('test-bucket', prefix=None, concurrency='32', snapshot_interval=None)
+
+    @patch('ecs_scheduler.persistence.S3Store')
+    @patch.dict(os.environ, {'ECSS_S3_BUCKET': 'test-bucket', 'ECSS_S3_SNAPSHOT_INTERVAL': '300'}, clear=True)
+    def test_resolve_s3_with_snapshots(self, s3):
+        result = resolve()
+
+        self.assertIs(s3.return_value, result)
+        s3.assert_called_with('test-bucket', prefix=None, concurrency=None, snapshot_interval='300')
 
     @patch('ecs_scheduler.persistence.DynamoDBStore')
     @patch.dict(os.environ, {'ECSS_DYNAMODB_TABLE': 'test-table'}, clear=True)
@@ -43,7 +78,15 @@ class ResolveTests(unittest.TestCase):
         result = resolve()
 
         self.assertIs(dynamodb.return_value, result)
-        dynamodb.assert_called_with('test-table')
+        dynamodb.assert_called_with('test-table', scan_segments=None)
+
+    @patch('ecs_scheduler.persistence.DynamoDBStore')
+    @patch.dict(os.environ, {'ECSS_DYNAMODB_TABLE': 'test-table', 'ECSS_DYNAMODB_SCAN_SEGMENTS': '8'}, clear=True)
+    def test_resolve_dynamodb_with_scan_segments(self, dynamodb):
+        result = resolve()
+
+        self.assertIs(dynamodb.return_value, result)
+        dynamodb.assert_called_with('test-table', scan_segments='8')
 
     @patch('ecs_scheduler.persistence.ElasticsearchStore')
     @patch.dict(os.environ, {'ECSS_ELASTICSEARCH_INDEX': 'test-index', 'ECSS_ELASTICSEARCH_HOSTS': 'http://test-host:9200/'}, clear=True)
@@ -72,8 +115,75 @@ class ResolveTests(unittest.TestCase):
 
         self.assertIs(elasticsearch.return_value, result)
         f_open.assert_called_with('/etc/opt/test.yaml')
-        elasticsearch.assert_called_with('test-index', foo='bar', a=1)
+        elasticsearch.assert_called_with('test-index', bulk_chunk_size=None, foo='bar', a=1)
 
+    @patch('builtins.open')
+    @patch('ecs_scheduler.persistence.yaml')
+    @patch('ecs_scheduler.persistence.ElasticsearchStore')
+    @patch.dict(os.environ, {'ECSS_CONFIG_FILE': '/etc/opt/test.yaml'}, clear=True)
+    def test_resolve_elasticsearch_extended_with_bulk_chunk_size(self, elasticsearch, yaml, f_open):
+        yaml.safe_load.return_value = {'elasticsearch': {'index': 'test-index', 'bulk_chunk_size': 200, 'client': {'foo': 'bar'}}}
+
+        result = resolve()
+
+        self.assertIs(elasticsearch.return_value, result)
+        elasticsearch.assert_called_with('test-index', bulk_chunk_size=200, foo='bar')
+
+    @patch('builtins.open')
+    @patch('ecs_scheduler.persistence.yaml')
+    @patch('ecs_scheduler.persistence._metadata')
+    @patch.dict(os.environ, {'ECSS_CONFIG_FILE': '/etc/opt/test.yaml'}, clear=True)
+    def test_resolve_entry_point_store(self, metadata, yaml, f_open):
+        yaml.safe_load.return_value = {'custom': {'foo': 'bar', 'a': 1}}
+        other = Mock(value='other.module:OtherStore')
+        other.name = 'other'
+        custom = Mock(value='custom.module:CustomStore')
+        custom.name = 'custom'
+        metadata.entry_points.return_value.select.return_value = [other, custom]
+
+        result = resolve()
+
+        metadata.entry_points.return_value.select.assert_called_with(group='ecs_scheduler.stores')
+        other.load.assert_not_called()
+        self.assertIs(custom.load.return_value.return_value, result)
+        custom.load.return_value.assert_called_with(foo='bar', a=1)
+
+    @patch('builtins.open')
+    @patch('ecs_scheduler.persistence.yaml')
+    @patch('ecs_scheduler.persistence._metadata')
+    @patch.dict(os.environ, {'ECSS_CONFIG_FILE': '/etc/opt/test.yaml'}, clear=True)
+    def test_resolve_ignores_unknown_config_keys(self, metadata, yaml, f_open):
+        yaml.safe_load.return_value = {'unknown': {'foo': 'bar'}}
+        metadata.entry_points.return_value.select.return_value = []
+
+        result = resolve()
+
+        self.assertIsInstance(result, NullStore)
+
+    @patch.dict('ecs_scheduler.persistence._env_factories')
+    @patch.dict(os.environ, {'ECSS_CUSTOM_STORE': 'test-location'}, clear=True)
+    def test_resolve_registered_env_store(self):
+        factory = Mock()
+        register_env_store('CUSTOM_STORE', factory)
+
+        result = resolve()
+
+        self.assertIs(factory.return_value, result)
+        factory.assert_called_with('test-location')
+
+    @patch('builtins.open')
+    @patch('ecs_scheduler.persistence.yaml')
+    @patch.dict('ecs_scheduler.persistence._config_factories')
+    @patch.dict(os.environ, {'ECSS_CONFIG_FILE': '/etc/opt/test.yaml'}, clear=True)
+    def test_resolve_registered_config_store(self, yaml, f_open):
+        yaml.safe_load.return_value = {'custom': {'foo': 'bar'}}
+        factory = Mock()
+        register_config_store('custom', factory)
+
+        result = resolve()
+
+        self.assertIs(factory.return_value, result)
+        factory.assert_called_with({'foo': 'bar'})
 
 class NullStoreTests(unittest.TestCase):
     def setUp(self):
@@ -96,18 +206,75 @@ class NullStoreTests(unittest.TestCase):
         except Exception as ex:
             self.fail('Unexpected error raised: {}'.format(ex))
 
+    def test_writes_track_revisions(self):
+        self.assertEqual(1, self._target.create('id', {'a': 1}))
+        self.assertEqual(2, self._target.update('id', {'a': 2}))
+        self.assertEqual(3, self._target.update('id', {'a': 3}, revision=2))
+
+    def test_conditional_writes_raise_conflicts(self):
+        self._target.create('id', {'a': 1})
+
+        with self.assertRaises(WriteConflict):
+            self._target.create('id', {'a': 1})
+        with self.assertRaises(WriteConflict):
+            self._target.update('id', {'a': 2}, revision=4)
+        with self.assertRaises(WriteConflict):
+            self._target.delete('id', revision=4)
+
+    def test_update_raises_if_missing(self):
+        with self.assertRaises(LookupError):
+            self._target.update('id', {'a': 2})
+
+    def test_bulk_write_returns_revisions(self):
+        results = self._target.bulk_write([StoreOperation.create('id', {'a': 1}), StoreOperation.delete('id')])
+
+        self.assertEqual([1, None], results)
+
+
+class BulkWriteTests(unittest.TestCase):
+    def test_uses_store_bulk_write(self):
+        store = Mock()
+        ops = [StoreOperation.create('id', {'a': 1})]
+
+        results = bulk_write(store, ops)
+
+        store.bulk_write.assert_called_with(ops)
+        self.assertIs(store.bulk_write.return_value, results)
+
+    def test_applies_each_operation_if_store_has_no_bulk_write(self):
+        store = Mock(spec=['create', 'update', 'delete'])
+        store.create.return_value = 1
+        store.update.side_effect = WriteConflict('b', 3)
+        store.delete.return_value = None
+
+        results = bulk_write(store, [StoreOperation.create('a', {'a': 1}),
+                                     StoreOperation.update('b', {'b': 2}, revision=3),
+                                     StoreOperation.delete('c')])
+
+        self.assertEqual(1, results[0])
+        self.assertIsInstance(results[1], WriteConflict)
+        self.assertIsNone(results[2])
+        store.update.assert_called_with('b', {'b': 2}, revision=3)
+        store.delete.assert_called_with('c', revision=None)
+
 
 class SQLiteStoreTests(unittest.TestCase):
     def setUp(self):
         conn_patch = patch('sqlite3.connect')
         self._connect = conn_patch.start()
         self.addCleanup(conn_patch.stop)
-        self._conn = self._connect.return_value.__enter__.return_value
+        self._raw_conn = self._connect.return_value
+        self._conn = self._raw_conn.__enter__.return_value
         with patch('sqlite3.register_adapter') as self._adapt, \
                 patch('sqlite3.register_converter') as self._conv, \
                 patch('os.makedirs') as self._mkdirs, \
                 patch('os.path.abspath') as self._abspath:
             self._target = SQLiteStore('test-file')
+        self._init_calls = len(self._conn.execute.call_args_list)
+
+    def _assert_connected_once(self):
+        self.assertEqual(1, self._connect.call_count)
+        self._connect.assert_called_with('test-file', isolation_level=None, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False, cached_statements=32)
 
     def test_init_registers_handers(self):
         self._adapt.assert_called_with(dict, ANY)
@@ -122,88 +289,404 @@ class SQLiteStoreTests(unittest.TestCase):
         mkdirs.assert_called_with('/abs/path/foo/bar', exist_ok=True)
 
     def test_init_creates_table(self):
-        self._connect.assert_called_with('test-file', isolation_level=None, detect_types=sqlite3.PARSE_DECLTYPES)
-        args = self._conn.execute.call_args[0]
-        self.assertEqual(1, self._connect.call_count)
+        self._assert_connected_once()
+        args = self._conn.execute.call_args_list[1][0]
         self.assertIn('CREATE TABLE IF NOT EXISTS', args[0])
         self.assertIn('jobs(id TEXT PRIMARY KEY NOT NULL, data JSONTEXT NOT NULL', args[0])
+        self.assertIn('revision INTEGER NOT NULL DEFAULT 0', args[0])
         self._mkdirs.assert_not_called()
         self._abspath.assert_not_called()
 
+    def test_init_adds_revision_column_to_existing_table(self):
+        self._conn.execute.assert_any_call('PRAGMA table_info(jobs)')
+        self._conn.execute.assert_any_call('ALTER TABLE jobs ADD COLUMN revision INTEGER NOT NULL DEFAULT 0')
+
+    def test_init_keeps_existing_revision_column(self):
+        def execute(sql, *args):
+            return [(0, 'id'), (1, 'data'), (2, 'revision')] if 'table_info' in sql else MagicMock()
+        with patch('sqlite3.register_adapter'), \
+                patch('sqlite3.register_converter'), \
+                patch('sqlite3.connect') as connect:
+            conn = connect.return_value.__enter__.return_value
+            conn.execute.side_effect = execute
+            target = SQLiteStore('test-file')
+
+        self.assertNotIn('ALTER', ' '.join(c[0][0] for c in conn.execute.call_args_list))
+
+    def test_init_detects_json1(self):
+        self.assertIn('json_set', self._conn.execute.call_args[0][0])
+        self.assertTrue(self._target._json1)
+
+    @patch.object(logging.getLogger('ecs_scheduler.persistence'), 'warning')
+    def test_init_detects_missing_json1(self, warning):
+        def execute(sql, *args):
+            if 'json' in sql:
+                raise sqlite3.OperationalError('no such function: json_set')
+            return []
+        with patch('sqlite3.register_adapter'), \
+                patch('sqlite3.register_converter'), \
+                patch('sqlite3.connect') as connect:
+            connect.return_value.__enter__.return_value.execute.side_effect = execute
+            target = SQLiteStore('test-file')
+
+        self.assertFalse(target._json1)
+        warning.assert_called()
+
+    def test_init_sets_wal_mode(self):
+        self._conn.execute.assert_any_call('PRAGMA journal_mode = WAL')
+
+    def test_init_sets_default_pragmas(self):
+        self.assertEqual([call('PRAGMA synchronous = NORMAL')], self._raw_conn.execute.call_args_list)
+
+    def test_init_sets_given_pragmas(self):
+        with patch('sqlite3.register_adapter'), \
+                patch('sqlite3.register_converter'), \
+                patch('sqlite3.connect') as connect:
+            target = SQLiteStore('test-file', synchronous='full', cache_size='-2000', mmap_size=1024)
+
+        self.assertEqual([
+            call('PRAGMA synchronous = FULL'),
+            call('PRAGMA cache_size = -2000'),
+            call('PRAGMA mmap_size = 1024')
+        ], connect.return_value.execute.call_args_list)
+
+    def test_init_raises_if_invalid_synchronous(self):
+        with patch('sqlite3.register_adapter'), \
+                patch('sqlite3.register_converter'), \
+                patch('sqlite3.connect') as connect:
+            with self.assertRaises(ValueError):
+                SQLiteStore('test-file', synchronous='sometimes')
+        connect.assert_not_called()
+
+    def test_init_raises_if_invalid_size(self):
+        with patch('sqlite3.register_adapter'), \
+                patch('sqlite3.register_converter'), \
+                patch('sqlite3.connect') as connect:
+            with self.assertRaises(ValueError):
+                SQLiteStore('test-file', cache_size='1; DROP TABLE jobs')
+        connect.assert_not_called()
+
     def test_load_all_yields_nothing_if_empty(self):
         self._conn.execute.return_value = []
 
         results = list(self._target.load_all())
 
         self.assertEqual([], results)
-        self.assertEqual(2, self._connect.call_count)
-        self._connect.assert_called_with('test-file', isolation_level=None, detect_types=sqlite3.PARSE_DECLTYPES)
-        self._conn.execute.assert_called_with('SELECT * FROM jobs')
+        self._assert_connected_once()
+        self._conn.execute.assert_called_with('SELECT id, data, revision FROM jobs')
 
     def test_load_all_rows(self):
         self._conn.execute.return_value = [
-            ('foo', {'a': 1}),
-            ('bar', {'b': 2}),
-            ('baz', {'c': 3})
+            ('foo', {'a': 1}, 1),
+            ('bar', {'b': 2}, 4),
+            ('baz', {'c': 3}, 0)
         ]
 
         results = list(self._target.load_all())
 
         self.assertEqual([
-            {'id': 'foo', 'a': 1},
-            {'id': 'bar', 'b': 2},
-            {'id': 'baz', 'c': 3}
+            {'id': 'foo', 'a': 1, 'revision': 1},
+            {'id': 'bar', 'b': 2, 'revision': 4},
+            {'id': 'baz', 'c': 3, 'revision': 0}
         ], results)
-        self.assertEqual(2, self._connect.call_count)
-        self._connect.assert_called_with('test-file', isolation_level=None, detect_types=sqlite3.PARSE_DECLTYPES)
-        self._conn.execute.assert_called_with('SELECT * FROM jobs')
+        self._assert_connected_once()
+        self._conn.execute.assert_called_with('SELECT id, data, revision FROM jobs')
 
     def test_create(self):
         data = {'a': 1}
 
-        self._target.create('test-id', data)
+        result = self._target.create('test-id', data)
 
-        self.assertEqual(2, self._connect.call_count)
-        self._connect.assert_called_with('test-file', isolation_level=None, detect_types=sqlite3.PARSE_DECLTYPES)
-        self._conn.execute.assert_called_with('INSERT INTO jobs VALUES (?, ?)', ('test-id', data))
+        self.assertEqual(1, result)
+        self._assert_connected_once()
+        self._conn.execute.assert_called_with('INSERT INTO jobs (id, data, revision) VALUES (?, ?, 1)', ('test-id', data))
+
+    def test_create_raises_conflict_if_row_exists(self):
+        self._conn.execute.side_effect = sqlite3.IntegrityError
+
+        with self.assertRaises(WriteConflict):
+            self._target.create('test-id', {'a': 1})
+
+    def test_update_merges_fields_in_database(self):
+        self._conn.execute.return_value.fetchall.return_value = [(4,)]
+        data = {'a': 4, 'b': {'c': None}}
+
+        result = self._target.update('test-id', data)
+
+        self.assertEqual(4, result)
+        self._assert_connected_once()
+        execute_calls = [
+            call('UPDATE jobs SET data = json_set(data, ?, json(?), ?, json(?)), revision = revision + 1 WHERE id = ? RETURNING revision',
+                ['$."a"', '4', '$."b"', '{"c": null}', 'test-id'])
+        ]
+        # NOTE: skip asserting calls from __init__
+        self.assertEqual(execute_calls, self._conn.execute.call_args_list[self._init_calls:])
+
+    def test_update_checks_expected_revision(self):
+        self._conn.execute.return_value.fetchall.return_value = [(4,)]
+
+        result = self._target.update('test-id', {'a': 4}, revision=3)
+
+        self.assertEqual(4, result)
+        self.assertEqual(
+            call('UPDATE jobs SET data = json_set(data, ?, json(?)), revision = revision + 1 WHERE id = ? AND revision = ? RETURNING revision',
+                ['$."a"', '4', 'test-id', 3]),
+            self._conn.execute.call_args)
+
+    def test_update_raises_conflict_if_revision_differs(self):
+        self._conn.execute.return_value.fetchall.return_value = []
+        self._conn.execute.return_value.fetchone.return_value = (3,)
 
-    def test_update_adds_new_values(self):
-        self._conn.execute.return_value.fetchone.return_value = ('test-id', {'a': 1})
+        with self.assertRaises(WriteConflict) as cm:
+            self._target.update('test-id', {'a': 4}, revision=2)
+
+        self.assertEqual(2, cm.exception.revision)
+        self.assertEqual(call('SELECT revision FROM jobs WHERE id = ?', ('test-id',)), self._conn.execute.call_args)
+
+    def test_update_raises_if_row_missing(self):
+        self._conn.execute.return_value.fetchall.return_value = []
+        self._conn.execute.return_value.fetchone.return_value = None
+
+        with self.assertRaises(LookupError):
+            self._target.update('test-id', {'a': 4})
+
+    def test_update_without_returning_reads_new_revision_in_transaction(self):
+        self._target._returning = False
+        self._conn.execute.return_value.rowcount = 1
+        self._conn.execute.return_value.fetchone.return_value = (4,)
+
+        result = self._target.update('test-id', {'a': 4})
+
+        self.assertEqual(4, result)
+        execute_calls = [
+            call('BEGIN IMMEDIATE'),
+            call('UPDATE jobs SET data = json_set(data, ?, json(?)), revision = revision + 1 WHERE id = ?', ['$."a"', '4', 'test-id']),
+            call('SELECT revision FROM jobs WHERE id = ?', ('test-id',))
+        ]
+        self.assertEqual(execute_calls, self._conn.execute.call_args_list[self._init_calls:])
+
+    def test_update_without_json1_adds_new_values(self):
+        self._target._json1 = False
+        self._conn.execute.return_value.fetchone.return_value = ({'a': 1}, 1)
         data = {'b': 2}
 
         self._target.update('test-id', data)
 
-        self.assertEqual(2, self._connect.call_count)
-        self._connect.assert_called_with('test-file', isolation_level=None, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._assert_connected_once()
         execute_calls = [
-            call('SELECT * FROM jobs WHERE id = ?', ('test-id',)),
-            call('UPDATE jobs SET data = ? WHERE id = ?', ({'a': 1, 'b': 2}, 'test-id'))
+            call('BEGIN IMMEDIATE'),
+            call('SELECT data, revision FROM jobs WHERE id = ?', ('test-id',)),
+            call('UPDATE jobs SET data = ?, revision = ? WHERE id = ?', ({'a': 1, 'b': 2}, 2, 'test-id'))
         ]
-        # NOTE: skip asserting create table call from __init__
-        self.assertEqual(execute_calls, self._conn.execute.call_args_list[1:])
+        # NOTE: skip asserting calls from __init__
+        self.assertEqual(execute_calls, self._conn.execute.call_args_list[self._init_calls:])
 
-    def test_update_replaces_values(self):
-        self._conn.execute.return_value.fetchone.return_value = ('test-id', {'a': 1, 'b': 2})
+    def test_update_without_json1_replaces_values(self):
+        self._target._json1 = False
+        self._conn.execute.return_value.fetchone.return_value = ({'a': 1, 'b': 2}, 5)
         data = {'a': 4}
 
         self._target.update('test-id', data)
 
-        self.assertEqual(2, self._connect.call_count)
-        self._connect.assert_called_with('test-file', isolation_level=None, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._assert_connected_once()
         execute_calls = [
-            call('SELECT * FROM jobs WHERE id = ?', ('test-id',)),
-            call('UPDATE jobs SET data = ? WHERE id = ?', ({'a': 4, 'b': 2}, 'test-id'))
+            call('BEGIN IMMEDIATE'),
+            call('SELECT data, revision FROM jobs WHERE id = ?', ('test-id',)),
+            call('UPDATE jobs SET data = ?, revision = ? WHERE id = ?', ({'a': 4, 'b': 2}, 6, 'test-id'))
         ]
-        # NOTE: skip asserting create table call from __init__
-        self.assertEqual(execute_calls, self._conn.execute.call_args_list[1:])
+        # NOTE: skip asserting calls from __init__
+        self.assertEqual(execute_calls, self._conn.execute.call_args_list[self._init_calls:])
+
+    def test_update_without_json1_raises_if_row_missing(self):
+        self._target._json1 = False
+        self._conn.execute.return_value.fetchone.return_value = None
+
+        with self.assertRaises(LookupError):
+            self._target.update('test-id', {'a': 4})
 
     def test_delete(self):
         self._target.delete('test-id')
 
-        self.assertEqual(2, self._connect.call_count)
-        self._connect.assert_called_with('test-file', isolation_level=None, detect_types=sqlite3.PARSE_DECLTYPES)
+        self._assert_connected_once()
         self._conn.execute.assert_called_with('DELETE FROM jobs WHERE id = ?', ('test-id',))
 
+    def test_delete_with_revision(self):
+        self._conn.execute.return_value.rowcount = 1
+
+        self._target.delete('test-id', revision=3)
+
+        self._conn.execute.assert_called_with('DELETE FROM jobs WHERE id = ? AND revision = ?', ('test-id', 3))
+
+    def test_delete_raises_conflict_if_revision_differs(self):
+        self._conn.execute.return_value.rowcount = 0
+
+        with self.assertRaises(WriteConflict):
+            self._target.delete('test-id', revision=3)
+
+    def test_bulk_write(self):
+        data = {'a': 1}
+
+        results = self._target.bulk_write([StoreOperation.create('foo', data), StoreOperation.delete('bar')])
+
+        self.assertEqual([1, None], results)
+        self._assert_connected_once()
+        execute_calls = [
+            call('BEGIN IMMEDIATE'),
+            call('SAVEPOINT job_op'),
+            call('INSERT INTO jobs (id, data, revision) VALUES (?, ?, 1)', ('foo', data)),
+            call('RELEASE job_op'),
+            call('SAVEPOINT job_op'),
+            call('DELETE FROM jobs WHERE id = ?', ('bar',)),
+            call('RELEASE job_op')
+        ]
+        # NOTE: skip asserting calls from __init__
+        self.assertEqual(execute_calls, self._conn.execute.call_args_list[self._init_calls:])
+
+    def test_connection_returned_to_pool_on_error(self):
+        self._conn.execute.side_effect = sqlite3.OperationalError
+
+        with self.assertRaises(sqlite3.OperationalError):
+            self._target.delete('test-id')
+        self._conn.execute.side_effect = None
+        self._target.delete('test-id')
+
+        self._assert_connected_once()
+
+    def test_concurrent_calls_use_separate_connections(self):
+        with self._target._connection():
+            self._target.delete('test-id')
+
+        self.assertEqual(2, self._connect.call_count)
+
+    def test_pool_closes_connections_beyond_size(self):
+        first, second = MagicMock(), MagicMock()
+        with patch('sqlite3.register_adapter'), \
+                patch('sqlite3.register_converter'), \
+                patch('sqlite3.connect', side_effect=[first, second]):
+            target = SQLiteStore('test-file', pool_size=1)
+            with target._connection():
+                target.delete('test-id')
+
+        first.close.assert_called_with()
+        second.close.assert_not_called()
+        self.assertEqual(1, target._pool.qsize())
+
+    def test_close_closes_idle_connections(self):
+        self._target.close()
+
+        self._raw_conn.close.assert_called_with()
+        self.assertEqual(0, self._target._pool.qsize())
+
+
+class SQLiteStoreIntegrationTests(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self._target = SQLiteStore(os.path.join(self._dir.name, 'test.db'))
+        self.addCleanup(self._target.close)
+
+    def test_round_trip(self):
+        self._target.create('foo', {'a': 1, 'b': 2})
+        self._target.create('bar', {'c': 3})
+        self._target.update('foo', {'a': 4})
+        self._target.delete('bar')
+
+        self.assertEqual([{'id': 'foo', 'a': 4, 'b': 2, 'revision': 2}], list(self._target.load_all()))
+
+    def test_conditional_writes(self):
+        self._target.create('foo', {'a': 1})
+
+        with self.assertRaises(WriteConflict):
+            self._target.create('foo', {'a': 2})
+        self.assertEqual(2, self._target.update('foo', {'a': 2}, revision=1))
+        with self.assertRaises(WriteConflict):
+            self._target.update('foo', {'a': 3}, revision=1)
+        with self.assertRaises(WriteConflict):
+            self._target.delete('foo', revision=1)
+        self._target.delete('foo', revision=2)
+
+        self.assertEqual([], list(self._target.load_all()))
+
+    def test_adds_revision_to_existing_table(self):
+        db_file = os.path.join(self._dir.name, 'legacy.db')
+        with sqlite3.connect(db_file) as conn:
+            conn.execute('CREATE TABLE jobs(id TEXT PRIMARY KEY NOT NULL, data JSONTEXT NOT NULL)')
+            conn.execute('INSERT INTO jobs VALUES (?, ?)', ('foo', '{"a": 1}'))
+        conn.close()
+        target = SQLiteStore(db_file)
+        self.addCleanup(target.close)
+
+        self.assertEqual([{'id': 'foo', 'a': 1, 'revision': 0}], list(target.load_all()))
+        self.assertEqual(1, target.update('foo', {'a': 2}, revision=0))
+
+    def test_update_replaces_nested_values(self):
+        self._target.create('foo', {'trigger': {'type': 'sqs', 'queueName': 'q'}, 'suspended': True})
+
+        self._target.update('foo', {'trigger': {'type': 'noop'}, 'suspended': None, 'taskCount': 2})
+
+        self.assertEqual([{'id': 'foo', 'trigger': {'type': 'noop'}, 'suspended': None, 'taskCount': 2, 'revision': 2}], list(self._target.load_all()))
+
+    def test_update_without_json1_matches_json1(self):
+        self._target.create('foo', {'a': 1, 'b': {'c': 2}})
+        self._target._json1 = False
+
+        self._target.update('foo', {'b': {'d': 3}, 'e': [1, 2]})
+
+        self.assertEqual([{'id': 'foo', 'a': 1, 'b': {'d': 3}, 'e': [1, 2], 'revision': 2}], list(self._target.load_all()))
+
+    def test_update_missing_row_raises(self):
+        with self.assertRaises(LookupError):
+            self._target.update('foo', {'a': 1})
+
+    def test_conditional_writes_without_returning(self):
+        self._target._returning = False
+        self._target.create('foo', {'a': 1})
+
+        self.assertEqual(2, self._target.update('foo', {'a': 2}))
+        self.assertEqual(3, self._target.update('foo', {'a': 3}, revision=2))
+        with self.assertRaises(WriteConflict):
+            self._target.update('foo', {'a': 4}, revision=2)
+        with self.assertRaises(LookupError):
+            self._target.update('bar', {'a': 1}, revision=1)
+
+        self.assertEqual([{'id': 'foo', 'a': 3, 'revision': 3}], list(self._target.load_all()))
+
+    def test_bulk_write_rolls_back_failed_operations_only(self):
+        self._target.create('foo', {'a': 1})
+
+        results = self._target.bulk_write([
+            StoreOperation.create('bar', {'b': 2}),
+            StoreOperation.create('foo', {'a': 2}),
+            StoreOperation.update('baz', {'c': 3}),
+            StoreOperation.update('foo', {'a': 3}),
+            StoreOperation.delete('bar')
+        ])
+
+        self.assertEqual(1, results[0])
+        self.assertIsInstance(results[1], WriteConflict)
+        self.assertIsInstance(results[2], LookupError)
+        self.assertEqual(2, results[3])
+        self.assertIsNone(results[4])
+        self.assertEqual([{'id': 'foo', 'a': 3, 'revision': 2}], list(self._target.load_all()))
+
+    def test_uses_wal_journal(self):
+        with self._target._connection() as conn:
+            mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+
+        self.assertEqual('wal', mode)
+
+    def test_shared_across_threads(self):
+        def create_job(i):
+            self._target.create(f'job-{i}', {'n': i})
+
+        threads = [threading.Thread(target=create_job, args=(i,)) for i in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(10, len(list(self._target.load_all())))
+
 
 class S3StoreTests(unittest.TestCase):
     def setUp(self):
@@ -215,6 +698,7 @@ class S3StoreTests(unittest.TestCase):
             self._target = S3Store(bn)
 
     def test_init(self):
+        self.assertEqual(10, self._res.call_args[1]['config'].max_pool_connections)
         self._res.return_value.Bucket.assert_called_with('test-bucket')
         self._client.return_value.head_bucket.assert_called_with(Bucket='test-bucket')
         self._bucket.create.assert_not_called()
@@ -271,6 +755,32 @@ class S3StoreTests(unittest.TestCase):
         self.assertCountEqual(expected, results)
         self._bucket.objects.filter.assert_called_with(Prefix='')
 
+    def test_load_all_fetches_in_parallel(self):
+        with patch('boto3.resource') as res, patch('boto3.client'):
+            bucket = res.return_value.Bucket.return_value
+            bucket.name = 'test-bucket'
+            target = S3Store('test-bucket', concurrency='4')
+        barrier = threading.Barrier(4, timeout=5)
+        def get_body(n):
+            def get():
+                barrier.wait()
+                return {'Body': BytesIO(f'{{"n": {n}}}'.encode())}
+            return get
+        bucket.objects.filter.return_value = [Mock(key=f'job{n}.json', get=get_body(n)) for n in range(8)]
+
+        results = list(target.load_all())
+
+        self.assertEqual(4, res.call_args[1]['config'].max_pool_connections)
+        self.assertCountEqual([{'id': f'job{n}', 'n': n} for n in range(8)], results)
+
+    def test_load_all_raises_fetch_error(self):
+        def get():
+            raise botocore.exceptions.ClientError({'Error': {'Code': '500'}}, 'GetObject')
+        self._bucket.objects.filter.return_value = [Mock(key='foo.json', get=get)]
+
+        with self.assertRaises(botocore.exceptions.ClientError):
+            list(self._target.load_all())
+
     def test_load_all_ignores_other_bucket_contents(self):
         self._bucket.objects.filter.return_value = [
             Mock(key='foo.json', get=lambda: {'Body': BytesIO(b'{"a": 1}')}),
@@ -293,6 +803,40 @@ class S3StoreTests(unittest.TestCase):
         self.assertCountEqual(expected, results)
         self._bucket.objects.filter.assert_called_with(Prefix='')
 
+    def test_load_changes_without_watermark_loads_all(self):
+        self._bucket.objects.filter.return_value = [
+            Mock(key='foo.json', e_tag='"1"', get=lambda: {'Body': BytesIO(b'{"a": 1}')}),
+            Mock(key='bar.json', e_tag='"2"', get=lambda: {'Body': BytesIO(b'{"b": 2}')})
+        ]
+
+        changed, deleted, watermark = self._target.load_changes(None)
+
+        self.assertCountEqual([{'id': 'foo', 'a': 1}, {'id': 'bar', 'b': 2}], list(changed))
+        self.assertEqual([], deleted)
+        self.assertEqual({'bucket': 'test-bucket', 'prefix': '', 'etags': {'foo': '"1"', 'bar': '"2"'}}, watermark)
+
+    def test_load_changes_fetches_only_changed_objects(self):
+        unchanged = Mock(key='foo.json', e_tag='"1"')
+        self._bucket.objects.filter.return_value = [
+            unchanged,
+            Mock(key='bar.json', e_tag='"3"', get=lambda: {'Body': BytesIO(b'{"b": 3}')}),
+            Mock(key='baz.json', e_tag='"4"', get=lambda: {'Body': BytesIO(b'{"c": 4}')})
+        ]
+        watermark = {'bucket': 'test-bucket', 'prefix': '', 'etags': {'foo': '"1"', 'bar': '"2"', 'bort': '"5"'}}
+
+        changed, deleted, new_watermark = self._target.load_changes(watermark)
+
+        self.assertCountEqual([{'id': 'bar', 'b': 3}, {'id': 'baz', 'c': 4}], list(changed))
+        self.assertEqual(['bort'], deleted)
+        self.assertEqual({'foo': '"1"', 'bar': '"3"', 'baz': '"4"'}, new_watermark['etags'])
+        unchanged.get.assert_not_called()
+
+    def test_load_changes_rejects_other_location_watermark(self):
+        watermark = {'bucket': 'other-bucket', 'prefix': '', 'etags': {}}
+
+        self.assertIsNone(self._target.load_changes(watermark))
+        self._bucket.objects.filter.assert_not_called()
+
     def test_load_all_prefix_yields_nothing_if_empty(self):
         self._target._prefix = 'test-prefix'
 
@@ -364,10 +908,11 @@ class S3StoreTests(unittest.TestCase):
         new_obj = self._res.return_value.Object.return_value
         data = {'a': 1}
 
-        self._target.create('test-id', data)
+        result = self._target.create('test-id', data)
 
+        self.assertEqual(1, result)
         self._res.return_value.Object.assert_called_with('test-bucket', 'test-id.json')
-        new_obj.put.assert_called_with(Body=b'{"a": 1}')
+        new_obj.put.assert_called_with(Body=b'{"a": 1, "revision": 1}', IfNoneMatch='*')
 
     def test_create_with_prefix(self):
         self._target._prefix = 'test-prefix'
@@ -377,7 +922,7 @@ class S3StoreTests(unittest.TestCase):
         self._target.create('test-id', data)
 
         self._res.return_value.Object.assert_called_with('test-bucket', 'test-prefix/test-id.json')
-        new_obj.put.assert_called_with(Body=b'{"a": 1}')
+        new_obj.put.assert_called_with(Body=b'{"a": 1, "revision": 1}', IfNoneMatch='*')
 
     def test_create_with_slashed_prefix(self):
         self._target._prefix = 'test-prefix/'
@@ -387,49 +932,95 @@ class S3StoreTests(unittest.TestCase):
         self._target.create('test-id', data)
 
         self._res.return_value.Object.assert_called_with('test-bucket', 'test-prefix/test-id.json')
-        new_obj.put.assert_called_with(Body=b'{"a": 1}')
+        new_obj.put.assert_called_with(Body=b'{"a": 1, "revision": 1}', IfNoneMatch='*')
 
     def test_update_adds_fields(self):
         up_obj = self._res.return_value.Object.return_value
-        up_obj.get.return_value = {'Body': BytesIO(b'{"a": 1}')}
+        up_obj.get.return_value = {'Body': BytesIO(b'{"a": 1}'), 'ETag': '\"e1\"'}
         updated_data = {'b': 2}
 
         self._target.update('test-id', updated_data)
 
         self._res.return_value.Object.assert_called_with('test-bucket', 'test-id.json')
-        up_obj.put.assert_called_with(Body=b'{"a": 1, "b": 2}')
+        up_obj.put.assert_called_with(Body=b'{"a": 1, "b": 2, "revision": 1}', IfMatch='"e1"')
 
     def test_update_replace_fields(self):
         up_obj = self._res.return_value.Object.return_value
-        up_obj.get.return_value = {'Body': BytesIO(b'{"a": 1}')}
+        up_obj.get.return_value = {'Body': BytesIO(b'{"a": 1}'), 'ETag': '\"e1\"'}
         updated_data = {'a': 3}
 
         self._target.update('test-id', updated_data)
 
         self._res.return_value.Object.assert_called_with('test-bucket', 'test-id.json')
-        up_obj.put.assert_called_with(Body=b'{"a": 3}')
+        up_obj.put.assert_called_with(Body=b'{"a": 3, "revision": 1}', IfMatch='"e1"')
 
     def test_update_with_prefix(self):
         self._target._prefix = 'test-prefix'
         up_obj = self._res.return_value.Object.return_value
-        up_obj.get.return_value = {'Body': BytesIO(b'{"a": 1, "b": 2}')}
+        up_obj.get.return_value = {'Body': BytesIO(b'{"a": 1, "b": 2}'), 'ETag': '\"e1\"'}
         updated_data = {'b': 4, 'w': 'foo'}
 
         self._target.update('test-id', updated_data)
 
         self._res.return_value.Object.assert_called_with('test-bucket', 'test-prefix/test-id.json')
-        up_obj.put.assert_called_with(Body=b'{"a": 1, "b": 4, "w": "foo"}')
+        up_obj.put.assert_called_with(Body=b'{"a": 1, "b": 4, "revision": 1, "w": "foo"}', IfMatch='"e1"')
 
     def test_update_with_slashed_prefix(self):
         self._target._prefix = 'test-prefix/'
         up_obj = self._res.return_value.Object.return_value
-        up_obj.get.return_value = {'Body': BytesIO(b'{"a": 1, "b": 2}')}
+        up_obj.get.return_value = {'Body': BytesIO(b'{"a": 1, "b": 2}'), 'ETag': '\"e1\"'}
         updated_data = {'b': 4, 'w': 'foo'}
 
         self._target.update('test-id', updated_data)
 
         self._res.return_value.Object.assert_called_with('test-bucket', 'test-prefix/test-id.json')
-        up_obj.put.assert_called_with(Body=b'{"a": 1, "b": 4, "w": "foo"}')
+        up_obj.put.assert_called_with(Body=b'{"a": 1, "b": 4, "revision": 1, "w": "foo"}', IfMatch='"e1"')
+
+    def test_create_raises_conflict_if_object_exists(self):
+        new_obj = self._res.return_value.Object.return_value
+        new_obj.put.side_effect = botocore.exceptions.ClientError({'Error': {'Code': 'PreconditionFailed'}}, 'PutObject')
+
+        with self.assertRaises(WriteConflict):
+            self._target.create('test-id', {'a': 1})
+
+    def test_update_increments_revision(self):
+        up_obj = self._res.return_value.Object.return_value
+        up_obj.get.return_value = {'Body': BytesIO(b'{"a": 1, "revision": 4}'), 'ETag': '"e1"'}
+
+        result = self._target.update('test-id', {'a': 2}, revision=4)
+
+        self.assertEqual(5, result)
+        up_obj.put.assert_called_with(Body=b'{"a": 2, "revision": 5}', IfMatch='"e1"')
+
+    def test_update_raises_conflict_if_revision_differs(self):
+        up_obj = self._res.return_value.Object.return_value
+        up_obj.get.return_value = {'Body': BytesIO(b'{"a": 1, "revision": 4}'), 'ETag': '"e1"'}
+
+        with self.assertRaises(WriteConflict):
+            self._target.update('test-id', {'a': 2}, revision=3)
+        up_obj.put.assert_not_called()
+
+    def test_update_retries_if_object_changed(self):
+        up_obj = self._res.return_value.Object.return_value
+        up_obj.get.side_effect = [
+            {'Body': BytesIO(b'{"a": 1, "revision": 1}'), 'ETag': '"e1"'},
+            {'Body': BytesIO(b'{"a": 1, "b": 2, "revision": 2}'), 'ETag': '"e2"'}
+        ]
+        up_obj.put.side_effect = [botocore.exceptions.ClientError({'Error': {'Code': 'PreconditionFailed'}}, 'PutObject'), None]
+
+        result = self._target.update('test-id', {'a': 3})
+
+        self.assertEqual(3, result)
+        up_obj.put.assert_called_with(Body=b'{"a": 3, "b": 2, "revision": 3}', IfMatch='"e2"')
+
+    def test_update_with_revision_raises_conflict_if_object_changed(self):
+        up_obj = self._res.return_value.Object.return_value
+        up_obj.get.return_value = {'Body': BytesIO(b'{"a": 1, "revision": 1}'), 'ETag': '"e1"'}
+        up_obj.put.side_effect = botocore.exceptions.ClientError({'Error': {'Code': 'PreconditionFailed'}}, 'PutObject')
+
+        with self.assertRaises(WriteConflict):
+            self._target.update('test-id', {'a': 3}, revision=1)
+        self.assertEqual(1, up_obj.put.call_count)
 
     def test_delete(self):
         del_obj = self._res.return_value.Object.return_value
@@ -457,6 +1048,194 @@ class S3StoreTests(unittest.TestCase):
         self._res.return_value.Object.assert_called_with('test-bucket', 'test-prefix/test-id.json')
         del_obj.delete.assert_called_with()
 
+    def test_delete_with_revision(self):
+        del_obj = self._res.return_value.Object.return_value
+        del_obj.get.return_value = {'Body': BytesIO(b'{"a": 1, "revision": 2}'), 'ETag': '"e1"'}
+
+        self._target.delete('test-id', revision=2)
+
+        del_obj.delete.assert_called_with(IfMatch='"e1"')
+
+    def test_delete_raises_conflict_if_revision_differs(self):
+        del_obj = self._res.return_value.Object.return_value
+        del_obj.get.return_value = {'Body': BytesIO(b'{"a": 1, "revision": 2}'), 'ETag': '"e1"'}
+
+        with self.assertRaises(WriteConflict):
+            self._target.delete('test-id', revision=1)
+        del_obj.delete.assert_not_called()
+
+
+def _snapshot_body(last_delta, *jobs):
+    lines = [json.dumps({'version': 1, 'lastDelta': last_delta})]
+    lines.extend(json.dumps(j) for j in jobs)
+    return gzip.compress('\n'.join(lines).encode('utf-8'))
+
+
+def _delta_key(seconds):
+    return f'jobs/_delta/{seconds * 10 ** 9:020d}-abcd.json'
+
+
+def _delta(key, action, job_id, job_data=None):
+    body = json.dumps({'action': action, 'job_id': job_id, 'job_data': job_data}).encode('utf-8')
+    return Mock(key=key, get=lambda: {'Body': BytesIO(body)})
+
+
+class S3StoreSnapshotTests(unittest.TestCase):
+    def setUp(self):
+        with patch('boto3.resource') as self._res, \
+                patch('boto3.client'), \
+                patch('threading.Thread') as self._thread:
+            self._bucket = self._res.return_value.Bucket.return_value
+            self._bucket.name = 'test-bucket'
+            self._target = S3Store('test-bucket', prefix='jobs', snapshot_interval='300')
+        self._objects = {}
+        self._res.return_value.Object.side_effect = lambda bucket, key: self._objects.setdefault(key, Mock(key=key))
+        self._snapshot = self._objects.setdefault('jobs/_snapshot.ndjson.gz', Mock())
+        self._job_objects = []
+        self._deltas = []
+        self._bucket.objects.filter.side_effect = lambda Prefix: self._deltas if Prefix == 'jobs/_delta/' else self._job_objects
+
+    def _set_missing_snapshot(self):
+        self._snapshot.get.side_effect = botocore.exceptions.ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+
+    def test_init_starts_compactor(self):
+        self._thread.assert_called_with(target=ANY, name='s3-snapshot-compactor', daemon=True)
+        self._thread.return_value.start.assert_called_with()
+
+    def test_load_all_reads_snapshot_and_replays_deltas(self):
+        self._snapshot.get.return_value = {'Body': BytesIO(_snapshot_body('jobs/_delta/002.json', {'id': 'foo', 'a': 1}, {'id': 'bar', 'b': 2}))}
+        self._deltas = [
+            _delta('jobs/_delta/001.json', 'create', 'old', {'z': 0}),
+            _delta('jobs/_delta/002.json', 'delete', 'foo'),
+            _delta('jobs/_delta/003.json', 'update', 'bar', {'b': 3}),
+            _delta('jobs/_delta/004.json', 'create', 'baz', {'c': 4}),
+            _delta('jobs/_delta/005.json', 'delete', 'foo')
+        ]
+        self._job_objects = [Mock(key='jobs/foo.json', get=Mock(side_effect=AssertionError('job object fetched')))]
+
+        results = list(self._target.load_all())
+
+        self.assertCountEqual([{'id': 'bar', 'b': 3, 'revision': 1}, {'id': 'baz', 'c': 4, 'revision': 1}], results)
+
+    def test_load_all_falls_back_to_job_objects(self):
+        self._set_missing_snapshot()
+        self._job_objects = [Mock(key='jobs/foo.json', get=lambda: {'Body': BytesIO(b'{"a": 1}')})]
+
+        results = list(self._target.load_all())
+
+        self.assertEqual([{'id': 'foo', 'a': 1}], results)
+        self.assertTrue(self._target._compact_requested.is_set())
+
+    def test_load_all_raises_unknown_snapshot_errors(self):
+        self._snapshot.get.side_effect = botocore.exceptions.ClientError({'Error': {'Code': '500'}}, 'GetObject')
+
+        with self.assertRaises(botocore.exceptions.ClientError):
+            list(self._target.load_all())
+
+    def test_load_all_ignores_unknown_snapshot_version(self):
+        body = gzip.compress(json.dumps({'version': 99, 'lastDelta': ''}).encode('utf-8'))
+        self._snapshot.get.return_value = {'Body': BytesIO(body)}
+        self._job_objects = [Mock(key='jobs/foo.json', get=lambda: {'Body': BytesIO(b'{"a": 1}')})]
+
+        results = list(self._target.load_all())
+
+        self.assertEqual([{'id': 'foo', 'a': 1}], results)
+
+    def _logged_deltas(self):
+        return [json.loads(o.put.call_args[1]['Body']) for k, o in self._objects.items() if k.startswith('jobs/_delta/')]
+
+    def test_create_logs_delta(self):
+        self._target.create('foo', {'a': 1})
+
+        self._objects['jobs/foo.json'].put.assert_called_with(Body=b'{"a": 1, "revision": 1}', IfNoneMatch='*')
+        self.assertEqual([{'action': 'create', 'job_id': 'foo', 'job_data': {'a': 1}, 'revision': 1}], self._logged_deltas())
+
+    def test_update_logs_partial_delta(self):
+        self._objects['jobs/foo.json'] = Mock(get=lambda: {'Body': BytesIO(b'{"a": 1, "b": 2, "revision": 1}'), 'ETag': '"e1"'})
+
+        self._target.update('foo', {'a': 3})
+
+        self._objects['jobs/foo.json'].put.assert_called_with(Body=b'{"a": 3, "b": 2, "revision": 2}', IfMatch='"e1"')
+        self.assertEqual([{'action': 'update', 'job_id': 'foo', 'job_data': {'a': 3}, 'revision': 2}], self._logged_deltas())
+
+    def test_delete_logs_delta(self):
+        self._target.delete('foo')
+
+        self._objects['jobs/foo.json'].delete.assert_called_with()
+        self.assertEqual([{'action': 'delete', 'job_id': 'foo', 'job_data': None, 'revision': None}], self._logged_deltas())
+
+    def _written_snapshot(self):
+        lines = gzip.decompress(self._snapshot.put.call_args[1]['Body']).decode('utf-8').splitlines()
+        return json.loads(lines[0]), [json.loads(l) for l in lines[1:]]
+
+    @patch('time.time_ns', return_value=10000 * 10 ** 9)
+    def test_compact_folds_deltas_into_snapshot(self, fake_time):
+        self._snapshot.get.return_value = {'Body': BytesIO(_snapshot_body(_delta_key(1), {'id': 'foo', 'a': 1}))}
+        self._deltas = [
+            _delta(_delta_key(1), 'create', 'foo', {'a': 1}),
+            _delta(_delta_key(2), 'update', 'foo', {'a': 2}),
+        ]
+
+        self._target.compact()
+
+        header, jobs = self._written_snapshot()
+        self.assertEqual({'version': 1, 'lastDelta': _delta_key(2)}, header)
+        self.assertEqual([{'id': 'foo', 'a': 2, 'revision': 1}], jobs)
+        self._bucket.delete_objects.assert_called_with(Delete={
+            'Objects': [{'Key': _delta_key(1)}, {'Key': _delta_key(2)}],
+            'Quiet': True
+        })
+
+    @patch('time.time_ns', return_value=10000 * 10 ** 9)
+    def test_compact_keeps_unsettled_deltas_in_log(self, fake_time):
+        self._snapshot.get.return_value = {'Body': BytesIO(_snapshot_body(_delta_key(1), {'id': 'foo', 'a': 1}))}
+        self._deltas = [
+            _delta(_delta_key(2), 'update', 'foo', {'a': 2}),
+            _delta(_delta_key(9500), 'update', 'foo', {'a': 3}),
+        ]
+
+        self._target.compact()
+
+        header, jobs = self._written_snapshot()
+        self.assertEqual({'version': 1, 'lastDelta': _delta_key(2)}, header)
+        self.assertEqual([{'id': 'foo', 'a': 2, 'revision': 1}], jobs)
+        self._bucket.delete_objects.assert_called_with(Delete={'Objects': [{'Key': _delta_key(2)}], 'Quiet': True})
+
+    @patch('time.time_ns', return_value=10000 * 10 ** 9)
+    def test_compact_leaves_late_delta_for_load_all(self, fake_time):
+        self._snapshot.get.return_value = {'Body': BytesIO(_snapshot_body(_delta_key(1), {'id': 'foo', 'a': 1}))}
+        self._deltas = [_delta(_delta_key(9600), 'update', 'foo', {'b': 2})]
+
+        self._target.compact()
+        self._snapshot.put.assert_not_called()
+        self._snapshot.get.return_value = {'Body': BytesIO(_snapshot_body(_delta_key(1), {'id': 'foo', 'a': 1}))}
+        self._deltas.insert(0, _delta(_delta_key(9500), 'update', 'foo', {'a': 2}))
+        results = list(self._target.load_all())
+
+        self.assertEqual([{'id': 'foo', 'a': 2, 'b': 2, 'revision': 2}], results)
+
+    @patch('time.time_ns', return_value=10000 * 10 ** 9)
+    def test_compact_creates_snapshot_from_job_objects(self, fake_time):
+        self._set_missing_snapshot()
+        self._job_objects = [Mock(key='jobs/foo.json', get=lambda: {'Body': BytesIO(b'{"a": 1}')})]
+        self._deltas = [_delta(_delta_key(1), 'create', 'foo', {'a': 1}), _delta(_delta_key(9999), 'update', 'foo', {'a': 1})]
+
+        self._target.compact()
+
+        header, jobs = self._written_snapshot()
+        self.assertEqual({'version': 1, 'lastDelta': _delta_key(1)}, header)
+        self.assertEqual([{'id': 'foo', 'a': 1}], jobs)
+        self._bucket.delete_objects.assert_called_with(Delete={'Objects': [{'Key': _delta_key(1)}], 'Quiet': True})
+
+    @patch('time.time_ns', return_value=10000 * 10 ** 9)
+    def test_compact_skips_snapshot_if_no_new_deltas(self, fake_time):
+        self._snapshot.get.return_value = {'Body': BytesIO(_snapshot_body(_delta_key(1), {'id': 'foo', 'a': 1}))}
+
+        self._target.compact()
+
+        self._snapshot.put.assert_not_called()
+        self._bucket.delete_objects.assert_not_called()
+
 
 class DynamoDBStoreTests(unittest.TestCase):
     def setUp(self):
@@ -512,13 +1291,47 @@ class DynamoDBStoreTests(unittest.TestCase):
         results = list(self._target.load_all())
 
         expected_results = [
-            {'id': 'foo1', 'a': 1},
-            {'id': 'foo2', 'b': 2},
-            {'id': 'foo3', 'c': 3}
+            {'id': 'foo1', 'a': 1, 'revision': 0},
+            {'id': 'foo2', 'b': 2, 'revision': 0},
+            {'id': 'foo3', 'c': 3, 'revision': 0}
         ]
         self.assertEqual(expected_results, results)
         self.assertEqual([call()], self._table.scan.call_args_list)
 
+    def test_load_all_scans_segments_in_parallel(self):
+        with patch('boto3.resource') as res, patch('boto3.client'):
+            table = res.return_value.Table.return_value
+            table.name = 'test-table'
+            target = DynamoDBStore('test-table', scan_segments='3')
+        barrier = threading.Barrier(3, timeout=5)
+        pages = {
+            (0, None): {'Items': [{'job-id': 'foo1', 'json-data': '{"a": 1}'}], 'LastEvaluatedKey': 'foo1'},
+            (0, 'foo1'): {'Items': [{'job-id': 'foo2', 'json-data': '{"b": 2}'}]},
+            (1, None): {'Items': []},
+            (2, None): {'Items': [{'job-id': 'bar1', 'json-data': '{"c": 3}'}]}
+        }
+        def scan(Segment, TotalSegments, ExclusiveStartKey=None):
+            self.assertEqual(3, TotalSegments)
+            if ExclusiveStartKey is None:
+                barrier.wait()
+            return pages[(Segment, ExclusiveStartKey)]
+        table.scan.side_effect = scan
+
+        results = list(target.load_all())
+
+        self.assertCountEqual([
+            {'id': 'foo1', 'a': 1, 'revision': 0},
+            {'id': 'foo2', 'b': 2, 'revision': 0},
+            {'id': 'bar1', 'c': 3, 'revision': 0}
+        ], results)
+        self.assertEqual(4, table.scan.call_count)
+
+    def test_load_all_raises_segment_error(self):
+        self._table.scan.side_effect = botocore.exceptions.ClientError({'Error': {'Code': '500'}}, 'Scan')
+
+        with self.assertRaises(botocore.exceptions.ClientError):
+            list(self._target.load_all())
+
     def test_load_all_yields_all_batches(self):
         self._table.scan.side_effect = (
             {'Items': [
@@ -537,46 +1350,208 @@ class DynamoDBStoreTests(unittest.TestCase):
         results = list(self._target.load_all())
 
         expected_results = [
-            {'id': 'foo1', 'a': 1},
-            {'id': 'foo2', 'b': 2},
-            {'id': 'foo3', 'c': 3},
-            {'id': 'bar1', 'd': 4},
-            {'id': 'baz1', 'e': 5},
-            {'id': 'baz2', 'f': 6}
+            {'id': 'foo1', 'a': 1, 'revision': 0},
+            {'id': 'foo2', 'b': 2, 'revision': 0},
+            {'id': 'foo3', 'c': 3, 'revision': 0},
+            {'id': 'bar1', 'd': 4, 'revision': 0},
+            {'id': 'baz1', 'e': 5, 'revision': 0},
+            {'id': 'baz2', 'f': 6, 'revision': 0}
         ]
         self.assertEqual(expected_results, results)
         self.assertEqual([call(), call(ExclusiveStartKey='foo'), call(ExclusiveStartKey='bar')], self._table.scan.call_args_list)
 
+    def test_load_all_reads_attribute_and_legacy_items(self):
+        self._table.scan.side_effect = (
+            {'Items': [
+                {'job-id': 'foo1', 'a': Decimal(1), 'b': Decimal('1.5'), 'c': {'d': [Decimal(2), 'x']}, 'e': None, 'job-revision': Decimal(3)},
+                {'job-id': 'foo2', 'json-data': '{"b": 2}'}
+            ]},)
+
+        with patch.object(logging.getLogger('ecs_scheduler.persistence'), 'warning') as warning:
+            results = list(self._target.load_all())
+
+        self.assertEqual([
+            {'id': 'foo1', 'a': 1, 'b': 1.5, 'c': {'d': [2, 'x']}, 'e': None, 'revision': 3},
+            {'id': 'foo2', 'b': 2, 'revision': 0}
+        ], results)
+        self.assertIsInstance(results[0]['a'], int)
+        warning.assert_called()
+
     def test_create(self):
-        data = {'a': 1, 'b': 2}
+        data = {'a': 1, 'b': 2.5, 'c': {'d': [1.5]}}
 
-        self._target.create('test-id', data)
+        result = self._target.create('test-id', data)
 
-        self._table.put_item.assert_called_with(Item={'job-id': 'test-id', 'json-data': '{"a": 1, "b": 2}'})
+        self.assertEqual(1, result)
+        self._table.put_item.assert_called_with(
+            Item={'job-id': 'test-id', 'a': 1, 'b': Decimal('2.5'), 'c': {'d': [Decimal('1.5')]}, 'job-revision': 1},
+            ConditionExpression='attribute_not_exists(#key)',
+            ExpressionAttributeNames={'#key': 'job-id'})
 
-    def test_update_adds_fields(self):
-        self._table.get_item.return_value = {'Item': {'job-id': 'test-id', 'json-data': '{"a": 1}'}}
-        new_data = {'b': 2}
+    def test_create_raises_conflict_if_item_exists(self):
+        self._table.put_item.side_effect = botocore.exceptions.ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'PutItem')
 
-        self._target.update('test-id', new_data)
+        with self.assertRaises(WriteConflict):
+            self._target.create('test-id', {'a': 1})
 
-        self._table.get_item.assert_called_with(Key={'job-id': 'test-id'})
-        self._table.put_item.assert_called_with(Item={'job-id': 'test-id', 'json-data': '{"a": 1, "b": 2}'})
+    def test_update_sets_fields(self):
+        self._table.update_item.return_value = {'Attributes': {'job-revision': Decimal(3)}}
+        new_data = {'a': 4, 'b': {'c': 1.5}}
+
+        result = self._target.update('test-id', new_data)
+
+        self.assertEqual(3, result)
+        self._table.update_item.assert_called_with(
+            Key={'job-id': 'test-id'},
+            UpdateExpression='SET #f0 = :v0, #f1 = :v1, #rev = if_not_exists(#rev, :zero) + :one',
+            ConditionExpression='attribute_exists(#key) AND attribute_not_exists(#legacy)',
+            ExpressionAttributeNames={'#key': 'job-id', '#legacy': 'json-data', '#rev': 'job-revision', '#f0': 'a', '#f1': 'b'},
+            ExpressionAttributeValues={':v0': 4, ':v1': {'c': Decimal('1.5')}, ':zero': 0, ':one': 1},
+            ReturnValues='UPDATED_NEW')
+        self._table.get_item.assert_not_called()
+        self._table.put_item.assert_not_called()
+
+    def test_update_with_revision(self):
+        self._table.update_item.return_value = {'Attributes': {'job-revision': Decimal(3)}}
+
+        result = self._target.update('test-id', {'a': 4}, revision=2)
+
+        self.assertEqual(3, result)
+        self._table.update_item.assert_called_with(
+            Key={'job-id': 'test-id'},
+            UpdateExpression='SET #f0 = :v0, #rev = :next',
+            ConditionExpression='attribute_exists(#key) AND attribute_not_exists(#legacy) AND #rev = :expected',
+            ExpressionAttributeNames={'#key': 'job-id', '#legacy': 'json-data', '#rev': 'job-revision', '#f0': 'a'},
+            ExpressionAttributeValues={':v0': 4, ':next': 3, ':expected': 2},
+            ReturnValues='UPDATED_NEW')
 
-    def test_update_replaces_fields(self):
+    def test_update_raises_conflict_if_revision_differs(self):
+        self._table.update_item.side_effect = botocore.exceptions.ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+        self._table.get_item.return_value = {'Item': {'job-id': 'test-id', 'a': 1, 'job-revision': Decimal(5)}}
+
+        with self.assertRaises(WriteConflict):
+            self._target.update('test-id', {'a': 4}, revision=2)
+
+        self._table.put_item.assert_not_called()
+
+    def test_update_migrates_legacy_item(self):
+        self._table.update_item.side_effect = botocore.exceptions.ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
         self._table.get_item.return_value = {'Item': {'job-id': 'test-id', 'json-data': '{"a": 1, "b": 2}'}}
-        new_data = {'a': 4}
 
-        self._target.update('test-id', new_data)
+        result = self._target.update('test-id', {'a': 4})
 
+        self.assertEqual(1, result)
         self._table.get_item.assert_called_with(Key={'job-id': 'test-id'})
-        self._table.put_item.assert_called_with(Item={'job-id': 'test-id', 'json-data': '{"a": 4, "b": 2}'})
+        self._table.put_item.assert_called_with(Item={'job-id': 'test-id', 'a': 4, 'b': 2, 'job-revision': 1},
+            ConditionExpression='attribute_exists(#legacy)',
+            ExpressionAttributeNames={'#legacy': 'json-data'})
+
+    def test_update_raises_if_item_missing(self):
+        self._table.update_item.side_effect = botocore.exceptions.ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+        self._table.get_item.return_value = {}
+
+        with self.assertRaises(LookupError):
+            self._target.update('test-id', {'a': 4})
+
+        self._table.put_item.assert_not_called()
+
+    def test_update_raises_other_errors(self):
+        self._table.update_item.side_effect = botocore.exceptions.ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'UpdateItem')
+
+        with self.assertRaises(botocore.exceptions.ClientError):
+            self._target.update('test-id', {'a': 4})
+
+        self._table.get_item.assert_not_called()
+
+    def test_migrate_converts_legacy_items(self):
+        self._table.scan.side_effect = (
+            {'Items': [
+                {'job-id': 'foo1', 'json-data': '{"a": 1}'},
+                {'job-id': 'foo2', 'b': Decimal(2)}
+            ], 'LastEvaluatedKey': 'foo2'},
+            {'Items': [
+                {'job-id': 'foo3', 'json-data': '{"c": 3}'}
+            ]},)
+        batch = self._table.batch_writer.return_value.__enter__.return_value
+
+        result = self._target.migrate()
+
+        self.assertEqual(2, result)
+        self.assertEqual([call(), call(ExclusiveStartKey='foo2')], self._table.scan.call_args_list)
+        self.assertEqual([
+            call.put_item(Item={'job-id': 'foo1', 'a': 1, 'job-revision': 1}),
+            call.put_item(Item={'job-id': 'foo3', 'c': 3, 'job-revision': 1})
+        ], batch.method_calls)
 
     def test_delete(self):
         self._target.delete('test-id')
 
         self._table.delete_item.assert_called_with(Key={'job-id': 'test-id'})
 
+    def test_delete_with_revision(self):
+        self._target.delete('test-id', revision=2)
+
+        self._table.delete_item.assert_called_with(Key={'job-id': 'test-id'},
+            ConditionExpression='attribute_exists(#key) AND #rev = :expected',
+            ExpressionAttributeNames={'#key': 'job-id', '#rev': 'job-revision'},
+            ExpressionAttributeValues={':expected': 2})
+
+    def test_delete_raises_conflict_if_revision_differs(self):
+        self._table.delete_item.side_effect = botocore.exceptions.ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'DeleteItem')
+
+        with self.assertRaises(WriteConflict):
+            self._target.delete('test-id', revision=0)
+
+    def test_bulk_write(self):
+        self._res.return_value.batch_get_item.return_value = {'Responses': {'test-table': [{'job-id': 'bar', 'job-revision': Decimal(2)}]}}
+
+        results = self._target.bulk_write([
+            StoreOperation.create('foo', {'a': 1}),
+            StoreOperation.update('foo', {'c': 3}),
+            StoreOperation.update('bar', {'b': 4}),
+            StoreOperation.delete('baz', revision=4)
+        ])
+
+        self.assertEqual([1, 2, 3, None], results)
+        self._res.return_value.batch_get_item.assert_called_once_with(RequestItems={'test-table': {
+            'Keys': [{'job-id': 'foo'}, {'job-id': 'bar'}],
+            'ProjectionExpression': '#key, #rev',
+            'ExpressionAttributeNames': {'#key': 'job-id', '#rev': 'job-revision'}
+        }})
+        transactions = [c[1]['TransactItems'] for c in self._table.meta.client.transact_write_items.call_args_list]
+        self.assertEqual([['Put'], ['Update', 'Update', 'Delete']], [[next(iter(i)) for i in t] for t in transactions])
+        self.assertEqual({':v0': 3, ':next': 2, ':expected': 1}, transactions[1][0]['Update']['ExpressionAttributeValues'])
+        self.assertEqual({':v0': 4, ':next': 3, ':expected': 2}, transactions[1][1]['Update']['ExpressionAttributeValues'])
+        self.assertEqual({':expected': 4}, transactions[1][2]['Delete']['ExpressionAttributeValues'])
+        self.assertEqual('test-table', transactions[0][0]['Put']['TableName'])
+
+    def test_bulk_write_reports_item_errors(self):
+        self._res.return_value.batch_get_item.return_value = {'Responses': {}}
+
+        results = self._target.bulk_write([
+            StoreOperation.update('foo', {'a': 1}),
+            StoreOperation.delete('bar'),
+            StoreOperation.update('bar', {'b': 2})
+        ])
+
+        self.assertIsInstance(results[0], LookupError)
+        self.assertIsNone(results[1])
+        self.assertIsInstance(results[2], LookupError)
+        self._table.meta.client.transact_write_items.assert_called_once_with(TransactItems=[{'Delete': {'TableName': 'test-table', 'Key': {'job-id': 'bar'}}}])
+
+    def test_bulk_write_applies_cancelled_transaction_individually(self):
+        self._table.meta.client.transact_write_items.side_effect = botocore.exceptions.ClientError({'Error': {'Code': 'TransactionCanceledException'}}, 'TransactWriteItems')
+        self._table.put_item.side_effect = [botocore.exceptions.ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'PutItem'), None]
+
+        results = self._target.bulk_write([
+            StoreOperation.create('foo', {'a': 1}),
+            StoreOperation.create('bar', {'b': 2})
+        ])
+
+        self.assertIsInstance(results[0], WriteConflict)
+        self.assertEqual(1, results[1])
+        self.assertEqual(2, self._table.put_item.call_count)
+
 
 class ElasticsearchStoreTests(unittest.TestCase):
     def setUp(self):
@@ -623,7 +1598,7 @@ class ElasticsearchStoreTests(unittest.TestCase):
 
         self.assertEqual([], results)
         info.assert_called()
-        scan.assert_called_with(client=self._es, index='test_index', doc_type='job', scroll='1m')
+        scan.assert_called_with(client=self._es, index='test_index', doc_type='job', scroll='1m', version=True)
 
     @patch('elasticsearch.helpers.scan')
     @patch.object(logging.getLogger('ecs_scheduler.persistence'), 'info')
@@ -631,14 +1606,17 @@ class ElasticsearchStoreTests(unittest.TestCase):
         scan.return_value = [
             {
                 '_id': 1,
+                '_version': 1,
                 '_source': {'a': 'foo'}
             },
             {
                 '_id': 4,
+                '_version': 3,
                 '_source': {'a': 'bar'}
             },
             {
                 '_id': 8,
+                '_version': 2,
                 '_source': {'a': 'baz'}
             }
         ]
@@ -648,36 +1626,220 @@ class ElasticsearchStoreTests(unittest.TestCase):
         expected = [
             {
                 'id': 1,
-                'a': 'foo'
+                'a': 'foo',
+                'revision': 1
             },
             {
                 'id': 4,
-                'a': 'bar'
+                'a': 'bar',
+                'revision': 3
             },
             {
                 'id': 8,
-                'a': 'baz'
+                'a': 'baz',
+                'revision': 2
             }
         ]
         self.assertCountEqual(expected, results)
         info.assert_called()
-        scan.assert_called_with(client=self._es, index='test_index', doc_type='job', scroll='1m')
+        scan.assert_called_with(client=self._es, index='test_index', doc_type='job', scroll='1m', version=True)
+
+    @patch('elasticsearch.helpers.scan')
+    def test_load_changes_without_watermark_loads_all(self, scan):
+        scan.return_value = [{'_id': 'foo', '_version': 1}, {'_id': 'bar', '_version': 2}]
+        self._es.mget.return_value = {'docs': [
+            {'_id': 'foo', 'found': True, '_version': 1, '_source': {'a': 1}},
+            {'_id': 'bar', 'found': True, '_version': 2, '_source': {'b': 2}}
+        ]}
+
+        changed, deleted, watermark = self._target.load_changes(None)
+
+        self.assertEqual([{'id': 'foo', 'a': 1, 'revision': 1}, {'id': 'bar', 'b': 2, 'revision': 2}], list(changed))
+        self.assertEqual([], deleted)
+        self.assertEqual({'index': 'test_index', 'versions': {'foo': 1, 'bar': 2}}, watermark)
+        scan.assert_called_with(client=self._es, index='test_index', doc_type='job', scroll='1m', _source=False, version=True)
+        self._es.mget.assert_called_with(index='test_index', doc_type='job', body={'ids': ['foo', 'bar']})
+
+    @patch('elasticsearch.helpers.scan')
+    def test_load_changes_fetches_only_changed_documents(self, scan):
+        scan.return_value = [{'_id': 'foo', '_version': 1}, {'_id': 'bar', '_version': 3}, {'_id': 'baz', '_version': 1}]
+        self._es.mget.return_value = {'docs': [
+            {'_id': 'bar', 'found': True, '_version': 3, '_source': {'b': 3}},
+            {'_id': 'baz', 'found': False}
+        ]}
+        watermark = {'index': 'test_index', 'versions': {'foo': 1, 'bar': 2, 'bort': 7}}
+
+        changed, deleted, new_watermark = self._target.load_changes(watermark)
+
+        self.assertEqual([{'id': 'bar', 'b': 3, 'revision': 3}], list(changed))
+        self.assertEqual(['bort'], deleted)
+        self.assertEqual({'foo': 1, 'bar': 3, 'baz': 1}, new_watermark['versions'])
+        self._es.mget.assert_called_once_with(index='test_index', doc_type='job', body={'ids': ['bar', 'baz']})
+
+    @patch('elasticsearch.helpers.scan')
+    def test_load_changes_rejects_other_index_watermark(self, scan):
+        self.assertIsNone(self._target.load_changes({'index': 'other_index', 'versions': {}}))
+        scan.assert_not_called()
 
     def test_create(self):
+        self._es.create.return_value = {'_version': 1}
         data = {'a': 1, 'b': 2}
 
-        self._target.create(12, data)
+        result = self._target.create(12, data)
 
+        self.assertEqual(1, result)
         self._es.create.assert_called_with(index='test_index', doc_type='job', id=12, body=data)
 
+    def test_create_raises_conflict_if_document_exists(self):
+        self._es.create.side_effect = elasticsearch.ConflictError(409, 'version_conflict_engine_exception', {})
+
+        with self.assertRaises(WriteConflict):
+            self._target.create(12, {'a': 1})
+
     def test_update(self):
+        self._es.update.return_value = {'_version': 4}
         data = {'a': 1, 'b': 2}
 
-        self._target.update(12, data)
+        result = self._target.update(12, data)
 
+        self.assertEqual(4, result)
         self._es.update.assert_called_with(index='test_index', doc_type='job', id=12, body={'doc': data}, retry_on_conflict=3)
 
+    def test_update_with_revision(self):
+        self._es.get.return_value = {'_version': 3, '_seq_no': 10, '_primary_term': 2}
+        self._es.update.return_value = {'_version': 4}
+        data = {'a': 1}
+
+        result = self._target.update(12, data, revision=3)
+
+        self.assertEqual(4, result)
+        self._es.get.assert_called_with(index='test_index', doc_type='job', id=12, _source=False)
+        self._es.update.assert_called_with(index='test_index', doc_type='job', id=12, body={'doc': data}, if_seq_no=10, if_primary_term=2)
+
+    def test_update_raises_conflict_if_revision_differs(self):
+        self._es.get.return_value = {'_version': 5, '_seq_no': 10, '_primary_term': 2}
+
+        with self.assertRaises(WriteConflict):
+            self._target.update(12, {'a': 1}, revision=3)
+
+        self._es.update.assert_not_called()
+
+    def test_update_raises_conflict_if_document_changed(self):
+        self._es.get.return_value = {'_version': 3, '_seq_no': 10, '_primary_term': 2}
+        self._es.update.side_effect = elasticsearch.ConflictError(409, 'version_conflict_engine_exception', {})
+
+        with self.assertRaises(WriteConflict):
+            self._target.update(12, {'a': 1}, revision=3)
+
     def test_delete(self):
         self._target.delete(12)
 
         self._es.delete.assert_called_with(index='test_index', doc_type='job', id=12)
+
+    def test_delete_with_revision(self):
+        self._es.get.return_value = {'_version': 3, '_seq_no': 10, '_primary_term': 2}
+
+        self._target.delete(12, revision=3)
+
+        self._es.delete.assert_called_with(index='test_index', doc_type='job', id=12, if_seq_no=10, if_primary_term=2)
+
+    @patch('elasticsearch.helpers.streaming_bulk')
+    def test_bulk_write(self, streaming_bulk):
+        streaming_bulk.side_effect = lambda client, actions, **kwargs: [(True, {a['_op_type']: {'_version': 2}}) for a in actions]
+        ops = [
+            StoreOperation.create('foo', {'a': 1}),
+            StoreOperation.update('bar', {'b': 2}),
+            StoreOperation.delete('baz')
+        ]
+
+        results = self._target.bulk_write(ops)
+
+        self.assertEqual([2, 2, None], results)
+        streaming_bulk.assert_called_with(self._es, ANY, chunk_size=500, expand_action_callback=ANY, raise_on_error=False, raise_on_exception=False)
+        self._es.mget.assert_not_called()
+
+    @patch('elasticsearch.helpers.streaming_bulk')
+    def test_bulk_write_actions(self, streaming_bulk):
+        actions = []
+        def bulk(client, action_gen, **kwargs):
+            actions.extend(action_gen)
+            return [(True, {}) for a in actions]
+        streaming_bulk.side_effect = bulk
+
+        self._target.bulk_write([
+            StoreOperation.create('foo', {'a': 1}),
+            StoreOperation.update('bar', {'b': 2}),
+            StoreOperation.delete('baz')
+        ])
+
+        self.assertEqual([
+            {'_op_type': 'create', '_index': 'test_index', '_type': 'job', '_id': 'foo', '_source': {'a': 1}},
+            {'_op_type': 'update', '_index': 'test_index', '_type': 'job', '_id': 'bar', 'retry_on_conflict': 3, 'doc': {'b': 2}},
+            {'_op_type': 'delete', '_index': 'test_index', '_type': 'job', '_id': 'baz'}
+        ], actions)
+
+    @patch('elasticsearch.helpers.streaming_bulk')
+    def test_bulk_write_conditional_actions(self, streaming_bulk):
+        expanded = []
+        def bulk(client, action_gen, expand_action_callback, **kwargs):
+            expanded.extend(expand_action_callback(a) for a in action_gen)
+            return [(True, {}), (False, {'delete': {'_id': 'baz', 'status': 409}})]
+        streaming_bulk.side_effect = bulk
+        self._es.mget.return_value = {'docs': [
+            {'_id': 'bar', 'found': True, '_version': 2, '_seq_no': 7, '_primary_term': 1},
+            {'_id': 'baz', 'found': True, '_version': 4, '_seq_no': 9, '_primary_term': 1},
+            {'_id': 'bort', 'found': True, '_version': 5, '_seq_no': 3, '_primary_term': 1}
+        ]}
+        ops = [
+            StoreOperation.update('bar', {'b': 2}, revision=2),
+            StoreOperation.delete('baz', revision=4),
+            StoreOperation.update('bort', {'c': 3}, revision=4)
+        ]
+
+        results = self._target.bulk_write(ops)
+
+        self._es.mget.assert_called_once_with(index='test_index', doc_type='job', body={'ids': ['bar', 'baz', 'bort']}, _source=False)
+        self.assertEqual([
+            ({'update': {'_index': 'test_index', '_type': 'job', '_id': 'bar', 'if_seq_no': 7, 'if_primary_term': 1}}, {'doc': {'b': 2}}),
+            ({'delete': {'_index': 'test_index', '_type': 'job', '_id': 'baz', 'if_seq_no': 9, 'if_primary_term': 1}}, None)
+        ], expanded)
+        self.assertIsInstance(results[1], WriteConflict)
+        self.assertIsInstance(results[2], WriteConflict)
+
+    @patch('elasticsearch.helpers.streaming_bulk')
+    def test_bulk_write_splits_batch_on_repeated_conditional_job(self, streaming_bulk):
+        streaming_bulk.side_effect = lambda client, actions, **kwargs: [(True, {a['_op_type']: {'_version': 2}}) for a in actions]
+        self._es.mget.side_effect = [{'docs': []}, {'docs': [{'_id': 'foo', 'found': True, '_version': 2, '_seq_no': 1, '_primary_term': 1}]}]
+
+        results = self._target.bulk_write([
+            StoreOperation.create('foo', {'a': 1}),
+            StoreOperation.update('foo', {'a': 2}, revision=1)
+        ])
+
+        self.assertEqual(2, streaming_bulk.call_count)
+        self.assertEqual(2, results[0])
+        self.assertIsInstance(results[1], WriteConflict)
+
+    @patch('elasticsearch.helpers.streaming_bulk')
+    def test_bulk_write_reports_item_errors(self, streaming_bulk):
+        failure = {'_id': 'bar', 'status': 404, 'error': {'type': 'document_missing_exception'}}
+        streaming_bulk.return_value = [(True, {'create': {'_id': 'foo', 'status': 201, '_version': 1}}), (False, {'update': failure})]
+        ops = [StoreOperation.create('foo', {'a': 1}), StoreOperation.update('bar', {'b': 2})]
+
+        results = self._target.bulk_write(ops)
+
+        self.assertEqual(1, results[0])
+        self.assertIsInstance(results[1], StoreOperationError)
+        self.assertIs(ops[1], results[1].op)
+        self.assertEqual(failure, results[1].details)
+
+    @patch('elasticsearch.Elasticsearch')
+    @patch('elasticsearch.helpers.streaming_bulk')
+    def test_bulk_write_uses_chunk_size(self, streaming_bulk, es_cls):
+        streaming_bulk.return_value = []
+        target = ElasticsearchStore('test_index', bulk_chunk_size='50', foo='bar')
+
+        target.bulk_write([StoreOperation.delete('foo')])
+
+        es_cls.assert_called_with(foo='bar')
+        streaming_bulk.assert_called_with(es_cls.return_value, ANY, chunk_size=50, expand_action_callback=ANY, raise_on_error=False, raise_on_exception=False)
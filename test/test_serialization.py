@@ -2,11 +2,14 @@ import unittest
 from datetime import datetime, timezone, timedelta
 
 import dateutil
+import marshmallow
 
 from ecs_scheduler.serialization import TriggerSchema, JobSchema, \
                                             JobCreateSchema, JobResponseSchema, \
-                                            PaginationSchema, OverrideSchema, TaskInfoSchema
-from ecs_scheduler.models import Pagination
+                                            PaginationSchema, OverrideSchema, TaskInfoSchema, JobQuerySchema, \
+                                            JobBatchSchema, compile_dump
+from ecs_scheduler.models import Pagination, JobQuery
+from ecs_scheduler.persistence import StoreOperation
 
 
 class TriggerSchemaTests(unittest.TestCase):
@@ -590,6 +593,7 @@ class JobResponseSchemaTests(unittest.TestCase):
 
         schema = JobResponseSchema(link_gen)
         job_data = {'id': 'testid',
+            'revision': 7,
             'taskDefinition': 'test-task',
             'schedule': '*',
             'parsedSchedule': {'second': '*'},
@@ -696,6 +700,55 @@ class PaginationSchemaTests(unittest.TestCase):
         expected_data = {'skip': 78, 'count': 34}
         self.assertEqual(expected_data, data)
 
+    def test_deserialize_cursor(self):
+        schema = PaginationSchema()
+        data = {'cursor': 'am9iLTE', 'count': 5}
+
+        page, errors = schema.load(data)
+
+        self.assertEqual(0, len(errors))
+        self.assertEqual('job-1', page.cursor)
+        self.assertEqual(5, page.count)
+
+    def test_deserialize_empty_cursor(self):
+        schema = PaginationSchema()
+
+        page, errors = schema.load({'cursor': ''})
+
+        self.assertEqual(0, len(errors))
+        self.assertEqual('', page.cursor)
+
+    def test_deserialize_without_cursor(self):
+        schema = PaginationSchema()
+
+        page, errors = schema.load({})
+
+        self.assertIsNone(page.cursor)
+
+    def test_deserialize_invalid_cursor(self):
+        schema = PaginationSchema()
+
+        page, errors = schema.load({'cursor': 'job 1!'})
+
+        self.assertEqual({'cursor'}, errors.keys())
+
+    def test_serialize_cursor(self):
+        schema = PaginationSchema()
+        page = Pagination(0, 25, cursor='job-1')
+
+        data, errors = schema.dump(page)
+
+        self.assertEqual(0, len(errors))
+        self.assertEqual({'cursor': 'am9iLTE', 'count': 25}, data)
+
+    def test_cursor_round_trip(self):
+        schema = PaginationSchema()
+
+        data = schema.dump(Pagination(0, 10, cursor='ünïcode/job?')).data
+        page = schema.load(data).data
+
+        self.assertEqual('ünïcode/job?', page.cursor)
+
     def test_serialize_omits_defaults(self):
         schema = PaginationSchema()
         page = Pagination(0, 10, 100)
@@ -763,3 +816,209 @@ class PaginationSchemaTests(unittest.TestCase):
 def _parse_datetime_fields(data, *fields):
     for field in fields:
         data[field] = dateutil.parser.parse(data[field])
+
+
+class JobQuerySchemaTests(unittest.TestCase):
+    def test_deserialize_emptydata(self):
+        schema = JobQuerySchema()
+
+        query, errors = schema.load({})
+
+        self.assertEqual(0, len(errors))
+        self.assertIsInstance(query, JobQuery)
+        self.assertEqual({}, query.criteria)
+        self.assertIsNone(query.sort)
+        self.assertIsNone(query.fields)
+        self.assertFalse(query.filtered)
+
+    def test_deserialize_criteria(self):
+        schema = JobQuerySchema()
+        data = {
+            'taskDefinition': 'foo',
+            'suspended': 'true',
+            'triggerType': 'sqs',
+            'queueName': 'bar',
+            'lastRunSince': '2017-06-14T13:00:00Z',
+            'estimatedNextRunUntil': '2017-06-14T15:00:00+02:00'
+        }
+
+        query, errors = schema.load(data)
+
+        self.assertEqual(0, len(errors))
+        self.assertEqual({
+            'task_definition': 'foo',
+            'suspended': True,
+            'trigger_type': 'sqs',
+            'queue_name': 'bar',
+            'last_run_since': datetime(2017, 6, 14, 13, tzinfo=timezone.utc),
+            'next_run_until': datetime(2017, 6, 14, 13, tzinfo=timezone.utc)
+        }, query.criteria)
+        self.assertTrue(query.filtered)
+
+    def test_deserialize_naive_times_as_utc(self):
+        schema = JobQuerySchema()
+
+        query, errors = schema.load({'lastRunUntil': '2017-06-14T13:00:00'})
+
+        self.assertEqual(0, len(errors))
+        self.assertEqual(timezone.utc, query.criteria['last_run_until'].tzinfo)
+
+    def test_deserialize_sort(self):
+        schema = JobQuerySchema()
+
+        query, errors = schema.load({'sort': '-lastRun'})
+
+        self.assertEqual(0, len(errors))
+        self.assertEqual('-lastRun', query.sort)
+        self.assertTrue(query.filtered)
+
+    def test_deserialize_id_sort_is_not_filtered(self):
+        schema = JobQuerySchema()
+
+        query, errors = schema.load({'sort': 'id'})
+
+        self.assertFalse(query.filtered)
+
+    def test_deserialize_fields(self):
+        schema = JobQuerySchema()
+
+        query, errors = schema.load({'fields': 'taskDefinition, lastRun,,schedule'})
+
+        self.assertEqual(0, len(errors))
+        self.assertEqual(['taskDefinition', 'lastRun', 'schedule'], query.fields)
+        self.assertFalse(query.filtered)
+
+    def test_deserialize_invaliddata_raiseserror(self):
+        schema = JobQuerySchema()
+        data = {'suspended': 'maybe', 'lastRunSince': 'yesterday', 'sort': 'taskCount', 'fields': 'id,parsedSchedule,foo'}
+
+        query, errors = schema.load(data)
+
+        self.assertEqual({'suspended', 'lastRunSince', 'sort', 'fields'}, errors.keys())
+        self.assertEqual(['Unknown job fields: foo, parsedSchedule'], errors['fields'])
+
+
+class CompiledDumpTests(unittest.TestCase):
+    def setUp(self):
+        self._job_data = {
+            'id': 'foo',
+            'taskDefinition': 'foo',
+            'schedule': '0 1',
+            'parsedSchedule': {'second': '0', 'minute': '1'},
+            'scheduleStart': datetime(2017, 6, 14, 13, tzinfo=timezone.utc),
+            'timezone': 'UTC',
+            'taskCount': 3,
+            'maxCount': None,
+            'suspended': False,
+            'trigger': {'type': 'sqs', 'queueName': 'q', 'messagesPerTask': 5},
+            'overrides': [{'containerName': 'c', 'environment': {'A': '1'}}],
+            'lastRun': datetime(2017, 6, 14, 12, tzinfo=timezone.utc),
+            'lastRunTasks': [{'taskId': 't', 'hostId': 'h'}],
+            'estimatedNextRun': datetime(2017, 6, 14, 14),
+            'revision': 4
+        }
+
+    def _link(self, job_id):
+        return {'rel': 'item', 'href': f'/jobs/{job_id}'}
+
+    def test_matches_marshmallow_dump(self):
+        for schema in (JobSchema(), JobCreateSchema(), JobResponseSchema(self._link)):
+            with self.subTest(schema=type(schema).__name__):
+                self.assertEqual(schema.dump(self._job_data).data, schema.dump_data(self._job_data))
+
+    def test_matches_marshmallow_dump_of_unconverted_values(self):
+        schema = JobResponseSchema(self._link)
+        job_data = {'id': 'foo', 'taskCount': '7', 'suspended': 1, 'trigger': None, 'overrides': [None], 'maxCount': 'x'}
+
+        self.assertEqual(schema.dump(job_data).data, schema.dump_data(job_data))
+
+    def test_matches_marshmallow_dump_with_only(self):
+        schema = JobResponseSchema(self._link, only=('id', 'link', 'lastRun', 'trigger'))
+
+        self.assertEqual(schema.dump(self._job_data).data, schema.dump_data(self._job_data))
+
+    def test_strict_schema_raises_serialization_errors(self):
+        schema = JobResponseSchema(self._link, strict=True)
+
+        with self.assertRaises(marshmallow.ValidationError):
+            schema.dump_data({'id': 'foo', 'taskCount': 'x'})
+
+    def test_schema_with_dump_processors_uses_marshmallow(self):
+        schema = PaginationSchema()
+        dump = compile_dump(schema)
+
+        self.assertEqual({'skip': 20, 'count': 5}, dump(Pagination(20, 5, 100)))
+
+
+class LoadedFieldsTests(unittest.TestCase):
+    def test_matches_marshmallow_load(self):
+        cases = [
+            {},
+            {'b': 2},
+            {'taskCount': 4, 'schedule': '* *', 'b': 2},
+            {'schedule': ''},
+            {'taskCount': 'x', 'suspended': None},
+            {'timezone': 'Nope/Zone', 'lastRun': 'x', 'id': 3}
+        ]
+        for schema in (JobSchema(), JobCreateSchema()):
+            for data in cases:
+                with self.subTest(schema=type(schema).__name__, data=data):
+                    loaded, errors = schema.load(dict(data))
+
+                    self.assertEqual(loaded.keys() | errors.keys(), schema.loaded_fields(dict(data)))
+
+
+class JobBatchSchemaTests(unittest.TestCase):
+    def setUp(self):
+        self._schema = JobBatchSchema()
+
+    def test_load_operations(self):
+        data = {'operations': [
+            {'action': 'create', 'job': {'taskDefinition': 'foo', 'schedule': '*'}},
+            {'action': 'update', 'id': 'bar', 'job': {'taskCount': 4}, 'revision': 3},
+            {'action': 'delete', 'id': 'baz'}
+        ]}
+
+        result, errors = self._schema.load(data)
+
+        self.assertEqual({}, errors)
+        self.assertEqual([
+            StoreOperation.create(None, {'taskDefinition': 'foo', 'schedule': '*'}),
+            StoreOperation.update('bar', {'taskCount': 4}, 3),
+            StoreOperation.delete('baz')
+        ], result['operations'])
+
+    def test_load_requires_operations(self):
+        for data in ({}, {'operations': []}, {'operations': 'foo'}):
+            with self.subTest(data=data):
+                result, errors = self._schema.load(data)
+
+                self.assertIn('operations', errors)
+
+    def test_load_limits_operation_count(self):
+        result, errors = self._schema.load({'operations': [{'action': 'delete', 'id': 'foo'}] * 1001})
+
+        self.assertEqual({'operations': ['Length must be between 1 and 1000.']}, errors)
+
+    def test_load_reports_errors_per_operation(self):
+        data = {'operations': [
+            {'action': 'delete', 'id': 'foo'},
+            {'action': 'rename', 'id': 'foo'},
+            {'action': 'create'},
+            {'action': 'create', 'id': 'foo', 'job': {}},
+            {'action': 'update', 'job': {}},
+            {'action': 'update', 'id': 'foo'},
+            {'action': 'delete'},
+            'foo'
+        ]}
+
+        result, errors = self._schema.load(data)
+
+        self.assertEqual(['Not a valid choice.'], errors['operations'][1]['action'])
+        self.assertEqual(['create operations require job fields'], errors['operations'][2]['job'])
+        self.assertEqual(['create operations take the job id from the job taskDefinition'], errors['operations'][3]['id'])
+        self.assertEqual(['update operations require a job id'], errors['operations'][4]['id'])
+        self.assertEqual(['update operations require job fields'], errors['operations'][5]['job'])
+        self.assertEqual(['delete operations require a job id'], errors['operations'][6]['id'])
+        self.assertIn(7, errors['operations'])
+        self.assertNotIn(0, errors['operations'])
@@ -0,0 +1,126 @@
+import unittest
+import os
+import tempfile
+from unittest.mock import patch, Mock
+
+from ecs_scheduler.warmstart import resolve, WarmStartCache
+
+
+class ResolveTests(unittest.TestCase):
+    @patch.dict(os.environ, clear=True)
+    def test_resolve_returns_none_if_not_configured(self):
+        self.assertIsNone(resolve())
+
+    @patch('ecs_scheduler.warmstart.WarmStartCache')
+    @patch.dict(os.environ, {'ECSS_WARM_START_FILE': '/var/cache/ecss-jobs.bin'}, clear=True)
+    def test_resolve_creates_cache(self, cache):
+        result = resolve()
+
+        self.assertIs(cache.return_value, result)
+        cache.assert_called_with('/var/cache/ecss-jobs.bin')
+
+
+class WarmStartCacheTests(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self._path = os.path.join(tmp.name, 'jobs.bin')
+        self._target = WarmStartCache(self._path)
+        self._validate = Mock(side_effect=lambda d: {**d, 'validated': True})
+
+    def test_full_load_without_snapshot(self):
+        store = Mock(spec=['load_all'])
+        store.load_all.return_value = [{'id': 'foo', 'a': 1}, {'id': 'bar', 'b': 2}]
+
+        results = self._target.load_jobs(store, self._validate)
+
+        self.assertEqual({
+            'foo': {'id': 'foo', 'a': 1, 'validated': True},
+            'bar': {'id': 'bar', 'b': 2, 'validated': True}
+        }, results)
+        self.assertEqual(2, self._validate.call_count)
+        self.assertTrue(os.path.exists(self._path))
+
+    def test_full_load_skips_validation_of_unchanged_jobs(self):
+        store = Mock(spec=['load_all'])
+        store.load_all.return_value = [{'id': 'foo', 'a': 1}, {'id': 'bar', 'b': 2}]
+        self._target.load_jobs(store, self._validate)
+        self._validate.reset_mock()
+        store.load_all.return_value = [{'id': 'foo', 'a': 1}, {'id': 'bar', 'b': 3}]
+
+        results = self._target.load_jobs(store, self._validate)
+
+        self._validate.assert_called_once_with({'id': 'bar', 'b': 3})
+        self.assertEqual({'id': 'foo', 'a': 1, 'validated': True}, results['foo'])
+        self.assertEqual({'id': 'bar', 'b': 3, 'validated': True}, results['bar'])
+
+    def test_incremental_load_applies_changes(self):
+        store = Mock(spec=['load_all', 'load_changes'])
+        store.load_changes.return_value = iter([{'id': 'foo', 'a': 1}, {'id': 'bar', 'b': 2}]), [], 'wm1'
+        self._target.load_jobs(store, self._validate)
+        store.load_changes.return_value = iter([{'id': 'baz', 'c': 3}]), ['bar'], 'wm2'
+
+        results = self._target.load_jobs(store, self._validate)
+
+        store.load_changes.assert_called_with('wm1')
+        store.load_all.assert_not_called()
+        self.assertEqual({
+            'foo': {'id': 'foo', 'a': 1, 'validated': True},
+            'baz': {'id': 'baz', 'c': 3, 'validated': True}
+        }, results)
+
+    def test_incremental_load_falls_back_if_watermark_rejected(self):
+        store = Mock(spec=['load_all', 'load_changes'])
+        store.load_changes.return_value = iter([{'id': 'foo', 'a': 1}]), [], 'wm1'
+        self._target.load_jobs(store, self._validate)
+        store.load_changes.side_effect = [None, (iter([{'id': 'bar', 'b': 2}]), [], 'wm2')]
+
+        results = self._target.load_jobs(store, self._validate)
+
+        self.assertEqual(['wm1', None], [c[0][0] for c in store.load_changes.call_args_list[-2:]])
+        self.assertEqual({'bar': {'id': 'bar', 'b': 2, 'validated': True}}, results)
+
+    def test_snapshot_without_watermark_is_not_used_as_base(self):
+        store = Mock(spec=['load_all'])
+        store.load_all.return_value = [{'id': 'foo', 'a': 1}, {'id': 'bar', 'b': 2}]
+        self._target.load_jobs(store, self._validate)
+        self._validate.reset_mock()
+        store = Mock(spec=['load_all', 'load_changes'])
+        store.load_changes.return_value = iter([{'id': 'foo', 'a': 1}]), [], 'wm1'
+
+        results = self._target.load_jobs(store, self._validate)
+
+        store.load_changes.assert_called_once_with(None)
+        self._validate.assert_not_called()
+        self.assertEqual({'foo': {'id': 'foo', 'a': 1, 'validated': True}}, results)
+
+    def test_ignores_corrupt_snapshot(self):
+        with open(self._path, 'wb') as f:
+            f.write(b'not a snapshot')
+        store = Mock(spec=['load_all', 'load_changes'])
+        store.load_changes.return_value = iter([{'id': 'foo', 'a': 1}]), [], 'wm1'
+
+        results = self._target.load_jobs(store, self._validate)
+
+        store.load_changes.assert_called_once_with(None)
+        self.assertEqual(['foo'], list(results))
+
+    def test_skips_records_rejected_by_validate(self):
+        store = Mock(spec=['load_all'])
+        store.load_all.return_value = [{'id': 'foo', 'a': 1}, {'id': 'bar', 'b': 2}]
+        self._validate.side_effect = lambda d: None if d['id'] == 'bar' else d
+
+        results = self._target.load_jobs(store, self._validate)
+        reloaded = self._target.load_jobs(store, self._validate)
+
+        self.assertEqual(['foo'], list(results))
+        self.assertEqual(['foo'], list(reloaded))
+        self.assertEqual(3, self._validate.call_count)
+
+    def test_validation_error_is_raised(self):
+        store = Mock(spec=['load_all'])
+        store.load_all.return_value = [{'id': 'foo', 'a': 1}]
+        self._validate.side_effect = ValueError
+
+        with self.assertRaises(ValueError):
+            self._target.load_jobs(store, self._validate)
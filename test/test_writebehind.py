@@ -0,0 +1,229 @@
+import unittest
+import os
+import threading
+from unittest.mock import patch, Mock
+
+from ecs_scheduler.persistence import StoreOperation
+from ecs_scheduler.writebehind import resolve, WriteBehindStore
+
+
+class ResolveTests(unittest.TestCase):
+    @patch.dict(os.environ, clear=True)
+    def test_resolve_returns_store_if_not_configured(self):
+        store = Mock()
+
+        result = resolve(store)
+
+        self.assertIs(store, result)
+
+    @patch('ecs_scheduler.writebehind.WriteBehindStore')
+    @patch.dict(os.environ, {'ECSS_WRITE_BEHIND_INTERVAL': '0.05'}, clear=True)
+    def test_resolve_wraps_store(self, wb):
+        store = Mock()
+
+        result = resolve(store)
+
+        self.assertIs(wb.return_value, result)
+        wb.assert_called_with(store, flush_interval=0.05, batch_size=100, queue_size=1000)
+
+    @patch('ecs_scheduler.writebehind.WriteBehindStore')
+    @patch.dict(os.environ, {
+        'ECSS_WRITE_BEHIND_INTERVAL': '1',
+        'ECSS_WRITE_BEHIND_BATCH_SIZE': '25',
+        'ECSS_WRITE_BEHIND_QUEUE_SIZE': '50'
+    }, clear=True)
+    def test_resolve_wraps_store_with_sizes(self, wb):
+        store = Mock()
+
+        result = resolve(store)
+
+        self.assertIs(wb.return_value, result)
+        wb.assert_called_with(store, flush_interval=1.0, batch_size=25, queue_size=50)
+
+
+class WriteBehindStoreTests(unittest.TestCase):
+    def setUp(self):
+        self._store = Mock()
+        self._store.bulk_write.side_effect = lambda ops: [None] * len(ops)
+        self._target = WriteBehindStore(self._store, flush_interval=0.01)
+        self.addCleanup(self._target.close)
+
+    def test_load_all_reads_wrapped_store(self):
+        self._store.load_all.return_value = iter([{'id': 'foo'}])
+
+        self.assertEqual([{'id': 'foo'}], list(self._target.load_all()))
+
+    def test_delegates_other_store_attributes(self):
+        self.assertIs(self._store.load_changes, self._target.load_changes)
+
+    def test_create_is_flushed_before_returning(self):
+        self._store.bulk_write.side_effect = lambda ops: [1] * len(ops)
+
+        result = self._target.create('foo', {'a': 1})
+
+        self.assertEqual(1, result)
+        self._store.bulk_write.assert_called_with([StoreOperation.create('foo', {'a': 1})])
+        self.assertEqual(0, self._target.depth())
+
+    def test_update_is_flushed_before_returning(self):
+        self._target.update('foo', {'a': 1})
+
+        self._store.bulk_write.assert_called_with([StoreOperation.update('foo', {'a': 1})])
+
+    def test_update_with_revision_returns_new_revision(self):
+        self._store.bulk_write.side_effect = lambda ops: [4] * len(ops)
+
+        result = self._target.update('foo', {'a': 1}, revision=3)
+
+        self.assertEqual(4, result)
+        self._store.bulk_write.assert_called_with([StoreOperation.update('foo', {'a': 1}, 3)])
+
+    def test_delete_is_flushed_before_returning(self):
+        self._target.delete('foo')
+
+        self._store.bulk_write.assert_called_with([StoreOperation.delete('foo')])
+
+    def test_write_raises_item_error(self):
+        self._store.bulk_write.side_effect = lambda ops: [LookupError('foo')] * len(ops)
+
+        with self.assertRaises(LookupError):
+            self._target.update('foo', {'a': 1})
+
+    def test_write_raises_batch_error(self):
+        self._store.bulk_write.side_effect = RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            self._target.delete('foo')
+
+    def test_bulk_write_returns_item_errors(self):
+        error = LookupError('bar')
+        self._store.bulk_write.side_effect = lambda ops: [None if op.job_id == 'foo' else error for op in ops]
+
+        results = self._target.bulk_write([StoreOperation.create('foo', {'a': 1}), StoreOperation.delete('bar')])
+
+        self.assertEqual([None, error], results)
+
+    def test_falls_back_to_single_writes(self):
+        store = Mock(spec=['load_all', 'create', 'update', 'delete'])
+        store.create.return_value = 1
+        store.update.side_effect = [LookupError, 3]
+        store.delete.return_value = None
+        target = WriteBehindStore(store, flush_interval=0.01)
+        self.addCleanup(target.close)
+
+        results = target.bulk_write([
+            StoreOperation.create('foo', {'a': 1}),
+            StoreOperation.update('bar', {'b': 2}),
+            StoreOperation.update('bort', {'c': 3}, revision=2),
+            StoreOperation.delete('baz', revision=4)
+        ])
+
+        store.create.assert_called_with('foo', {'a': 1})
+        store.update.assert_any_call('bar', {'b': 2}, revision=None)
+        store.update.assert_called_with('bort', {'c': 3}, revision=2)
+        store.delete.assert_called_with('baz', revision=4)
+        self.assertEqual(1, results[0])
+        self.assertIsInstance(results[1], LookupError)
+        self.assertEqual(3, results[2])
+        self.assertIsNone(results[3])
+
+    def test_close_rejects_new_writes(self):
+        self._target.close()
+
+        with self.assertRaises(RuntimeError):
+            self._target.create('foo', {'a': 1})
+
+
+class WriteBehindBatchingTests(unittest.TestCase):
+    def setUp(self):
+        self._store = Mock()
+        self._store.bulk_write.side_effect = lambda ops: [None] * len(ops)
+        # NOTE: long interval so the batch only flushes when full or closed
+        self._target = WriteBehindStore(self._store, flush_interval=60, batch_size=3)
+
+    def _write_in_background(self, *ops):
+        threads = [threading.Thread(target=f, args=args) for f, *args in ops]
+        for t in threads:
+            t.start()
+        return threads
+
+    def _wait_for_depth(self, depth):
+        for _ in range(1000):
+            if self._target.depth() == depth:
+                return
+            threading.Event().wait(0.001)
+        self.fail(f'Queue never reached depth {depth}')
+
+    def test_flushes_full_batch(self):
+        threads = self._write_in_background(
+            (self._target.create, 'foo', {'a': 1}),
+            (self._target.create, 'bar', {'b': 2}),
+            (self._target.create, 'baz', {'c': 3}))
+        for t in threads:
+            t.join()
+        self._target.close()
+
+        self._store.bulk_write.assert_called_once()
+        self.assertCountEqual([
+            StoreOperation.create('foo', {'a': 1}),
+            StoreOperation.create('bar', {'b': 2}),
+            StoreOperation.create('baz', {'c': 3})
+        ], self._store.bulk_write.call_args[0][0])
+
+    def test_coalesces_updates(self):
+        threads = self._write_in_background((self._target.update, 'foo', {'a': 1, 'b': 1}))
+        self._wait_for_depth(1)
+        threads += self._write_in_background((self._target.update, 'foo', {'b': 2}))
+        self._wait_for_depth(1)
+        self._target.close()
+        for t in threads:
+            t.join()
+
+        self._store.bulk_write.assert_called_once_with([StoreOperation.update('foo', {'a': 1, 'b': 2})])
+
+    def test_coalesces_update_into_create(self):
+        threads = self._write_in_background((self._target.create, 'foo', {'a': 1}))
+        self._wait_for_depth(1)
+        threads += self._write_in_background((self._target.update, 'foo', {'b': 2}))
+        self._wait_for_depth(1)
+        self._target.close()
+        for t in threads:
+            t.join()
+
+        self._store.bulk_write.assert_called_once_with([StoreOperation.create('foo', {'a': 1, 'b': 2})])
+
+    def test_does_not_coalesce_delete_into_update(self):
+        self._store.bulk_write.side_effect = lambda ops: [5 if op.action == StoreOperation.UPDATE else None for op in ops]
+        results = []
+        threads = self._write_in_background((lambda: results.append(self._target.update('foo', {'a': 1})),))
+        self._wait_for_depth(1)
+        threads += self._write_in_background((self._target.delete, 'foo'))
+        self._wait_for_depth(2)
+        self._target.close()
+        for t in threads:
+            t.join()
+
+        self._store.bulk_write.assert_called_once_with([StoreOperation.update('foo', {'a': 1}), StoreOperation.delete('foo')])
+        self.assertEqual([5], results)
+
+    def test_does_not_coalesce_create_after_delete(self):
+        threads = self._write_in_background((self._target.delete, 'foo'))
+        self._wait_for_depth(1)
+        threads += self._write_in_background((self._target.create, 'foo', {'a': 1}))
+        self._wait_for_depth(2)
+        self._target.close()
+        for t in threads:
+            t.join()
+
+        self._store.bulk_write.assert_called_once_with([StoreOperation.delete('foo'), StoreOperation.create('foo', {'a': 1})])
+
+    def test_does_not_coalesce_conditional_updates(self):
+        threads = self._write_in_background((self._target.update, 'foo', {'a': 1}))
+        self._wait_for_depth(1)
+        threads += self._write_in_background((self._target.update, 'foo', {'b': 2}, 1))
+        self._wait_for_depth(2)
+        self._target.close()
+        for t in threads:
+            t.join()
+
+        self._store.bulk_write.assert_called_once_with([StoreOperation.update('foo', {'a': 1}), StoreOperation.update('foo', {'b': 2}, 1)])
@@ -0,0 +1,103 @@
+import unittest
+from unittest.mock import patch, Mock
+
+from ecs_scheduler.webapi.cache import ResponseCache, resolve
+
+
+class ResolveTests(unittest.TestCase):
+    @patch('ecs_scheduler.env.get_var', return_value=None)
+    def test_uses_default_size(self, get_var):
+        cache = resolve()
+
+        get_var.assert_called_with('RESPONSE_CACHE_SIZE')
+        self.assertEqual(10000, cache.stats()['maxSize'])
+
+    @patch('ecs_scheduler.env.get_var', return_value='25')
+    def test_uses_env_size(self, get_var):
+        cache = resolve()
+
+        self.assertEqual(25, cache.stats()['maxSize'])
+
+
+class ResponseCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._render = Mock(side_effect=lambda job: {'id': job.id, 'version': job.version})
+        self._target = ResponseCache(2)
+
+    def test_get_renders_on_miss(self):
+        job = Mock(id='foo', version=1)
+
+        response = self._target.get(job, self._render)
+
+        self.assertEqual({'id': 'foo', 'version': 1}, response)
+        self._render.assert_called_once_with(job)
+        stats = self._target.stats()
+        self.assertEqual(0, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+        self.assertEqual(1, stats['size'])
+        self.assertGreater(stats['bytes'], 0)
+
+    def test_get_reuses_response_for_same_version(self):
+        job = Mock(id='foo', version=1)
+
+        first = self._target.get(job, self._render)
+        second = self._target.get(job, self._render)
+
+        self.assertIs(first, second)
+        self._render.assert_called_once_with(job)
+        self.assertEqual(0.5, self._target.stats()['hitRate'])
+
+    def test_get_renders_again_for_new_version(self):
+        job = Mock(id='foo', version=1)
+        self._target.get(job, self._render)
+        bytes_before = self._target.stats()['bytes']
+        job.version = 2
+
+        response = self._target.get(job, self._render)
+
+        self.assertEqual({'id': 'foo', 'version': 2}, response)
+        self.assertEqual(2, self._render.call_count)
+        stats = self._target.stats()
+        self.assertEqual(1, stats['size'])
+        self.assertEqual(bytes_before, stats['bytes'])
+
+    def test_get_evicts_least_recently_used(self):
+        foo, bar, baz = Mock(id='foo', version=1), Mock(id='bar', version=2), Mock(id='baz', version=3)
+        self._target.get(foo, self._render)
+        self._target.get(bar, self._render)
+        self._target.get(foo, self._render)
+
+        self._target.get(baz, self._render)
+        self._target.get(foo, self._render)
+        self._target.get(bar, self._render)
+
+        stats = self._target.stats()
+        self.assertEqual(2, stats['hits'])
+        self.assertEqual(4, stats['misses'])
+        self.assertEqual(2, stats['size'])
+
+    def test_get_does_not_cache_if_disabled(self):
+        target = ResponseCache(0)
+        job = Mock(id='foo', version=1)
+
+        target.get(job, self._render)
+        target.get(job, self._render)
+
+        self.assertEqual(2, self._render.call_count)
+        self.assertEqual({'hits': 0, 'misses': 2, 'hitRate': 0.0, 'size': 0, 'maxSize': 0, 'bytes': 0}, target.stats())
+
+    def test_discard(self):
+        job = Mock(id='foo', version=1)
+        self._target.get(job, self._render)
+
+        self._target.discard('foo')
+        self._target.discard('bar')
+
+        stats = self._target.stats()
+        self.assertEqual(0, stats['size'])
+        self.assertEqual(0, stats['bytes'])
+        self._target.get(job, self._render)
+        self.assertEqual(2, self._render.call_count)
+
+    def test_stats_with_no_lookups(self):
+        self.assertEqual({'hits': 0, 'misses': 0, 'hitRate': 0.0, 'size': 0, 'maxSize': 2, 'bytes': 0}, self._target.stats())
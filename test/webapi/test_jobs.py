@@ -1,12 +1,18 @@
+import json
 import unittest
 import logging
-from unittest.mock import patch, Mock
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, Mock, PropertyMock
 
 import werkzeug.exceptions
+from werkzeug.datastructures import ETags
 
 import ecs_scheduler.models
-from ecs_scheduler.webapi.jobs import Jobs, Job, require_json_content_type
-from ecs_scheduler.datacontext import JobAlreadyExists, JobNotFound, InvalidJobData
+from ecs_scheduler.webapi.jobs import Jobs, Job, JobsBatch, require_json_content_type
+from ecs_scheduler.webapi.cache import ResponseCache
+from ecs_scheduler.persistence import StoreOperation
+from ecs_scheduler.datacontext import JobAlreadyExists, JobNotFound, JobConflict, InvalidJobData, \
+                                        JobPersistenceError
 
 
 @patch('flask.request')
@@ -46,12 +52,19 @@ class RequireJsonContentTypeTests(unittest.TestCase):
         self.assertEqual(({'message': 'Header Content-Type: application/json required to send a request body.'}, 415), result)
 
 
+def _invalid_job(job_id):
+    job = Mock(id=job_id, revision=1, version=1)
+    error = InvalidJobData(job_id, {'schedule': ['Invalid schedule syntax']})
+    type(job).data = PropertyMock(side_effect=error)
+    return job
+
+
 @patch('flask.url_for', side_effect=lambda *args, **kwargs: 'foo/' + args[0] + '/' + kwargs['job_id'] if 'job_id' in kwargs else 'pageLink')
-@patch('flask.request')
+@patch('flask.request', if_none_match=ETags(), if_match=ETags())
 class JobsTests(unittest.TestCase):
     def setUp(self):
         self._queue = Mock()
-        self._dc = Mock()
+        self._dc = Mock(revision=7)
         self._jobs = Jobs(self._queue, self._dc)
 
     def test_expected_verbs_are_decorated(self, fake_request, fake_url):
@@ -60,10 +73,12 @@ class JobsTests(unittest.TestCase):
 
     def test_get_returns_all_jobs(self, fake_request, fake_url):
         fake_request.values = {}
-        self._dc.get_all.return_value = [Mock(id='1', data={'id': '1'}), Mock(id='2', data={'id': '2'}), Mock(id='3', data={'id': '3'})]
+        self._dc.get_page.return_value = [Mock(id='1', data={'id': '1'}), Mock(id='2', data={'id': '2'}), Mock(id='3', data={'id': '3'})]
         self._dc.total.return_value = 10
 
-        response = self._jobs.get()
+        response, _, _ = self._jobs.get()
+
+        self._dc.get_page.assert_called_with(10, skip=0, after=None)
 
         self.assertEqual({
             'jobs': [
@@ -75,11 +90,12 @@ class JobsTests(unittest.TestCase):
 
     def test_get_returns_paginated_jobs(self, fake_request, fake_url):
         fake_request.values = {'skip': 1, 'count': 2}
-        self._dc.get_all.return_value = [Mock(id='1', data={'id': '1'}), Mock(id='2', data={'id': '2'}), Mock(id='3', data={'id': '3'}), Mock(id='4', data={'id': '4'})]
+        self._dc.get_page.return_value = [Mock(id='2', data={'id': '2'}), Mock(id='3', data={'id': '3'})]
         self._dc.total.return_value = 10
 
-        response = self._jobs.get()
+        response, _, _ = self._jobs.get()
 
+        self._dc.get_page.assert_called_with(2, skip=1, after=None)
         self.assertEqual({
             'jobs': [
                 {'id': '2', 'link': {'href': 'foo/job/2', 'rel': 'item', 'title': 'Job for 2'}},
@@ -91,13 +107,261 @@ class JobsTests(unittest.TestCase):
 
     def test_get_returns_no_jobs(self, fake_request, fake_url):
         fake_request.values = {'skip': 4, 'count': 12}
-        self._dc.get_all.return_value = []
+        self._dc.get_page.return_value = []
         self._dc.total.return_value = 0
 
-        response = self._jobs.get()
+        response, _, _ = self._jobs.get()
 
         self.assertEqual({'jobs': []}, response)
 
+    def test_get_returns_first_cursor_page(self, fake_request, fake_url):
+        fake_request.values = {'cursor': '', 'count': 2}
+        self._dc.get_page.return_value = [Mock(id='1', data={'id': '1'}), Mock(id='2', data={'id': '2'}), Mock(id='3', data={'id': '3'})]
+
+        response, _, _ = self._jobs.get()
+
+        self._dc.get_page.assert_called_with(3, skip=0, after='')
+        fake_url.assert_called_with('jobs', cursor='Mg', count=2)
+        self.assertEqual({
+            'jobs': [
+                {'id': '1', 'link': {'href': 'foo/job/1', 'rel': 'item', 'title': 'Job for 1'}},
+                {'id': '2', 'link': {'href': 'foo/job/2', 'rel': 'item', 'title': 'Job for 2'}}
+            ],
+            'next': 'pageLink'
+        }, response)
+        self._dc.total.assert_not_called()
+
+    def test_get_returns_page_after_cursor(self, fake_request, fake_url):
+        fake_request.values = {'cursor': 'Mg', 'count': 2}
+        self._dc.get_page.return_value = [Mock(id='3', data={'id': '3'}), Mock(id='4', data={'id': '4'}), Mock(id='5', data={'id': '5'})]
+
+        response, _, _ = self._jobs.get()
+
+        self._dc.get_page.assert_called_with(3, skip=0, after='2')
+        fake_url.assert_called_with('jobs', cursor='NA', count=2)
+        self.assertEqual('pageLink', response['next'])
+        self.assertEqual(['3', '4'], [j['id'] for j in response['jobs']])
+
+    def test_get_returns_last_cursor_page_without_next(self, fake_request, fake_url):
+        fake_request.values = {'cursor': 'NA', 'count': 2}
+        self._dc.get_page.return_value = [Mock(id='5', data={'id': '5'})]
+
+        response, _, _ = self._jobs.get()
+
+        self.assertEqual({
+            'jobs': [
+                {'id': '5', 'link': {'href': 'foo/job/5', 'rel': 'item', 'title': 'Job for 5'}}
+            ]
+        }, response)
+
+    def test_get_rejects_invalid_cursor(self, fake_request, fake_url):
+        fake_request.values = {'cursor': '!!'}
+
+        with self.assertRaises(werkzeug.exceptions.BadRequest):
+            self._jobs.get()
+
+        self._dc.get_page.assert_not_called()
+
+    def test_get_returns_filtered_jobs(self, fake_request, fake_url):
+        fake_request.values = {'taskDefinition': 'foo', 'suspended': 'false', 'count': 1}
+        self._dc.find.return_value = [Mock(id='1', data={'id': '1'}), Mock(id='2', data={'id': '2'})]
+
+        response, _, _ = self._jobs.get()
+
+        self._dc.find.assert_called_with(task_definition='foo', suspended=False)
+        self._dc.get_page.assert_not_called()
+        fake_url.assert_called_with('jobs', taskDefinition='foo', suspended='false', skip=1, count=1)
+        self.assertEqual({
+            'jobs': [
+                {'id': '1', 'link': {'href': 'foo/job/1', 'rel': 'item', 'title': 'Job for 1'}}
+            ],
+            'next': 'pageLink'
+        }, response)
+
+    def test_get_returns_sorted_jobs(self, fake_request, fake_url):
+        now = datetime.now(timezone.utc)
+        fake_request.values = {'sort': '-lastRun'}
+        self._dc.find.return_value = [
+            Mock(id='1', data={'id': '1', 'lastRun': now}),
+            Mock(id='2', data={'id': '2'}),
+            Mock(id='3', data={'id': '3', 'lastRun': now + timedelta(minutes=1)}),
+            Mock(id='4', data={'id': '4', 'lastRun': now})
+        ]
+
+        response, _, _ = self._jobs.get()
+
+        self._dc.find.assert_called_with()
+        self.assertEqual(['3', '1', '4', '2'], [j['id'] for j in response['jobs']])
+
+    @patch.object(logging.getLogger('ecs_scheduler.webapi.jobs'), 'warning')
+    def test_get_lists_invalid_stored_jobs_with_errors(self, fake_log, fake_request, fake_url):
+        fake_request.values = {}
+        self._dc.get_page.return_value = [Mock(id='1', data={'id': '1'}), _invalid_job('2'), Mock(id='3', data={'id': '3'})]
+        self._dc.total.return_value = 3
+
+        response, status, _ = self._jobs.get()
+
+        self.assertEqual(200, status)
+        self.assertEqual({
+            'id': '2',
+            'link': {'href': 'foo/job/2', 'rel': 'item', 'title': 'Job for 2'},
+            'errors': {'schedule': ['Invalid schedule syntax']}
+        }, response['jobs'][1])
+        self.assertEqual(['1', '2', '3'], [j['id'] for j in response['jobs']])
+        fake_log.assert_called()
+
+    @patch.object(logging.getLogger('ecs_scheduler.webapi.jobs'), 'warning')
+    def test_get_sorts_invalid_stored_jobs_last(self, fake_log, fake_request, fake_url):
+        fake_request.values = {'sort': '-taskDefinition', 'fields': 'taskDefinition'}
+        self._dc.find.return_value = [
+            _invalid_job('1'),
+            Mock(id='2', data={'id': '2', 'taskDefinition': 'a'}),
+            Mock(id='3', data={'id': '3', 'taskDefinition': 'b'})
+        ]
+
+        response, _, _ = self._jobs.get()
+
+        self.assertEqual(['3', '2', '1'], [j['id'] for j in response['jobs']])
+        self.assertIn('errors', response['jobs'][2])
+
+    def test_get_returns_filtered_jobs_after_cursor(self, fake_request, fake_url):
+        fake_request.values = {'triggerType': 'sqs', 'cursor': 'Mg', 'count': 1}
+        self._dc.find.return_value = [Mock(id=str(i), data={'id': str(i)}) for i in range(1, 6)]
+
+        response, _, _ = self._jobs.get()
+
+        fake_url.assert_called_with('jobs', triggerType='sqs', cursor='Mw', count=1)
+        self.assertEqual(['3'], [j['id'] for j in response['jobs']])
+        self.assertEqual('pageLink', response['next'])
+
+    def test_get_rejects_cursor_with_sort(self, fake_request, fake_url):
+        fake_request.values = {'sort': 'lastRun', 'cursor': ''}
+
+        with self.assertRaises(werkzeug.exceptions.BadRequest):
+            self._jobs.get()
+
+    def test_get_returns_projected_fields(self, fake_request, fake_url):
+        fake_request.values = {'fields': 'taskDefinition'}
+        self._dc.get_page.return_value = [Mock(id='1', data={'id': '1', 'taskDefinition': 'foo', 'schedule': '0', 'taskCount': 1})]
+        self._dc.total.return_value = 1
+
+        response, _, _ = self._jobs.get()
+
+        self.assertEqual({
+            'jobs': [
+                {'id': '1', 'taskDefinition': 'foo', 'link': {'href': 'foo/job/1', 'rel': 'item', 'title': 'Job for 1'}}
+            ]
+        }, response)
+
+    def test_get_reuses_cached_job_responses(self, fake_request, fake_url):
+        jobs = Jobs(self._queue, self._dc, ResponseCache(10))
+        fake_request.values = {}
+        self._dc.get_page.return_value = [Mock(id='1', version=1, data={'id': '1', 'taskDefinition': 'foo'})]
+        self._dc.total.return_value = 1
+        jobs.get()
+        fake_request.values = {'fields': 'taskDefinition'}
+
+        response, _, _ = jobs.get()
+
+        self.assertEqual(1, fake_url.call_count)
+        self.assertEqual({
+            'jobs': [
+                {'id': '1', 'taskDefinition': 'foo', 'link': {'href': 'foo/job/1', 'rel': 'item', 'title': 'Job for 1'}}
+            ]
+        }, response)
+
+    def test_get_returns_job_set_etag(self, fake_request, fake_url):
+        fake_request.values = {}
+        self._dc.get_page.return_value = []
+        self._dc.total.return_value = 0
+
+        response, status, headers = self._jobs.get()
+
+        self.assertEqual(200, status)
+        self.assertRegex(headers['ETag'], r'^"7\.\w+\.json"$')
+        self.assertEqual('Accept', headers['Vary'])
+
+    def test_get_returns_not_modified_if_etag_matches(self, fake_request, fake_url):
+        fake_request.values = {}
+        self._dc.get_page.return_value = []
+        self._dc.total.return_value = 0
+        etag = self._jobs.get()[2]['ETag']
+        fake_request.if_none_match = ETags([etag.strip('"')])
+        self._dc.get_page.reset_mock()
+
+        response, status, headers = self._jobs.get()
+
+        self.assertEqual(304, status)
+        self.assertEqual(etag, headers['ETag'])
+        self.assertEqual('Accept', headers['Vary'])
+        self._dc.get_page.assert_not_called()
+
+    @patch('flask.stream_with_context', side_effect=lambda g: g)
+    def test_get_streams_jobs_if_etag_matches_json_list(self, fake_stream, fake_request, fake_url):
+        fake_request.values = {}
+        self._dc.get_page.return_value = []
+        self._dc.total.return_value = 0
+        etag = self._jobs.get()[2]['ETag']
+        fake_request.if_none_match = ETags([etag.strip('"')])
+        fake_request.accept_mimetypes.best_match.return_value = 'application/x-ndjson'
+        self._dc.iter_page.return_value = iter([])
+
+        response = self._jobs.get()
+
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response.headers['ETag'])
+
+    def test_get_returns_jobs_if_job_set_changed(self, fake_request, fake_url):
+        fake_request.values = {}
+        self._dc.get_page.return_value = []
+        self._dc.total.return_value = 0
+        etag = self._jobs.get()[2]['ETag']
+        fake_request.if_none_match = ETags([etag.strip('"')])
+        self._dc.revision = 8
+
+        response, status, headers = self._jobs.get()
+
+        self.assertEqual(200, status)
+        self.assertNotEqual(etag, headers['ETag'])
+
+    @patch('flask.stream_with_context', side_effect=lambda g: g)
+    def test_get_streams_all_jobs_if_ndjson_accepted(self, fake_stream, fake_request, fake_url):
+        fake_request.values = {}
+        fake_request.accept_mimetypes.best_match.return_value = 'application/x-ndjson'
+        self._dc.iter_page.return_value = iter([Mock(id='1', data={'id': '1'}), Mock(id='2', data={'id': '2'})])
+
+        response = self._jobs.get()
+
+        fake_request.accept_mimetypes.best_match.assert_called_with(['application/json', 'application/x-ndjson'])
+        self._dc.iter_page.assert_called_with(None, skip=0, after=None)
+        self._dc.get_page.assert_not_called()
+        self.assertEqual('application/x-ndjson', response.mimetype)
+        self.assertRegex(response.headers['ETag'], r'^"7\.\w+\.x-ndjson"$')
+        self.assertEqual('Accept', response.headers['Vary'])
+        self.assertEqual([
+            {'id': '1', 'link': {'href': 'foo/job/1', 'rel': 'item', 'title': 'Job for 1'}},
+            {'id': '2', 'link': {'href': 'foo/job/2', 'rel': 'item', 'title': 'Job for 2'}}
+        ], [json.loads(line) for line in response.get_data(as_text=True).splitlines()])
+
+    @patch('flask.stream_with_context', side_effect=lambda g: g)
+    def test_get_streams_filtered_jobs(self, fake_stream, fake_request, fake_url):
+        fake_request.values = {'skip': 1, 'count': 1, 'taskDefinition': 'foo', 'fields': 'taskDefinition'}
+        fake_request.accept_mimetypes.best_match.return_value = 'application/x-ndjson'
+        self._dc.find.return_value = [Mock(id=str(i), data={'id': str(i), 'taskDefinition': 'foo', 'taskCount': 1}) for i in range(3)]
+
+        response = self._jobs.get()
+
+        self._dc.find.assert_called_with(task_definition='foo')
+        self.assertEqual([
+            {'id': '1', 'taskDefinition': 'foo', 'link': {'href': 'foo/job/1', 'rel': 'item', 'title': 'Job for 1'}}
+        ], [json.loads(line) for line in response.get_data(as_text=True).splitlines()])
+
+    def test_get_returns_bad_request_if_invalid_query(self, fake_request, fake_url):
+        fake_request.values = {'fields': 'foo'}
+
+        with self.assertRaises(werkzeug.exceptions.BadRequest):
+            self._jobs.get()
+
     def test_get_returns_bad_request_if_invalid_pagination(self, fake_request, fake_url):
         fake_request.values = {'skip': 'blah', 'count': 12}
         
@@ -106,7 +370,7 @@ class JobsTests(unittest.TestCase):
 
     def test_post_returns_committed_response_if_success(self, fake_request, fake_url):
         fake_request.json = {'taskDefinition': 'foobar', 'schedule': '*'}
-        self._dc.create.return_value = Mock(id='foobar', data={'id': 'foobar'})
+        self._dc.create.return_value = Mock(id='foobar', revision=1, data={'id': 'foobar'})
 
         response = self._jobs.post.__wrapped__(self._jobs)
 
@@ -118,6 +382,7 @@ class JobsTests(unittest.TestCase):
         self.assertEqual('foobar', job_op_args[0].job_id)
         self.assertEqual(({
             'id': 'foobar',
+            'revision': 1,
             'link': {'href': 'foo/job/foobar', 'rel': 'item', 'title': 'Job for foobar'}
         }, 201), response)
 
@@ -125,7 +390,7 @@ class JobsTests(unittest.TestCase):
     @patch('flask_restful.abort')
     def test_post_returns_committed_response_error_if_queue_throws(self, fake_abort, fake_log, fake_request, fake_url):
         fake_request.json = {'taskDefinition': 'foobar', 'schedule': '*'}
-        self._dc.create.return_value = Mock(id='foobar', data={'id': 'foobar'})
+        self._dc.create.return_value = Mock(id='foobar', revision=1, data={'id': 'foobar'})
         self._queue.post.side_effect = Exception
 
         self._jobs.post.__wrapped__(self._jobs)
@@ -133,6 +398,7 @@ class JobsTests(unittest.TestCase):
         self._dc.create.assert_called_with({'schedule': '*', 'taskDefinition': 'foobar'})
         fake_abort.assert_called_with(500, item={
             'id': 'foobar',
+            'revision': 1,
             'link': {'href': 'foo/job/foobar', 'rel': 'item', 'title': 'Job for foobar'}
         }, message='Job update was saved correctly but failed to post update message to scheduler.')
 
@@ -163,16 +429,74 @@ class JobTests(unittest.TestCase):
         self.assertIsNotNone(getattr(self._job.put, '__wrapped__', None))
         self.assertIsNone(getattr(self._job.delete, '__wrapped__', None))
 
-    def test_get_returns_found_job(self, fake_url):
-        self._dc.get.return_value = Mock(id='foobar', data={'id': 'foobar'})
+    @patch('flask.request', if_none_match=ETags())
+    def test_get_returns_error_if_stored_job_invalid(self, fake_request, fake_url):
+        self._dc.get.side_effect = InvalidJobData('foobar', {'schedule': ['Invalid schedule syntax']})
 
-        response = self._job.get('foobar')
+        with self.assertRaises(werkzeug.exceptions.InternalServerError) as cm:
+            self._job.get('foobar')
+
+        self.assertEqual({'schedule': ['Invalid schedule syntax']}, cm.exception.data['messages'])
+
+    @patch('flask.request', if_none_match=ETags())
+    def test_get_returns_found_job(self, fake_request, fake_url):
+        self._dc.get.return_value = Mock(id='foobar', revision=3, version=12, data={'id': 'foobar', 'revision': 3})
+
+        response, status, headers = self._job.get('foobar')
 
         self._dc.get.assert_called_with('foobar')
         self.assertEqual({
             'id': 'foobar',
+            'revision': 3,
             'link': {'href': 'foo/job/foobar', 'rel': 'item', 'title': 'Job for foobar'}
         }, response)
+        self.assertEqual(200, status)
+        self.assertRegex(headers['ETag'], r'^"3\.12\.\w+"$')
+
+    @patch('flask.request')
+    def test_get_returns_not_modified_if_etag_matches(self, fake_request, fake_url):
+        self._dc.get.return_value = Mock(id='foobar', revision=3, version=12, data={'id': 'foobar', 'revision': 3})
+        fake_request.if_none_match = ETags()
+        etag = self._job.get('foobar')[2]['ETag']
+        fake_request.if_none_match = ETags([etag.strip('"')])
+        response_cache = Mock()
+        target = Job(self._queue, self._dc, response_cache)
+
+        response, status, headers = target.get('foobar')
+
+        self.assertEqual(304, status)
+        self.assertEqual(etag, headers['ETag'])
+        response_cache.get.assert_not_called()
+
+    @patch('flask.request')
+    def test_get_returns_job_if_etag_does_not_match(self, fake_request, fake_url):
+        job = Mock(id='foobar', revision=3, version=12, data={'id': 'foobar', 'revision': 3})
+        self._dc.get.return_value = job
+        fake_request.if_none_match = ETags()
+        etag = self._job.get('foobar')[2]['ETag']
+        fake_request.if_none_match = ETags([etag.strip('"')])
+        job.version = 13
+
+        response, status, headers = self._job.get('foobar')
+
+        self.assertEqual(200, status)
+        self.assertNotEqual(etag, headers['ETag'])
+
+    @patch('flask.request', if_none_match=ETags())
+    def test_get_reuses_cached_response_until_job_changes(self, fake_request, fake_url):
+        job = Mock(id='foobar', revision=3, version=1, data={'id': 'foobar', 'revision': 3})
+        self._dc.get.return_value = job
+        target = Job(self._queue, self._dc, ResponseCache(10))
+
+        first, _, _ = target.get('foobar')
+        second, _, _ = target.get('foobar')
+        job.version = 2
+        job.data = {'id': 'foobar', 'revision': 4}
+        third, _, _ = target.get('foobar')
+
+        self.assertIs(first, second)
+        self.assertEqual(4, third['revision'])
+        self.assertEqual(2, fake_url.call_count)
 
     def test_get_returns_notfound(self, fake_url):
         self._dc.get.side_effect = JobNotFound('foobar')
@@ -185,12 +509,13 @@ class JobTests(unittest.TestCase):
     @patch('flask.request')
     def test_put_returns_committed_response_if_success(self, fake_request, fake_url):
         fake_request.json = {'taskCount': 30}
-        update_job = Mock(id='foobar')
+        fake_request.if_match = ETags()
+        update_job = Mock(id='foobar', revision=2)
         self._dc.get.return_value = update_job
 
         response = self._job.put.__wrapped__(self._job, 'foobar')
 
-        update_job.update.assert_called_with({'taskCount': 30})
+        update_job.update.assert_called_with({'taskCount': 30}, revision=None)
         self._queue.post.assert_called()
         job_op_args, k = self._queue.post.call_args
         self.assertEqual(1, len(job_op_args))
@@ -198,6 +523,7 @@ class JobTests(unittest.TestCase):
         self.assertEqual('foobar', job_op_args[0].job_id)
         self.assertEqual({
             'id': 'foobar',
+            'revision': 2,
             'link': {'href': 'foo/job/foobar', 'rel': 'item', 'title': 'Job for foobar'}
         }, response)
 
@@ -206,15 +532,17 @@ class JobTests(unittest.TestCase):
     @patch('flask.request')
     def test_put_returns_committed_response_error_if_queue_throws(self, fake_request, fake_abort, fake_url, fake_log):
         fake_request.json = {'taskCount': 30}
-        update_job = Mock(id='foobar')
+        fake_request.if_match = ETags()
+        update_job = Mock(id='foobar', revision=2)
         self._dc.get.return_value = update_job
         self._queue.post.side_effect = Exception
 
         response = self._job.put.__wrapped__(self._job, 'foobar')
 
-        update_job.update.assert_called_with({'taskCount': 30})
+        update_job.update.assert_called_with({'taskCount': 30}, revision=None)
         fake_abort.assert_called_with(500, item={
             'id': 'foobar',
+            'revision': 2,
             'link': {'href': 'foo/job/foobar', 'rel': 'item', 'title': 'Job for foobar'}
         }, message='Job update was saved correctly but failed to post update message to scheduler.')
 
@@ -226,20 +554,82 @@ class JobTests(unittest.TestCase):
         with self.assertRaises(werkzeug.exceptions.NotFound):
             self._job.put.__wrapped__(self._job, 'foobar')
 
+    @patch('flask.request')
+    def test_put_returns_error_if_stored_job_invalid(self, fake_request, fake_url):
+        fake_request.json = {'taskCount': 3}
+        fake_request.if_match = ETags()
+        self._dc.get.side_effect = InvalidJobData('foobar', {'schedule': ['Invalid schedule syntax']})
+
+        with self.assertRaises(werkzeug.exceptions.InternalServerError):
+            self._job.put.__wrapped__(self._job, 'foobar')
+
+        self._queue.post.assert_not_called()
+
     @patch('flask.request')
     def test_put_returns_bad_request_if_invalid_data(self, fake_request, fake_url):
         fake_request.json = {'taskCount': 'broken'}
-        update_job = Mock(id='foobar')
+        fake_request.if_match = ETags()
+        update_job = Mock(id='foobar', revision=2)
         self._dc.get.return_value = update_job
         update_job.update.side_effect = InvalidJobData('foobar', {})
         
         with self.assertRaises(werkzeug.exceptions.BadRequest):
             self._job.put.__wrapped__(self._job, 'foobar')
 
-    def test_delete_returns_job_id(self, fake_url):
+    @patch('flask.request')
+    def test_put_passes_revision_if_etag_matches(self, fake_request, fake_url):
+        fake_request.json = {'taskCount': 30}
+        fake_request.if_match = ETags(['1.4.abcd', '2.7.abcd'])
+        update_job = Mock(id='foobar', revision=2)
+        self._dc.get.return_value = update_job
+
+        self._job.put.__wrapped__(self._job, 'foobar')
+
+        update_job.update.assert_called_with({'taskCount': 30}, revision=2)
+
+    @patch('flask.request')
+    def test_put_is_unconditional_if_any_etag_matches(self, fake_request, fake_url):
+        fake_request.json = {'taskCount': 30}
+        fake_request.if_match = ETags(star_tag=True)
+        update_job = Mock(id='foobar', revision=2)
+        self._dc.get.return_value = update_job
+
+        self._job.put.__wrapped__(self._job, 'foobar')
+
+        update_job.update.assert_called_with({'taskCount': 30}, revision=None)
+
+    @patch('flask.request')
+    def test_put_returns_precondition_failed_if_etag_does_not_match(self, fake_request, fake_url):
+        fake_request.json = {'taskCount': 30}
+        fake_request.if_match = ETags(['1.4.abcd', 'garbage'])
+        update_job = Mock(id='foobar', revision=2)
+        self._dc.get.return_value = update_job
+
+        with self.assertRaises(werkzeug.exceptions.PreconditionFailed):
+            self._job.put.__wrapped__(self._job, 'foobar')
+
+        update_job.update.assert_not_called()
+        self._queue.post.assert_not_called()
+
+    @patch('flask.request')
+    def test_put_returns_precondition_failed_if_store_conflict(self, fake_request, fake_url):
+        fake_request.json = {'taskCount': 30}
+        fake_request.if_match = ETags(['2.7.abcd'])
+        update_job = Mock(id='foobar', revision=2)
+        self._dc.get.return_value = update_job
+        update_job.update.side_effect = JobConflict('foobar')
+
+        with self.assertRaises(werkzeug.exceptions.PreconditionFailed):
+            self._job.put.__wrapped__(self._job, 'foobar')
+
+        self._queue.post.assert_not_called()
+
+    @patch('flask.request', if_match=ETags())
+    def test_delete_returns_job_id(self, fake_request, fake_url):
         response = self._job.delete('foobar')
 
-        self._dc.delete.assert_called_with('foobar')
+        self._dc.get.assert_not_called()
+        self._dc.delete.assert_called_with('foobar', revision=None)
         self._queue.post.assert_called()
         job_op_args, k = self._queue.post.call_args
         self.assertEqual(1, len(job_op_args))
@@ -251,19 +641,171 @@ class JobTests(unittest.TestCase):
     @patch('flask_restful.abort')
     @patch('flask.request')
     def test_delete_returns_committed_response_error_if_queue_throws(self, fake_request, fake_abort, fake_url, fake_log):
+        fake_request.if_match = ETags()
         self._queue.post.side_effect = Exception
 
         response = self._job.delete('foobar')
 
-        self._dc.delete.assert_called_with('foobar')
+        self._dc.delete.assert_called_with('foobar', revision=None)
         fake_abort.assert_called_with(500, item={
             'id': 'foobar'
         }, message='Job update was saved correctly but failed to post update message to scheduler.')
 
-    def test_delete_returns_notfound(self, fake_url):
+    @patch('flask.request', if_match=ETags(['3.1.abcd']))
+    def test_delete_passes_revision_if_etag_matches(self, fake_request, fake_url):
+        self._dc.get.return_value = Mock(id='foobar', revision=3)
+
+        self._job.delete('foobar')
+
+        self._dc.get.assert_called_with('foobar')
+        self._dc.delete.assert_called_with('foobar', revision=3)
+
+    @patch('flask.request', if_match=ETags(['2.1.abcd']))
+    def test_delete_returns_precondition_failed_if_etag_does_not_match(self, fake_request, fake_url):
+        self._dc.get.return_value = Mock(id='foobar', revision=3)
+
+        with self.assertRaises(werkzeug.exceptions.PreconditionFailed):
+            self._job.delete('foobar')
+
+        self._dc.delete.assert_not_called()
+        self._queue.post.assert_not_called()
+
+    @patch('flask.request', if_match=ETags(['3.1.abcd']))
+    def test_delete_returns_precondition_failed_if_store_conflict(self, fake_request, fake_url):
+        self._dc.get.return_value = Mock(id='foobar', revision=3)
+        self._dc.delete.side_effect = JobConflict('foobar')
+
+        with self.assertRaises(werkzeug.exceptions.PreconditionFailed):
+            self._job.delete('foobar')
+
+        self._queue.post.assert_not_called()
+
+    @patch('flask.request', if_match=ETags())
+    def test_delete_discards_cached_response(self, fake_request, fake_url):
+        response_cache = Mock()
+        target = Job(self._queue, self._dc, response_cache)
+
+        target.delete('foobar')
+
+        response_cache.discard.assert_called_with('foobar')
+
+    @patch('flask.request', if_match=ETags(['3.1.abcd']))
+    def test_delete_returns_error_if_stored_job_invalid_and_etag_given(self, fake_request, fake_url):
+        self._dc.get.side_effect = InvalidJobData('foobar', {'schedule': ['Invalid schedule syntax']})
+
+        with self.assertRaises(werkzeug.exceptions.InternalServerError):
+            self._job.delete('foobar')
+
+        self._dc.delete.assert_not_called()
+
+    @patch('flask.request', if_match=ETags())
+    def test_delete_returns_notfound(self, fake_request, fake_url):
         self._dc.delete.side_effect = JobNotFound('foobar')
 
         with self.assertRaises(werkzeug.exceptions.NotFound):
             self._job.delete('foobar')
 
-        self._dc.delete.assert_called_with('foobar')
+        self._dc.delete.assert_called_with('foobar', revision=None)
+
+
+@patch('flask.url_for', side_effect=lambda *args, **kwargs: 'foo/' + args[0] + '/' + kwargs['job_id'])
+@patch('flask.request')
+class JobsBatchTests(unittest.TestCase):
+    def setUp(self):
+        self._queue = Mock()
+        self._dc = Mock()
+        self._cache = Mock()
+        self._target = JobsBatch(self._queue, self._dc, self._cache)
+
+    def test_expected_verbs_are_decorated(self, fake_request, fake_url):
+        self.assertIsNotNone(getattr(self._target.post, '__wrapped__', None))
+
+    def test_post_applies_batch(self, fake_request, fake_url):
+        fake_request.json = {'operations': [
+            {'action': 'create', 'job': {'taskDefinition': 'foo', 'schedule': '*'}},
+            {'action': 'update', 'id': 'bar', 'job': {'taskCount': 4}, 'revision': 2},
+            {'action': 'delete', 'id': 'baz'}
+        ]}
+        self._dc.batch.return_value = [Mock(id='foo', revision=1), Mock(id='bar', revision=3), None]
+
+        response = self._target.post.__wrapped__(self._target)
+
+        self._dc.batch.assert_called_with([
+            StoreOperation.create(None, {'taskDefinition': 'foo', 'schedule': '*'}),
+            StoreOperation.update('bar', {'taskCount': 4}, 2),
+            StoreOperation.delete('baz')
+        ])
+        self.assertEqual({'results': [
+            {'status': 201, 'id': 'foo', 'revision': 1, 'link': {'href': 'foo/job/foo', 'rel': 'item', 'title': 'Job for foo'}},
+            {'status': 200, 'id': 'bar', 'revision': 3, 'link': {'href': 'foo/job/bar', 'rel': 'item', 'title': 'Job for bar'}},
+            {'status': 200, 'id': 'baz'}
+        ]}, response)
+        self._cache.discard.assert_called_once_with('baz')
+        self._queue.post.assert_called_once()
+        job_op = self._queue.post.call_args[0][0]
+        self.assertEqual(ecs_scheduler.models.JobOperation.BATCH, job_op.operation)
+        self.assertEqual([(ecs_scheduler.models.JobOperation.ADD, 'foo'),
+                            (ecs_scheduler.models.JobOperation.MODIFY, 'bar'),
+                            (ecs_scheduler.models.JobOperation.REMOVE, 'baz')],
+                            [(op.operation, op.job_id) for op in job_op.job_ops])
+
+    @patch.object(logging.getLogger('ecs_scheduler.webapi.jobs'), 'error')
+    def test_post_reports_failed_operations(self, fake_log, fake_request, fake_url):
+        fake_request.json = {'operations': [
+            {'action': 'create', 'job': {'taskDefinition': 'foo'}},
+            {'action': 'update', 'id': 'bar', 'job': {}},
+            {'action': 'create', 'job': {'taskDefinition': 'baz'}},
+            {'action': 'delete', 'id': 'qux', 'revision': 2},
+            {'action': 'delete', 'id': 'quux'},
+            {'action': 'delete', 'id': 'corge'}
+        ]}
+        self._dc.batch.return_value = [
+            InvalidJobData('foo', {'schedule': ['Missing data for required field.']}),
+            JobNotFound('bar'),
+            JobAlreadyExists('baz'),
+            JobConflict('qux'),
+            JobPersistenceError('quux'),
+            None
+        ]
+
+        response = self._target.post.__wrapped__(self._target)
+
+        self.assertEqual({'results': [
+            {'status': 400, 'id': 'foo', 'messages': {'schedule': ['Missing data for required field.']}},
+            {'status': 404, 'id': 'bar', 'message': 'Job bar does not exist.'},
+            {'status': 409, 'id': 'baz', 'message': 'Job baz already exists.'},
+            {'status': 412, 'id': 'qux', 'message': 'Job qux does not match the operation revision.'},
+            {'status': 500, 'id': 'quux', 'message': 'Job quux could not be saved.'},
+            {'status': 200, 'id': 'corge'}
+        ]}, response)
+        fake_log.assert_called()
+        job_op = self._queue.post.call_args[0][0]
+        self.assertEqual(['corge'], [op.job_id for op in job_op.job_ops])
+
+    def test_post_does_not_notify_scheduler_if_all_operations_fail(self, fake_request, fake_url):
+        fake_request.json = {'operations': [{'action': 'delete', 'id': 'foo'}]}
+        self._dc.batch.return_value = [JobNotFound('foo')]
+
+        self._target.post.__wrapped__(self._target)
+
+        self._queue.post.assert_not_called()
+
+    def test_post_returns_bad_request_if_body_malformed(self, fake_request, fake_url):
+        fake_request.json = {'operations': [{'action': 'delete'}]}
+
+        with self.assertRaises(werkzeug.exceptions.BadRequest):
+            self._target.post.__wrapped__(self._target)
+
+        self._dc.batch.assert_not_called()
+
+    @patch.object(logging.getLogger('ecs_scheduler.webapi.jobs'), 'exception')
+    @patch('flask_restful.abort')
+    def test_post_returns_committed_response_error_if_queue_throws(self, fake_abort, fake_log, fake_request, fake_url):
+        fake_request.json = {'operations': [{'action': 'delete', 'id': 'foo'}]}
+        self._dc.batch.return_value = [None]
+        self._queue.post.side_effect = Exception
+
+        self._target.post.__wrapped__(self._target)
+
+        fake_abort.assert_called_with(500, item={'results': [{'status': 200, 'id': 'foo'}]},
+            message='Job update was saved correctly but failed to post update message to scheduler.')
@@ -0,0 +1,32 @@
+import unittest
+from unittest.mock import patch, Mock
+
+from ecs_scheduler.crontriggers import CacheInfo
+from ecs_scheduler.writebehind import WriteBehindStore
+from ecs_scheduler.webapi.metrics import Metrics
+
+
+@patch('ecs_scheduler.crontriggers.cache_info', return_value=CacheInfo(hits=8, misses=2, maxsize=1024, currsize=2))
+class MetricsTests(unittest.TestCase):
+    def setUp(self):
+        self._response_cache = Mock()
+        self._response_cache.stats.return_value = {'hits': 3, 'misses': 1, 'hitRate': 0.75, 'size': 1, 'maxSize': 10, 'bytes': 512}
+
+    def test_get(self, cache_info):
+        metrics = Metrics(self._response_cache, Mock(store=Mock()))
+
+        response = metrics.get()
+
+        self.assertEqual({
+            'responseCache': {'hits': 3, 'misses': 1, 'hitRate': 0.75, 'size': 1, 'maxSize': 10, 'bytes': 512},
+            'cronTriggerCache': {'hits': 8, 'misses': 2, 'size': 2, 'maxSize': 1024}
+        }, response)
+
+    def test_get_includes_write_behind_depth(self, cache_info):
+        store = Mock(spec=WriteBehindStore)
+        store.depth.return_value = 12
+        metrics = Metrics(self._response_cache, Mock(store=store))
+
+        response = metrics.get()
+
+        self.assertEqual({'depth': 12}, response['writeBehind'])
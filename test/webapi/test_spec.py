@@ -1,16 +1,68 @@
+import json
+import hashlib
 import unittest
-from unittest.mock import patch
+from unittest.mock import patch, Mock
 
-from ecs_scheduler.webapi.spec import Spec
+from werkzeug.datastructures import ETags
 
+from ecs_scheduler.webapi.spec import Spec, SpecDocument
 
+
+@patch('ecs_scheduler.env.get_version', return_value='1.2.3')
+@patch('flask_swagger.swagger', side_effect=lambda app: {'info': {}, 'paths': {}})
+class SpecDocumentTests(unittest.TestCase):
+    def test_get_renders_spec(self, fake_swagger, fake_version):
+        app = Mock()
+
+        body, etag = SpecDocument().get(app)
+
+        fake_swagger.assert_called_with(app)
+        self.assertEqual({
+            'info': {'version': '1.2.3', 'title': 'ECS Scheduler Web Api (webapi)'},
+            'paths': {},
+            'basePath': '/'
+        }, json.loads(body))
+        self.assertEqual(hashlib.sha256(body).hexdigest()[:32], etag)
+
+    def test_get_renders_spec_once(self, fake_swagger, fake_version):
+        document = SpecDocument()
+
+        first = document.get(Mock())
+        second = document.get(Mock())
+
+        self.assertIs(first, second)
+        fake_swagger.assert_called_once()
+        fake_version.assert_called_once()
+
+
+@patch('flask.current_app')
 class SpecTests(unittest.TestCase):
-    @patch('flask_swagger.swagger')
-    @patch('flask.current_app')
-    def test_get(self, fake_flask_app, fake_swagger):
-        spec = Spec()
+    def setUp(self):
+        self._document = Mock()
+        self._document.get.return_value = b'{"swagger": "2.0"}', 'abcd'
+        self._target = Spec(self._document)
+
+    @patch('flask.request', if_none_match=ETags())
+    def test_get(self, fake_request, fake_flask_app):
+        response = self._target.get()
+
+        self._document.get.assert_called_with(fake_flask_app)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/json', response.mimetype)
+        self.assertEqual(b'{"swagger": "2.0"}', response.get_data())
+        self.assertEqual('"abcd"', response.headers['ETag'])
+
+    @patch('flask.request', if_none_match=ETags(['abcd']))
+    def test_get_returns_not_modified_if_etag_matches(self, fake_request, fake_flask_app):
+        response = self._target.get()
+
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.get_data())
+        self.assertEqual('"abcd"', response.headers['ETag'])
 
-        response = spec.get()
+    @patch('flask.request', if_none_match=ETags(['efgh']))
+    def test_get_returns_spec_if_etag_does_not_match(self, fake_request, fake_flask_app):
+        response = self._target.get()
 
-        fake_swagger.assert_called_with(fake_flask_app)
-        self.assertIs(fake_swagger.return_value, response)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(b'{"swagger": "2.0"}', response.get_data())
@@ -1,9 +1,11 @@
 import unittest
 import logging.handlers
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, ANY
 
 import ecs_scheduler.webapi.home
 import ecs_scheduler.webapi.jobs
+import ecs_scheduler.webapi.metrics
+import ecs_scheduler.webapi.spec
 from ecs_scheduler.webapi import create, setup
 
 
@@ -15,6 +17,7 @@ class CreateTests(unittest.TestCase):
         self.assertIs(flask.return_value, result)
 
 
+@patch('ecs_scheduler.webapi.cache.resolve')
 @patch('flask_cors.CORS')
 @patch('flask_restful.Api')
 class SetupTests(unittest.TestCase):
@@ -23,19 +26,22 @@ class SetupTests(unittest.TestCase):
         self._queue = Mock()
         self._dc = Mock()
 
-    def test_setup_server(self, flask_restful, cors):
+    def test_setup_server(self, flask_restful, cors, resolve_cache):
         setup(self._flask, self._queue, self._dc)
 
         flask_restful.assert_called_with(self._flask, catch_all_404s=True)
         flask_restful.return_value.add_resource.assert_any_call(ecs_scheduler.webapi.home.Home, '/')
-        flask_restful.return_value.add_resource.assert_any_call(ecs_scheduler.webapi.jobs.Jobs, '/jobs', resource_class_args=(self._queue, self._dc))
-        flask_restful.return_value.add_resource.assert_any_call(ecs_scheduler.webapi.jobs.Job, '/jobs/<job_id>', resource_class_args=(self._queue, self._dc))
+        flask_restful.return_value.add_resource.assert_any_call(ecs_scheduler.webapi.spec.Spec, '/spec', resource_class_args=(ANY,))
+        flask_restful.return_value.add_resource.assert_any_call(ecs_scheduler.webapi.jobs.Jobs, '/jobs', resource_class_args=(self._queue, self._dc, resolve_cache.return_value))
+        flask_restful.return_value.add_resource.assert_any_call(ecs_scheduler.webapi.jobs.Job, '/jobs/<job_id>', resource_class_args=(self._queue, self._dc, resolve_cache.return_value))
+        flask_restful.return_value.add_resource.assert_any_call(ecs_scheduler.webapi.jobs.JobsBatch, '/jobs:batch', resource_class_args=(self._queue, self._dc, resolve_cache.return_value))
+        flask_restful.return_value.add_resource.assert_any_call(ecs_scheduler.webapi.metrics.Metrics, '/metrics', resource_class_args=(resolve_cache.return_value, self._dc))
         cors.assert_called_with(self._flask, allow_headers='Content-Type')
         self._flask.logger.addHandler.assert_not_called()
         self.assertFalse(self._flask.config['ERROR_404_HELP'])
 
     @patch('logging.getLogger')
-    def test_adds_file_handler_if_present(self, get_log, flask_restful, cors):
+    def test_adds_file_handler_if_present(self, get_log, flask_restful, cors, resolve_cache):
         mock_handler = Mock(spec=logging.handlers.RotatingFileHandler)
         get_log.return_value.handlers = Mock(), mock_handler, Mock()
 